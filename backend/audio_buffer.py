@@ -0,0 +1,274 @@
+"""
+Preallocated in-memory buffers for captured audio.
+
+The audio callback runs on the PortAudio thread, so anything it touches must
+avoid allocation and locking. The structures in this module are allocated once
+up front and written by a single producer; readers on other threads only ever
+look at data the writer has already published.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size ring buffer of audio frames.
+
+    Single writer (the audio callback), any number of readers. Every write is a
+    single copy into the preallocated array followed by an update of the write
+    cursor, so readers never observe a partially written block.
+
+    Positions are absolute frame counts since the buffer was created. They act
+    as sequence numbers: a reader can remember ``write_pos`` and later call
+    ``read_since`` to get exactly the frames it has not seen yet.
+
+    Reads return views into the buffer whenever the requested range does not
+    wrap around the end of the array. Views are only valid until the writer
+    laps them, so callers that keep data around should copy it.
+    """
+
+    __slots__ = ("capacity", "channels", "_data", "_write_pos")
+
+    def __init__(self, capacity: int, channels: int = 1, dtype=np.float32):
+        """
+        Initialize the ring buffer.
+
+        Args:
+            capacity: Number of frames the buffer can hold
+            channels: Number of audio channels per frame
+            dtype: Sample data type
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self._data = np.zeros((self.capacity, self.channels), dtype=dtype)
+        self._write_pos = 0
+
+    @property
+    def write_pos(self) -> int:
+        """Absolute position one past the most recently written frame."""
+        return self._write_pos
+
+    @property
+    def oldest_pos(self) -> int:
+        """Absolute position of the oldest frame still held in the buffer."""
+        return max(0, self._write_pos - self.capacity)
+
+    def write(self, block: np.ndarray) -> int:
+        """
+        Copy a block of frames into the buffer.
+
+        Args:
+            block: Array of shape (frames, channels) or (frames,) for mono
+
+        Returns:
+            Absolute position of the first frame of the block
+        """
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        frames = block.shape[0]
+        start_pos = self._write_pos
+
+        if frames > self.capacity:
+            # Only the tail of an oversized block can be kept
+            block = block[-self.capacity:]
+            start_pos += frames - self.capacity
+            frames = self.capacity
+
+        start = start_pos % self.capacity
+        end = start + frames
+        if end <= self.capacity:
+            self._data[start:end] = block
+        else:
+            split = self.capacity - start
+            self._data[start:] = block[:split]
+            self._data[:end - self.capacity] = block[split:]
+
+        # Publish only after the data is in place
+        self._write_pos = start_pos + frames
+        return start_pos
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """
+        Read frames between two absolute positions.
+
+        The range is clipped to what is still held in the buffer.
+
+        Args:
+            start: Absolute position of the first frame
+            stop: Absolute position one past the last frame
+
+        Returns:
+            Array of shape (frames, channels); a view when the range is contiguous
+        """
+        stop = min(stop, self._write_pos)
+        start = max(start, stop - self.capacity, 0)
+        if stop <= start:
+            return self._data[:0]
+
+        first = start % self.capacity
+        last = first + (stop - start)
+        if last <= self.capacity:
+            return self._data[first:last]
+        return np.concatenate((self._data[first:], self._data[:last - self.capacity]))
+
+    def read_last(self, frames: int) -> np.ndarray:
+        """Read the most recent ``frames`` frames."""
+        stop = self._write_pos
+        return self.read(stop - max(0, int(frames)), stop)
+
+    def read_since(self, seq: int) -> Tuple[np.ndarray, int]:
+        """
+        Read every frame written at or after ``seq``.
+
+        Frames older than the buffer capacity have been overwritten; in that
+        case the returned data starts at ``oldest_pos`` instead.
+
+        Returns:
+            Tuple of (frames, next_seq) where next_seq is the value to pass to
+            the next call
+        """
+        stop = self._write_pos
+        return self.read(seq, stop), stop
+
+
+class LevelHistory:
+    """
+    Columnar history of per-block audio levels.
+
+    Timestamps, RMS and peak values live in three parallel preallocated arrays
+    used as a ring, rather than a list of sample objects. Like
+    ``AudioRingBuffer`` it has a single writer; ``count`` is the absolute
+    number of entries ever appended and doubles as a sequence number.
+    """
+
+    __slots__ = ("capacity", "start", "_timestamps", "_rms", "_peak", "_count")
+
+    def __init__(self, capacity: int, start: int = 0):
+        """
+        Initialize the history.
+
+        Args:
+            capacity: Maximum number of entries retained
+            start: Absolute index of the first entry, so that a replacement
+                history can continue the sequence of the one it replaces
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self._rms = np.zeros(self.capacity, dtype=np.float32)
+        self._peak = np.zeros(self.capacity, dtype=np.float32)
+        self.start = max(0, int(start))
+        self._count = self.start
+
+    @property
+    def count(self) -> int:
+        """Absolute index one past the newest entry (``start`` plus entries appended)."""
+        return self._count
+
+    @property
+    def oldest(self) -> int:
+        """Absolute index of the oldest entry still retained."""
+        return max(self.start, self._count - self.capacity)
+
+    def __len__(self) -> int:
+        return self._count - self.oldest
+
+    def append(self, timestamp: float, rms: float, peak: float) -> None:
+        """Record the level of one audio block."""
+        i = self._count % self.capacity
+        self._timestamps[i] = timestamp
+        self._rms[i] = rms
+        self._peak[i] = peak
+        self._count += 1
+
+    def slice(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get entries between two absolute indices, clipped to what is retained.
+
+        Returns:
+            Tuple of (timestamps, rms, peak) arrays
+        """
+        stop = min(stop, self._count)
+        start = max(start, self.oldest)
+        if stop <= start:
+            return self._timestamps[:0], self._rms[:0], self._peak[:0]
+
+        first = start % self.capacity
+        last = first + (stop - start)
+        if last <= self.capacity:
+            return self._timestamps[first:last], self._rms[first:last], self._peak[first:last]
+        wrap = last - self.capacity
+        return tuple(
+            np.concatenate((column[first:], column[:wrap]))
+            for column in (self._timestamps, self._rms, self._peak)
+        )
+
+    def index_at(self, timestamp: float) -> int:
+        """Absolute index of the first retained entry at or after ``timestamp``."""
+        lo, hi = self.oldest, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[mid % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, seconds: float, now: float = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the entries recorded during the last ``seconds`` seconds.
+
+        Args:
+            seconds: Length of the window
+            now: End of the window as a UNIX timestamp (defaults to the newest entry)
+        """
+        if self._count == self.start:
+            return self.slice(0, 0)
+        if now is None:
+            now = float(self._timestamps[(self._count - 1) % self.capacity])
+        return self.slice(self.index_at(now - seconds), self._count)
+
+
+def rms_to_db(rms: np.ndarray) -> np.ndarray:
+    """Convert RMS values to dBFS, using -100 for silence like AudioSample.db."""
+    rms = np.asarray(rms, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        return np.where(rms > 0, 20 * np.log10(rms), -100.0)
+
+
+def downsample_levels(timestamps: np.ndarray,
+                      rms: np.ndarray,
+                      peak: np.ndarray,
+                      points: int) -> Dict[str, np.ndarray]:
+    """
+    Reduce a level series to at most ``points`` min/max buckets.
+
+    Each bucket keeps its first timestamp, the minimum and maximum RMS and the
+    maximum peak, so short spikes and dips survive the reduction. All buckets
+    are computed with ``ufunc.reduceat`` in a single pass.
+
+    Returns:
+        Dictionary of equally sized columns: timestamps, rms_min, rms_max, peak
+    """
+    n = len(timestamps)
+    if n <= points:
+        return {
+            "timestamps": timestamps,
+            "rms_min": rms,
+            "rms_max": rms,
+            "peak": peak
+        }
+
+    size = -(-n // max(1, points))
+    starts = np.arange(0, n, size)
+    return {
+        "timestamps": timestamps[starts],
+        "rms_min": np.minimum.reduceat(rms, starts),
+        "rms_max": np.maximum.reduceat(rms, starts),
+        "peak": np.maximum.reduceat(peak, starts)
+    }
@@ -9,13 +9,19 @@ import queue
 import threading
 import time
 import numpy as np
-import sounddevice as sd
 from typing import Optional, Callable, List, Dict, Any
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 import platform
 
+from audio_buffer import AudioRingBuffer, LevelHistory
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # PortAudio missing, e.g. on headless servers
+    sd = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,6 +30,8 @@ logger = logging.getLogger(__name__)
 DEFAULT_SAMPLE_RATE = 44100  # Hz
 DEFAULT_CHANNELS = 1  # Mono
 DEFAULT_BLOCK_SIZE = 1024  # Samples per block
+DEFAULT_BUFFER_SECONDS = 10.0  # Raw audio kept in the ring buffer
+DEFAULT_HISTORY_SECONDS = 600.0  # Per-block levels kept in memory
 
 class AudioDeviceError(Exception):
     """Exception raised for audio device related errors."""
@@ -31,6 +39,8 @@ class AudioDeviceError(Exception):
 
 def list_audio_devices() -> List[Dict[str, Any]]:
     """List all available audio devices."""
+    if sd is None:
+        raise AudioDeviceError("sounddevice/PortAudio is not available")
     try:
         devices = sd.query_devices()
         return [
@@ -49,7 +59,12 @@ def list_audio_devices() -> List[Dict[str, Any]]:
 
 @dataclass
 class AudioSample:
-    """Container for audio sample data and metadata."""
+    """
+    Container for audio sample data and metadata.
+
+    ``raw_data`` is a view into the capture ring buffer rather than a copy;
+    copy it if it needs to outlive the next few seconds of capture.
+    """
     timestamp: datetime
     rms: float
     raw_data: np.ndarray
@@ -74,7 +89,12 @@ class AudioCapture:
                  sample_rate: int = DEFAULT_SAMPLE_RATE,
                  channels: int = DEFAULT_CHANNELS,
                  block_size: int = DEFAULT_BLOCK_SIZE,
-                 device: Optional[int] = None):
+                 device: Optional[int] = None,
+                 buffer_seconds: float = DEFAULT_BUFFER_SECONDS,
+                 history_seconds: float = DEFAULT_HISTORY_SECONDS,
+                 worker_thread: bool = False,
+                 history_start: int = 0,
+                 source=None):
         """
         Initialize audio capture.
         
@@ -83,24 +103,81 @@ class AudioCapture:
             channels: Number of audio channels (1=mono, 2=stereo)
             block_size: Number of samples per block
             device: Audio device ID (None for default)
+            buffer_seconds: Seconds of raw audio kept for ``read_last``
+            history_seconds: Seconds of per-block levels kept in ``history``
+            worker_thread: If True, the audio callback only copies blocks into
+                the ring buffer and a separate thread computes levels and
+                notifies the callback. If False both happen on the real-time
+                audio thread, which is only meant for debugging and scripts;
+                the server always captures with the worker
+            history_start: Index of the first ``history`` entry; pass the
+                previous capture's ``history.count`` to keep level sequence
+                numbers increasing across restarts
+            source: ``capture_sources.CaptureSource`` to read instead of the
+                sound device (None for the device)
         """
         self.sample_rate = sample_rate
         self.channels = channels
         self.block_size = block_size
         self.device = device
+        self.source = source
         self._running = False
         self._stream = None
         self._callback = None
-        self._last_sample = None
         self._device_info = None
         
-        # Validate audio device
-        self._validate_audio_device()
+        # Most recent block, kept as plain values so the callback does not
+        # have to build an AudioSample when nobody is listening
+        self._last_seq = None
+        self._last_frames = 0
+        self._last_rms = 0.0
+        self._last_time = 0.0
+        
+        # Worker thread state (only used when worker_thread is True)
+        self.worker_thread = worker_thread
+        self._worker = None
+        self._data_ready = threading.Event()
+        self._read_pos = 0
+        
+        # Counters; written only by the audio callback or the worker thread
+        self._blocks_captured = 0
+        self._blocks_processed = 0
+        self._dropped_blocks = 0
+        self._input_overflows = 0
+        self._input_underflows = 0
+        
+        # Validate audio device, or take the format from the replacement source
+        if source is None:
+            self._validate_audio_device()
+        else:
+            self.device = None
+            if source.sample_rate:
+                self.sample_rate = int(source.sample_rate)
+            self._device_info = {'name': source.name, 'sample_rate': self.sample_rate}
+        
+        # Preallocate the ring buffer once the final rate and channel count
+        # are known. Rounding up to whole blocks keeps every block contiguous,
+        # so per-block reads are always zero-copy views.
+        blocks = max(1, int(np.ceil(buffer_seconds * self.sample_rate / self.block_size)))
+        self._buffer = AudioRingBuffer(blocks * self.block_size, self.channels)
+        
+        # Capture time of each block slot, filled in by the audio callback
+        self._block_times = np.zeros(blocks, dtype=np.float64)
+        
+        # One level entry per block for the configured retention
+        self.history = LevelHistory(
+            max(1, int(np.ceil(history_seconds * self.sample_rate / self.block_size))),
+            start=history_start
+        )
     
     def _validate_audio_device(self) -> None:
         """Validate the audio device and update settings if needed."""
+        if sd is None:
+            raise AudioDeviceError("sounddevice/PortAudio is not available; use a file or synthetic source")
         try:
             devices = sd.query_devices()
+            if self.device is not None and self.device < 0:
+                self.device = None
             if self.device is not None and self.device >= len(devices):
                 logger.warning(f"Device {self.device} not found, using default")
                 self.device = None
@@ -129,30 +206,158 @@ class AudioCapture:
     def _audio_callback(self, indata, frames, time_info, status):
         """Callback function for audio stream."""
         if status:
-            logger.warning(f"Audio stream status: {status}")
+            self._record_status(status)
         
         try:
-            # Calculate RMS of the audio block
-            rms = np.sqrt(np.mean(np.square(indata)))
+            # Single copy of the block into the ring buffer
+            seq = self._buffer.write(indata)
+            now = time.time()
+            self._blocks_captured += 1
+            self._block_times[(seq // self.block_size) % len(self._block_times)] = now
             
-            # Create audio sample
-            sample = AudioSample(
-                timestamp=datetime.now(),
-                rms=float(rms),
-                raw_data=indata.copy(),
-                sample_rate=self.sample_rate
-            )
+            if self._worker is not None:
+                # Everything else happens on the worker thread
+                self._data_ready.set()
+                return
             
-            # Store the sample
-            self._last_sample = sample
+            # Debug-only inline mode: levels and the user callback run on the
+            # audio thread and can cause overflows when they are slow
+            block = self._buffer.read(seq, seq + len(indata))
             
-            # Notify callback if provided
-            if self._callback:
-                self._callback(sample)
+            # Calculate RMS and peak of the audio block
+            rms = float(np.sqrt(np.mean(np.square(block))))
+            peak = float(max(block.max(), -block.min())) if len(block) else 0.0
+            self._record_level(seq, block, now, rms, peak)
                 
         except Exception as e:
             logger.error(f"Error in audio callback: {e}")
     
+    def _record_status(self, status) -> None:
+        """Count PortAudio status flags reported with a block."""
+        if getattr(status, 'input_overflow', False):
+            self._input_overflows += 1
+        if getattr(status, 'input_underflow', False):
+            self._input_underflows += 1
+        # Logging is too slow for the audio thread in worker mode
+        if self._worker is None:
+            logger.warning(f"Audio stream status: {status}")
+    
+    def _record_level(self, seq: int, block: np.ndarray, timestamp: float,
+                      rms: float, peak: float) -> None:
+        """Store the level of one block and notify the callback."""
+        self._last_seq = seq
+        self._last_frames = len(block)
+        self._last_rms = rms
+        self._last_time = timestamp
+        self.history.append(timestamp, rms, peak)
+        self._blocks_processed += 1
+        
+        # Notify callback if provided
+        if self._callback:
+            self._callback(AudioSample(
+                timestamp=datetime.fromtimestamp(timestamp),
+                rms=rms,
+                raw_data=block,
+                sample_rate=self.sample_rate
+            ))
+    
+    def _worker_loop(self) -> None:
+        """Process captured blocks until capture stops."""
+        while self._running:
+            self._data_ready.wait(timeout=0.5)
+            self._data_ready.clear()
+            try:
+                self._process_pending()
+            except Exception as e:
+                logger.error(f"Error in audio worker: {e}", exc_info=True)
+    
+    def _process_pending(self) -> None:
+        """Compute levels for every complete block not processed yet."""
+        block_size = self.block_size
+        oldest = self._buffer.oldest_pos
+        if self._read_pos < oldest:
+            # The callback lapped us; those blocks are gone
+            dropped = -(-(oldest - self._read_pos) // block_size)
+            self._dropped_blocks += dropped
+            self._read_pos += dropped * block_size
+            logger.warning(f"Audio worker fell behind, dropped {dropped} blocks")
+        
+        count = (self._buffer.write_pos - self._read_pos) // block_size
+        if count <= 0:
+            return
+        
+        start = self._read_pos
+        data = self._buffer.read(start, start + count * block_size)
+        blocks = data.reshape(count, -1)
+        
+        # Levels for all pending blocks in one vectorized pass
+        rms = np.sqrt(np.mean(np.square(blocks), axis=1))
+        peak = np.max(np.abs(blocks), axis=1)
+        slots = (np.arange(count) + start // block_size) % len(self._block_times)
+        times = self._block_times[slots]
+        
+        for i in range(count):
+            offset = i * block_size
+            self._record_level(
+                start + offset,
+                data[offset:offset + block_size],
+                float(times[i]),
+                float(rms[i]),
+                float(peak[i])
+            )
+        self._read_pos = start + count * block_size
+    
+    def _open_stream(self):
+        """
+        Create the (not yet started) input stream feeding ``_audio_callback``.
+        
+        Subclasses can return any object with ``start()``, ``stop()`` and
+        ``close()`` that calls ``_audio_callback`` with float32 blocks of
+        shape (block_size, channels).
+        """
+        if self.source is not None:
+            # In worker mode a fast source must not lap the worker
+            return self.source.open(
+                self._audio_callback, self.sample_rate, self.channels, self.block_size,
+                backlog=self._pending_frames if self.worker_thread else None,
+                max_backlog=self._buffer.capacity // 2
+            )
+        return sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            blocksize=self.block_size,
+            device=self.device,
+            dtype='float32',
+            callback=self._audio_callback
+        )
+    
+    def _pending_frames(self) -> int:
+        """Frames written by the callback but not yet processed by the worker."""
+        return self._buffer.write_pos - self._read_pos
+    
+    def wait_finished(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until a finite file or synthetic source has been fully processed.
+        
+        Args:
+            timeout: Maximum seconds to wait (None waits forever)
+            
+        Returns:
+            True if the source ended and every block was processed, False on
+            timeout or when capturing from a device or a looping source
+        """
+        finished = getattr(self._stream, 'finished', None)
+        if finished is None:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not finished.wait(timeout):
+            return False
+        while self._worker is not None and self._pending_frames() >= self.block_size:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+    
     def start(self, callback=None):
         """
         Start audio capture.
@@ -171,21 +376,26 @@ class AudioCapture:
         
         try:
             # Start audio stream
-            self._stream = sd.InputStream(
-                samplerate=self.sample_rate,
-                channels=self.channels,
-                blocksize=self.block_size,
-                device=self.device,
-                dtype='float32',
-                callback=self._audio_callback
-            )
+            self._stream = self._open_stream()
             
             self._running = True
+            if self.worker_thread:
+                self._read_pos = self._buffer.write_pos
+                self._worker = threading.Thread(
+                    target=self._worker_loop,
+                    name="audio-capture-worker",
+                    daemon=True
+                )
+                self._worker.start()
             self._stream.start()
-            logger.info(f"Audio capture started on device {self.device or 'default'}")
+            where = self.source.name if self.source else f"device {self.device or 'default'}"
+            logger.info(f"Audio capture started on {where}")
             
         except Exception as e:
             self._running = False
+            if self._worker is not None:
+                self._data_ready.set()
+                self._worker = None
             logger.error(f"Failed to start audio capture: {e}")
             raise AudioDeviceError(f"Could not start audio capture: {e}") from e
     
@@ -205,6 +415,11 @@ class AudioCapture:
                 logger.error(f"Error stopping audio stream: {e}")
             finally:
                 self._stream = None
+        
+        if self._worker is not None:
+            self._data_ready.set()
+            self._worker.join(timeout=2.0)
+            self._worker = None
     
     def get_current_level(self):
         """
@@ -213,7 +428,75 @@ class AudioCapture:
         Returns:
             AudioSample or None if no samples available
         """
-        return self._last_sample
+        if self._last_seq is None:
+            return None
+        return AudioSample(
+            timestamp=datetime.fromtimestamp(self._last_time),
+            rms=self._last_rms,
+            raw_data=self._buffer.read(self._last_seq, self._last_seq + self._last_frames),
+            sample_rate=self.sample_rate
+        )
+    
+    def read_last(self, seconds: float) -> np.ndarray:
+        """
+        Get the most recent audio from the ring buffer.
+        
+        Args:
+            seconds: Amount of audio to return
+            
+        Returns:
+            Array of shape (frames, channels); a zero-copy view unless the
+            range wraps around the end of the buffer
+        """
+        return self._buffer.read_last(int(seconds * self.sample_rate))
+    
+    def read_since(self, seq: int):
+        """
+        Get all audio captured since a previous position.
+        
+        Args:
+            seq: Position returned by an earlier call (0 for everything held)
+            
+        Returns:
+            Tuple of (frames, next_seq)
+        """
+        return self._buffer.read_since(seq)
+    
+    def capture_time(self, seq: int) -> float:
+        """
+        Estimate when a frame was captured.
+        
+        Args:
+            seq: Ring buffer position of the frame, still held in the buffer
+            
+        Returns:
+            UNIX time, from the arrival time of the frame's block minus the
+            frames that follow it in the block
+        """
+        block = seq // self.block_size
+        arrived = self._block_times[block % len(self._block_times)]
+        return float(arrived - ((block + 1) * self.block_size - 1 - seq) / self.sample_rate)
+    
+    def get_device_info(self) -> Optional[Dict[str, Any]]:
+        """Get name and sample rate of the selected device, if known."""
+        return self._device_info
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get capture counters.
+        
+        Returns:
+            Dictionary with processing mode, block counters and PortAudio
+            overflow/underflow counts
+        """
+        return {
+            'mode': 'worker' if self.worker_thread else 'callback',
+            'blocks_captured': self._blocks_captured,
+            'blocks_processed': self._blocks_processed,
+            'dropped_blocks': self._dropped_blocks,
+            'input_overflows': self._input_overflows,
+            'input_underflows': self._input_underflows
+        }
     
     def is_running(self) -> bool:
         """Check if audio capture is running."""
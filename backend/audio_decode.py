@@ -0,0 +1,347 @@
+"""
+Fast decoding of uploaded audio for the classifier.
+
+``librosa.load`` goes through soundfile/audioread and a high-quality
+resampler even when an upload is already 16 kHz mono PCM. Most uploads are
+plain WAV files, so ``load_audio`` parses the RIFF header itself and reads
+the samples with ``np.frombuffer``: float32 mono data at the target rate is
+returned without any copy, integer PCM takes one conversion pass. Only a
+different sample rate costs a resample, done by soxr's polyphase resampler
+(the one librosa uses by default, called directly) or, without soxr, scipy's
+``resample_poly`` (44.1 kHz -> 16 kHz is 160/441, 48 kHz -> 16 kHz is 1/3).
+Anything else (compressed WAV, RF64, other containers) falls back to librosa.
+
+Long recordings don't have to fit in memory: ``stream_audio`` decodes a file
+on disk block by block with a stateful resampler, and ``overlapping_windows``
+regroups the blocks into fixed-size windows for the model.
+"""
+
+import io
+import logging
+import mmap
+import struct
+import time
+from fractions import Fraction
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Largest up/down factor resampled with the polyphase filter; beyond it the
+# filter gets long and librosa's resampler is faster
+MAX_POLYPHASE_FACTOR = 1024
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class UnsupportedAudioError(ValueError):
+    """Raised when data is not a WAV file the fast path can decode."""
+    pass
+
+
+def _pcm24_to_float(raw: Buffer) -> np.ndarray:
+    """Convert packed little-endian 24-bit samples to float32."""
+    triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+    values = np.where(values >= 1 << 23, values - (1 << 24), values)
+    return values.astype(np.float32) * np.float32(1 / (1 << 23))
+
+
+def parse_wav_header(data: Buffer) -> Tuple[int, int, int, int, int, int]:
+    """
+    Find the format and the sample data of a RIFF/WAVE file.
+
+    Returns:
+        Tuple of (format tag, channels, sample rate, bits per sample,
+        data offset, data length in bytes)
+
+    Raises:
+        UnsupportedAudioError: If the data is not a RIFF/WAVE file, has no
+            fmt or data chunk, or its fmt chunk is cut off
+    """
+    # Released on the way out, so an mmap passed in can be closed even after an error
+    with memoryview(data) as view:
+        if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+            raise UnsupportedAudioError("Not a RIFF/WAVE file")
+
+        fmt = None
+        offset = 12
+        while offset + 8 <= len(view):
+            chunk_id = view[offset:offset + 4].tobytes()
+            (size,) = struct.unpack_from("<I", view, offset + 4)
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                # Up to the SubFormat GUID of WAVE_FORMAT_EXTENSIBLE
+                if size < 16 or body + min(size, 26) > len(view):
+                    raise UnsupportedAudioError("Truncated fmt chunk")
+                tag, channels, rate, _, block_align, bits = struct.unpack_from("<HHIIHH", view, body)
+                if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    # The real format is the first two bytes of the SubFormat GUID
+                    (tag,) = struct.unpack_from("<H", view, body + 24)
+                fmt = (tag, channels, rate, bits, block_align)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise UnsupportedAudioError("data chunk before fmt chunk")
+                # Streamed files may leave the size at 0 or 0xFFFFFFFF; take what's there
+                available = len(view) - body
+                length = available if size in (0, 0xFFFFFFFF) else min(size, available)
+                tag, channels, rate, bits, block_align = fmt
+                if block_align:
+                    length -= length % block_align
+                return tag, channels, rate, bits, body, length
+            offset = body + size + (size & 1)
+        raise UnsupportedAudioError("No data chunk" if fmt else "No fmt chunk")
+
+
+def decode_wav(data: Buffer) -> Tuple[np.ndarray, int]:
+    """
+    Decode an uncompressed WAV file to mono float32 samples.
+
+    Supports 8/16/24/32-bit integer and 32/64-bit float PCM, also in
+    WAVE_FORMAT_EXTENSIBLE files. Float32 mono data is returned as a
+    read-only view of ``data``.
+
+    Returns:
+        Tuple of (samples in [-1, 1], sample rate)
+
+    Raises:
+        UnsupportedAudioError: For anything else
+    """
+    tag, channels, rate, bits, offset, length = parse_wav_header(data)
+    _check_format(tag, channels, rate, bits)
+    return _decode_samples(memoryview(data)[offset:offset + length], tag, bits, channels), rate
+
+
+def _check_format(tag: int, channels: int, rate: int, bits: int) -> None:
+    if channels < 1 or rate < 1:
+        raise UnsupportedAudioError(f"Invalid WAV format: {channels} channels at {rate} Hz")
+    if (tag, bits) not in ((WAVE_FORMAT_PCM, 8), (WAVE_FORMAT_PCM, 16), (WAVE_FORMAT_PCM, 24),
+                           (WAVE_FORMAT_PCM, 32), (WAVE_FORMAT_IEEE_FLOAT, 32), (WAVE_FORMAT_IEEE_FLOAT, 64)):
+        raise UnsupportedAudioError(f"Unsupported WAV encoding: format 0x{tag:04x}, {bits} bits")
+
+
+def _decode_samples(raw: Buffer, tag: int, bits: int, channels: int) -> np.ndarray:
+    """Convert interleaved sample data of a checked format to mono float32."""
+    if tag == WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) * np.float32(1 / 32768)
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        samples = np.frombuffer(raw, dtype="<f4")
+    elif tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) * np.float32(1 / 128)
+    elif tag == WAVE_FORMAT_PCM and bits == 24:
+        samples = _pcm24_to_float(raw)
+    elif tag == WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) * np.float32(1 / (1 << 31))
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits == 64:
+        samples = np.frombuffer(raw, dtype="<f8").astype(np.float32)
+    else:
+        raise UnsupportedAudioError(f"Unsupported WAV encoding: format 0x{tag:04x}, {bits} bits")
+
+    if channels > 1:
+        samples = _mixdown(samples, channels)
+    return samples
+
+
+def _mixdown(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Average interleaved channels; summing columns is much faster than mean(axis=1)."""
+    frames = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    mono = frames[:, 0].copy()
+    for channel in range(1, channels):
+        mono += frames[:, channel]
+    mono *= np.float32(1 / channels)
+    return mono
+
+
+def resample(samples: np.ndarray, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample mono audio with soxr, or scipy's polyphase filter for rational ratios.
+
+    Returns ``samples`` itself when the rates match.
+    """
+    if orig_sr == target_sr:
+        return samples
+    try:
+        import soxr
+        return soxr.resample(samples, orig_sr, target_sr, quality="HQ").astype(np.float32, copy=False)
+    except ImportError:
+        pass
+    ratio = Fraction(target_sr, orig_sr)
+    if max(ratio.numerator, ratio.denominator) <= MAX_POLYPHASE_FACTOR:
+        from scipy.signal import resample_poly
+        return resample_poly(samples, ratio.numerator, ratio.denominator).astype(np.float32, copy=False)
+    import librosa
+    return librosa.resample(samples, orig_sr=orig_sr, target_sr=target_sr).astype(np.float32, copy=False)
+
+
+def load_audio(data: Buffer, sr: int = TARGET_SAMPLE_RATE,
+               timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Decode audio file contents to mono float32 samples at ``sr``.
+
+    WAV files take the fast path above; other formats go through
+    ``librosa.load``. The result may be a read-only view of ``data``.
+
+    Args:
+        data: Audio file contents
+        sr: Target sample rate
+        timings: If given, the seconds spent decoding and resampling are
+            stored under "decode" and "resample" (librosa's resampling
+            counts as decoding)
+    """
+    started = time.perf_counter()
+    try:
+        samples, rate = decode_wav(data)
+    except UnsupportedAudioError as e:
+        logger.debug(f"Decoding with librosa: {e}")
+        import librosa
+        samples, _ = librosa.load(io.BytesIO(bytes(data)), sr=sr, mono=True)
+        rate = sr
+    decoded = time.perf_counter()
+    samples = resample(samples, rate, sr)
+    if timings is not None:
+        timings["decode"] = decoded - started
+        timings["resample"] = time.perf_counter() - decoded
+    return samples.astype(np.float32, copy=False)
+
+
+class StreamResampler:
+    """
+    Resample consecutive blocks of one signal as if they were one array.
+
+    soxr's stream resampler keeps its filter state between blocks, so there
+    are no edge effects at block boundaries. Without soxr each block is
+    resampled on its own.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE):
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self._stream = None
+        if orig_sr != target_sr:
+            try:
+                import soxr
+                self._stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype="float32", quality="HQ")
+            except ImportError:
+                logger.debug("soxr is not installed; resampling stream blocks independently")
+
+    def process(self, samples: np.ndarray, last: bool = False) -> np.ndarray:
+        """Resample the next block; ``last`` flushes the filter delay."""
+        samples = np.asarray(samples, dtype=np.float32)
+        if self._stream is not None:
+            return self._stream.resample_chunk(samples, last=last)
+        return resample(samples, self.orig_sr, self.target_sr)
+
+
+def stream_audio(path: str, sr: int = TARGET_SAMPLE_RATE, block_frames: int = 65536) -> Iterator[np.ndarray]:
+    """
+    Decode an audio file block by block to mono float32 at ``sr``.
+
+    WAV headers are parsed from a memory map and the samples read and decoded
+    like ``decode_wav`` one block at a time; other formats are read with
+    soundfile. The file header is checked before this returns,
+    so unreadable files fail here rather than on the first block. Memory use
+    depends on ``block_frames``, not on the length of the file.
+
+    Raises:
+        UnsupportedAudioError: If the file is neither a supported WAV file nor
+            readable by soundfile
+    """
+    f = open(path, "rb")
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        f.close()
+        raise UnsupportedAudioError("Empty file")
+    try:
+        tag, channels, rate, bits, offset, length = parse_wav_header(mapped)
+        _check_format(tag, channels, rate, bits)
+    except UnsupportedAudioError as e:
+        f.close()
+        logger.debug(f"Streaming with soundfile: {e}")
+        return _stream_soundfile(path, sr, block_frames)
+    except BaseException:
+        f.close()
+        raise
+    finally:
+        mapped.close()
+    return _stream_wav(f, tag, channels, rate, bits, offset, length, sr, block_frames)
+
+
+def _stream_wav(f, tag: int, channels: int, rate: int, bits: int, offset: int, length: int,
+                sr: int, block_frames: int) -> Iterator[np.ndarray]:
+    resampler = StreamResampler(rate, sr)
+    block_bytes = block_frames * channels * (bits // 8)
+    try:
+        # Plain reads rather than the memory map: mapped pages stay resident
+        # and would make the process grow with the file
+        f.seek(offset)
+        while length > 0:
+            raw = f.read(min(block_bytes, length))
+            if not raw:
+                break
+            length -= len(raw)
+            yield resampler.process(_decode_samples(raw, tag, bits, channels))
+        if resampler.orig_sr != sr:
+            yield resampler.process(np.empty(0, dtype=np.float32), last=True)
+    finally:
+        f.close()
+
+
+def _stream_soundfile(path: str, sr: int, block_frames: int) -> Iterator[np.ndarray]:
+    try:
+        import soundfile
+        sound_file = soundfile.SoundFile(path)
+    except (ImportError, RuntimeError) as e:
+        logger.debug(f"soundfile cannot open {path}: {e}")
+        raise UnsupportedAudioError("Not a supported WAV file and not readable by soundfile")
+
+    def blocks():
+        resampler = StreamResampler(sound_file.samplerate, sr)
+        with sound_file:
+            for block in sound_file.blocks(block_frames, dtype="float32", always_2d=True):
+                yield resampler.process(_mixdown(block.reshape(-1), block.shape[1]) if block.shape[1] > 1 else block[:, 0])
+        if resampler.orig_sr != sr:
+            yield resampler.process(np.empty(0, dtype=np.float32), last=True)
+
+    return blocks()
+
+
+def overlapping_windows(blocks: Iterable[np.ndarray], window: int, step: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Regroup a stream of sample blocks into windows of ``window`` samples
+    starting every ``step`` samples.
+
+    Only one window of samples is buffered. The last window is shorter when
+    the stream ends inside it, and is left out when it would only repeat the
+    previous window's overlap. A stream with no samples yields nothing.
+
+    Yields:
+        Tuple of (first sample index, window samples)
+    """
+    if not 0 < step <= window:
+        raise ValueError(f"step must be in (0, window], got {step} for window {window}")
+    overlap = window - step
+    buffer = np.empty(window, dtype=np.float32)
+    filled = 0
+    start = 0
+    for block in blocks:
+        position = 0
+        while position < len(block):
+            taken = min(window - filled, len(block) - position)
+            buffer[filled:filled + taken] = block[position:position + taken]
+            filled += taken
+            position += taken
+            if filled == window:
+                yield start, buffer.copy()
+                buffer[:overlap] = buffer[step:]
+                filled = overlap
+                start += step
+    if filled > overlap or (start == 0 and filled > 0):
+        yield start, buffer[:filled].copy()
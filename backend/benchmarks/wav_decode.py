@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of upload decoding: ``audio_decode.load_audio`` vs ``librosa.load``.
+
+Builds WAV files in memory in the formats uploads usually come in and times
+decoding each to 16 kHz mono float32, reporting the median time per file,
+the speedup and the largest sample difference between the two decoders.
+
+Usage:
+    python benchmarks/wav_decode.py
+    python benchmarks/wav_decode.py --seconds 30 --repeats 20 --json results.json
+
+librosa is optional; without it only the fast path is timed.
+"""
+
+import argparse
+import io
+import json
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+from audio_decode import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, load_audio  # noqa: E402
+
+# (name, sample rate, channels, format tag, bits per sample)
+CASES = [
+    ("16 kHz mono int16", 16000, 1, WAVE_FORMAT_PCM, 16),
+    ("16 kHz mono float32", 16000, 1, WAVE_FORMAT_IEEE_FLOAT, 32),
+    ("44.1 kHz stereo int16", 44100, 2, WAVE_FORMAT_PCM, 16),
+    ("48 kHz mono int16", 48000, 1, WAVE_FORMAT_PCM, 16),
+    ("48 kHz stereo int24", 48000, 2, WAVE_FORMAT_PCM, 24),
+]
+
+
+def make_wav(seconds: float, rate: int, channels: int, tag: int, bits: int) -> bytes:
+    """A WAV file of noisy tones."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    signal = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(len(t))
+    frames = np.repeat(signal[:, None], channels, axis=1).reshape(-1)
+    if tag == WAVE_FORMAT_IEEE_FLOAT:
+        data = frames.astype("<f4").tobytes()
+    elif bits == 24:
+        values = np.round(frames * ((1 << 23) - 1)).astype("<i4")
+        data = values.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    else:
+        data = np.round(frames * 32767).astype("<i2").tobytes()
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", tag, channels, rate, rate * block_align, block_align, bits)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def median_seconds(func: Callable[[], Any], repeats: int) -> float:
+    func()
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+
+def run(args) -> List[Dict[str, Any]]:
+    try:
+        import librosa
+    except ImportError:
+        librosa = None
+        print("librosa is not installed; timing the fast path only")
+
+    results = []
+    for name, rate, channels, tag, bits in CASES:
+        data = make_wav(args.seconds, rate, channels, tag, bits)
+        fast = median_seconds(lambda: load_audio(data), args.repeats)
+        result = {"case": name, "bytes": len(data), "fast_ms": round(fast * 1000, 3)}
+        if librosa is not None:
+            reference = median_seconds(lambda: librosa.load(io.BytesIO(data), sr=16000, mono=True), args.repeats)
+            ours, theirs = load_audio(data), librosa.load(io.BytesIO(data), sr=16000, mono=True)[0]
+            n = min(len(ours), len(theirs))
+            result.update({
+                "librosa_ms": round(reference * 1000, 3),
+                "speedup": round(reference / fast, 1),
+                "max_abs_diff": float(np.max(np.abs(ours[:n] - theirs[:n])))
+            })
+        results.append(result)
+    return results
+
+
+def print_report(results: List[Dict[str, Any]], seconds: float) -> None:
+    print(f"Decoding {seconds:g} s files to 16 kHz mono float32 (median per file)")
+    print(f"{'case':<24}{'fast ms':>10}{'librosa ms':>12}{'speedup':>9}{'max diff':>10}")
+    for r in results:
+        librosa_ms = f"{r['librosa_ms']:.2f}" if "librosa_ms" in r else "-"
+        speedup = f"{r['speedup']:.1f}x" if "speedup" in r else "-"
+        diff = f"{r['max_abs_diff']:.1e}" if "max_abs_diff" in r else "-"
+        print(f"{r['case']:<24}{r['fast_ms']:>10.2f}{librosa_ms:>12}{speedup:>9}{diff:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of each test file")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per decoder and case")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print_report(results, args.seconds)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Load test for the /ws/audio level fan-out.
+
+Starts the audio routers in a separate server process fed by a synthetic
+capture source (``AUDIO_SOURCE=synthetic`` unless set otherwise, so no
+microphone is needed), opens many WebSocket clients from a
+single asyncio process and reports:
+
+- delivery latency percentiles (p50/p95/p99), measured from the capture time
+  of the newest block in a frame to its arrival at the client, so it includes
+  the up to ``1 / rate`` seconds a block waits for its tier to tick
+- server CPU usage and memory growth during the measurement
+- frames dropped by the server (slow-client queue overflows) and blocks
+  missing from the sequence numbers seen by the clients
+
+Usage:
+    python benchmarks/ws_fanout.py --clients 500 --duration 30
+    python benchmarks/ws_fanout.py --clients 2000 --rate 30 --binary --json results.json
+
+Requires ``websockets`` and ``uvicorn``; ``psutil`` is needed for the CPU and
+memory figures.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+from level_stream import BINARY_SUBPROTOCOL, unpack_levels  # noqa: E402
+
+try:
+    import psutil
+except ImportError:  # CPU and memory are reported as unavailable
+    psutil = None
+
+
+def _raise_fd_limit() -> None:
+    """Allow as many sockets as the hard limit permits (Unix only)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):  # e.g. macOS refuses an unlimited hard limit
+            pass
+
+
+def serve(host: str, port: int) -> None:
+    """Run the audio endpoints (server process)."""
+    import uvicorn
+    from fastapi import APIRouter, FastAPI
+
+    import routers.audio_capture as audio_router
+
+    # Only the audio routers are mounted: loading the classifier model
+    # would only slow down startup without affecting the fan-out
+    app = FastAPI()
+    api_router = APIRouter(prefix="/api/v1")
+    api_router.include_router(audio_router.router)
+    app.include_router(api_router)
+    app.include_router(audio_router.ws_router)
+
+    _raise_fd_limit()
+    uvicorn.run(app, host=host, port=port, log_level="warning")
+
+
+class ClientStats:
+    """Counters of one simulated client."""
+
+    __slots__ = ("frames", "missing_blocks", "gaps", "next_seq", "errors")
+
+    def __init__(self):
+        self.frames = 0
+        self.missing_blocks = 0
+        self.gaps = 0
+        self.next_seq: Optional[int] = None
+        self.errors = 0
+
+
+async def run_client(uri: str, rate: float, binary: bool, stats: ClientStats,
+                     latencies: List[float], measuring: asyncio.Event,
+                     connected: asyncio.Semaphore) -> None:
+    """Receive level frames until cancelled, recording latency and gaps."""
+    import websockets
+
+    subprotocols = [BINARY_SUBPROTOCOL] if binary else None
+    try:
+        async with connected:
+            ws = await websockets.connect(uri, subprotocols=subprotocols, max_size=None,
+                                          open_timeout=60)
+        async with ws:
+            await ws.send(json.dumps({
+                "type": "subscribe", "rate": rate, "format": "binary" if binary else "json"
+            }))
+            async for message in ws:
+                received = time.time()
+                if isinstance(message, bytes):
+                    frame = unpack_levels(message)
+                    count = len(frame["timestamps"])
+                    if not count:
+                        continue
+                    first = frame["first_index"]
+                    captured = float(frame["timestamps"][-1])
+                else:
+                    frame = json.loads(message)
+                    if frame.get("type") != "audio_level":
+                        continue
+                    count = frame["blocks"]
+                    first = frame["seq"] - count + 1
+                    captured = frame["t"]
+
+                if not measuring.is_set():
+                    # Warm-up, including the switch from the default tier
+                    stats.next_seq = first + count
+                    continue
+                stats.frames += 1
+                latencies.append(received - captured)
+                if stats.next_seq is not None and first > stats.next_seq:
+                    stats.missing_blocks += first - stats.next_seq
+                    stats.gaps += 1
+                stats.next_seq = first + count
+    except Exception:
+        stats.errors += 1
+
+
+def _get_json(url: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+def _wait_for_server(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _get_json(f"{base_url}/api/v1/audio/status")
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError("server did not start")
+            time.sleep(0.2)
+
+
+class ProcessProbe:
+    """CPU time and memory of the server process."""
+
+    def __init__(self, pid: int):
+        self.process = psutil.Process(pid) if psutil else None
+
+    def sample(self) -> Optional[Dict[str, float]]:
+        if self.process is None:
+            return None
+        times = self.process.cpu_times()
+        return {
+            "cpu": times.user + times.system,
+            "rss": self.process.memory_info().rss,
+            "wall": time.monotonic()
+        }
+
+
+async def load_test(args) -> Dict[str, Any]:
+    """Connect the clients, measure for ``args.duration`` seconds and summarize."""
+    base_url = f"http://{args.host}:{args.port}"
+    uri = f"ws://{args.host}:{args.port}/ws/audio"
+
+    measuring = asyncio.Event()
+    connected = asyncio.Semaphore(args.connect_concurrency)
+    latencies: List[float] = []
+    clients = [ClientStats() for _ in range(args.clients)]
+
+    connect_start = time.monotonic()
+    tasks = [
+        asyncio.create_task(run_client(uri, args.rate, args.binary, stats, latencies,
+                                       measuring, connected))
+        for stats in clients
+    ]
+    # Wait until every client has connected (or given up)
+    while True:
+        status = await asyncio.to_thread(_get_json, f"{base_url}/api/v1/audio/status")
+        failed = sum(1 for stats in clients if stats.errors)
+        if status["active_connections"] + failed >= args.clients:
+            break
+        await asyncio.sleep(0.2)
+    connect_seconds = time.monotonic() - connect_start
+    await asyncio.sleep(args.warmup)
+
+    probe = ProcessProbe(args.server_pid)
+    server_before = probe.sample()
+    status_before = await asyncio.to_thread(_get_json, f"{base_url}/api/v1/audio/status")
+    client_cpu_before = time.process_time()
+    measuring.set()
+    measure_start = time.monotonic()
+    await asyncio.sleep(args.duration)
+    measured = time.monotonic() - measure_start
+    measuring.clear()
+    server_after = probe.sample()
+    client_cpu = time.process_time() - client_cpu_before
+    status_after = await asyncio.to_thread(_get_json, f"{base_url}/api/v1/audio/status")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    lat_ms = np.array(latencies) * 1000.0
+    frames = sum(stats.frames for stats in clients)
+    hub_before, hub_after = status_before["websocket"], status_after["websocket"]
+    result = {
+        "clients": args.clients,
+        "connected": status_before["active_connections"],
+        "client_errors": sum(stats.errors for stats in clients),
+        "rate": args.rate,
+        "format": "binary" if args.binary else "json",
+        "duration": measured,
+        "connect_seconds": connect_seconds,
+        "frames_received": frames,
+        "frames_per_second": frames / measured if measured else 0.0,
+        "latency_ms": {
+            "p50": float(np.percentile(lat_ms, 50)) if len(lat_ms) else None,
+            "p95": float(np.percentile(lat_ms, 95)) if len(lat_ms) else None,
+            "p99": float(np.percentile(lat_ms, 99)) if len(lat_ms) else None,
+            "max": float(lat_ms.max()) if len(lat_ms) else None
+        },
+        "server_dropped_frames": hub_after["dropped"] - hub_before["dropped"],
+        "missing_blocks": sum(stats.missing_blocks for stats in clients),
+        "sequence_gaps": sum(stats.gaps for stats in clients),
+        "capture_dropped_blocks": (status_after["stats"] or {}).get("dropped_blocks"),
+        "load_generator_cpu_percent": 100.0 * client_cpu / measured if measured else None
+    }
+    if server_before and server_after:
+        wall = server_after["wall"] - server_before["wall"]
+        result["server_cpu_percent"] = 100.0 * (server_after["cpu"] - server_before["cpu"]) / wall
+        result["server_rss_mb"] = server_after["rss"] / 2**20
+        result["server_rss_growth_mb"] = (server_after["rss"] - server_before["rss"]) / 2**20
+    return result
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    latency = result["latency_ms"]
+    print(f"clients:            {result['connected']}/{result['clients']} connected "
+          f"in {result['connect_seconds']:.1f}s ({result['client_errors']} errors)")
+    print(f"stream:             {result['rate']:g}/s {result['format']} for {result['duration']:.1f}s")
+    print(f"frames received:    {result['frames_received']} ({result['frames_per_second']:.0f}/s)")
+    if latency["p50"] is not None:
+        print(f"latency (ms):       p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  "
+              f"p99 {latency['p99']:.1f}  max {latency['max']:.1f}")
+    print(f"dropped frames:     {result['server_dropped_frames']} by the server, "
+          f"{result['missing_blocks']} blocks missing in {result['sequence_gaps']} gaps")
+    if "server_cpu_percent" in result:
+        print(f"server CPU:         {result['server_cpu_percent']:.0f}%")
+        print(f"server memory:      {result['server_rss_mb']:.1f} MB "
+              f"({result['server_rss_growth_mb']:+.1f} MB during the run)")
+    else:
+        print("server CPU/memory:  unavailable (install psutil)")
+    print(f"load generator CPU: {result['load_generator_cpu_percent']:.0f}%")
+    total_cpu = result.get("server_cpu_percent", 0.0) + result["load_generator_cpu_percent"]
+    if total_cpu > 90.0 * (os.cpu_count() or 1):
+        print("warning: server and load generator used all CPUs; latencies are an upper bound")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=500, help="Number of WebSocket clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measurement length in seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds to wait after connecting")
+    parser.add_argument("--rate", type=float, default=10.0, help="Level frames per second per client")
+    parser.add_argument("--binary", action="store_true", help="Request binary level frames")
+    parser.add_argument("--connect-concurrency", type=int, default=100,
+                        help="Maximum simultaneous connection attempts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.host, args.port)
+        return 0
+
+    _raise_fd_limit()
+    server = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--serve",
+         "--host", args.host, "--port", str(args.port)],
+        cwd=str(BACKEND_DIR),
+        env=dict(os.environ, AUDIO_SOURCE=os.environ.get("AUDIO_SOURCE", "synthetic"))
+    )
+    try:
+        _wait_for_server(f"http://{args.host}:{args.port}")
+        args.server_pid = server.pid
+        result = asyncio.run(load_test(args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print_report(result)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
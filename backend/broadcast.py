@@ -0,0 +1,207 @@
+"""
+WebSocket broadcast hub for SoundTracker.
+
+Audio levels are produced on the capture thread, but WebSockets can only be
+written from the event loop. The hub bridges the two: producers hand messages
+to the loop with ``publish_threadsafe``, each message is serialized once, and
+every client gets a small bounded queue drained by its own sender task. A slow
+client only ever loses its own oldest messages; it can't hold up anyone else or
+make memory grow.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional, Set, Union
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Default number of broadcast messages buffered per client
+DEFAULT_QUEUE_SIZE = 8
+
+# Control messages buffered per client; only a client that sends requests
+# faster than it reads the replies ever fills this
+CONTROL_QUEUE_SIZE = 64
+
+Message = Union[str, bytes]
+
+
+async def _send(websocket: WebSocket, message: Message) -> None:
+    """Send a serialized message as a text or binary frame."""
+    if isinstance(message, bytes):
+        await websocket.send_bytes(message)
+    else:
+        await websocket.send_text(message)
+
+
+class Subscriber:
+    """
+    One connected WebSocket client.
+
+    Broadcast messages go into a bounded queue that drops the oldest entry when
+    full. Control messages (replies to the client's own requests) go into a
+    separate queue that is always sent first; it is bounded too, so a client
+    that keeps asking without reading loses its oldest replies.
+    """
+
+    __slots__ = ("websocket", "channels", "queue", "control", "sent", "dropped", "control_dropped",
+                 "_ready", "_task")
+
+    def __init__(self, websocket: WebSocket, max_queue: int = DEFAULT_QUEUE_SIZE):
+        self.websocket = websocket
+        self.channels: Set[Hashable] = set()
+        self.queue = deque(maxlen=max_queue)
+        self.control = deque(maxlen=CONTROL_QUEUE_SIZE)
+        self.sent = 0
+        self.dropped = 0
+        self.control_dropped = 0
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def offer(self, message: Message) -> None:
+        """Queue a broadcast message, dropping the oldest one if the queue is full."""
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(message)
+        self._ready.set()
+
+    def send(self, message: Union[Message, Dict[str, Any]]) -> None:
+        """Queue a control message for this client only."""
+        if isinstance(message, dict):
+            message = json.dumps(message)
+        if len(self.control) == self.control.maxlen:
+            self.control_dropped += 1
+        self.control.append(message)
+        self._ready.set()
+
+    async def run(self) -> None:
+        """Send queued messages until the connection fails or the task is cancelled."""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self.control or self.queue:
+                message = self.control.popleft() if self.control else self.queue.popleft()
+                await _send(self.websocket, message)
+                self.sent += 1
+
+
+class BroadcastHub:
+    """
+    Fan-out of messages from any thread to connected WebSocket clients.
+
+    Messages are either broadcast to every client or published on a channel,
+    in which case only the clients subscribed to that channel receive them.
+    """
+
+    def __init__(self, max_queue: int = DEFAULT_QUEUE_SIZE):
+        """
+        Initialize the hub.
+
+        Args:
+            max_queue: Broadcast messages buffered per client before dropping
+        """
+        self.max_queue = max_queue
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: List[Subscriber] = []
+        self._channels: Dict[Hashable, List[Subscriber]] = {}
+        self._published = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Set the event loop that owns the WebSocket connections."""
+        self._loop = loop
+
+    def add(self, websocket: WebSocket) -> Subscriber:
+        """Register an accepted WebSocket and start its sender task."""
+        subscriber = Subscriber(websocket, self.max_queue)
+        subscriber._task = asyncio.get_running_loop().create_task(self._run(subscriber))
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def remove(self, subscriber: Subscriber) -> None:
+        """Unregister a client and stop its sender task."""
+        self._discard(subscriber)
+        if subscriber._task is not None and not subscriber._task.done():
+            subscriber._task.cancel()
+
+    async def _run(self, subscriber: Subscriber) -> None:
+        try:
+            await subscriber.run()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Error sending to WebSocket, will disconnect: {e}")
+            self._discard(subscriber)
+
+    def _discard(self, subscriber: Subscriber) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+        for channel in list(subscriber.channels):
+            self.unsubscribe(subscriber, channel)
+
+    def subscribe(self, subscriber: Subscriber, channel: Hashable) -> None:
+        """Add a client to a channel."""
+        if channel not in subscriber.channels:
+            subscriber.channels.add(channel)
+            self._channels.setdefault(channel, []).append(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber, channel: Hashable) -> None:
+        """Remove a client from a channel."""
+        if channel in subscriber.channels:
+            subscriber.channels.discard(channel)
+            members = self._channels.get(channel, [])
+            if subscriber in members:
+                members.remove(subscriber)
+            if not members:
+                self._channels.pop(channel, None)
+
+    def channel_size(self, channel: Hashable) -> int:
+        """Number of clients subscribed to a channel."""
+        return len(self._channels.get(channel, ()))
+
+    def publish(self, message: Union[Message, Dict[str, Any]],
+                channel: Optional[Hashable] = None) -> None:
+        """
+        Send a message to every client, or to the subscribers of ``channel``.
+        Must be called on the event loop.
+
+        Dictionaries are serialized to JSON once and the same string is queued
+        for every recipient.
+        """
+        targets = self._subscribers if channel is None else self._channels.get(channel)
+        if not targets:
+            return
+        if isinstance(message, dict):
+            message = json.dumps(message)
+        self._published += 1
+        for subscriber in targets:
+            subscriber.offer(message)
+
+    def publish_threadsafe(self, message: Union[Message, Dict[str, Any]],
+                           channel: Optional[Hashable] = None) -> None:
+        """Send a message from any thread; see ``publish``."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self.publish, message, channel)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get broadcast counters."""
+        return {
+            "clients": len(self._subscribers),
+            "channels": {str(c): len(m) for c, m in self._channels.items()},
+            "published": self._published,
+            "sent": sum(s.sent for s in self._subscribers),
+            "dropped": sum(s.dropped for s in self._subscribers),
+            "control_dropped": sum(s.control_dropped for s in self._subscribers),
+            "max_queue": self.max_queue
+        }
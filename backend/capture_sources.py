@@ -0,0 +1,352 @@
+"""
+Alternative audio sources for AudioCapture.
+
+By default ``AudioCapture`` records from a sound device through sounddevice.
+The sources in this module replace the device with a WAV/FLAC file or a
+synthetic signal, so the whole capture -> classify -> persist -> broadcast
+pipeline can run on machines without a sound card. Their streams call the
+capture's regular ``_audio_callback`` with float32 blocks of exactly
+``block_size`` frames from a background thread, just like PortAudio does.
+
+Sources can run in real time, at N times real time, or as fast as the
+capture can process blocks (``speed=0``). In that last mode the stream waits
+whenever the capture worker falls behind, so no block is ever dropped and
+results are reproducible.
+"""
+
+import logging
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):  # Only WAV files can be replayed without it
+    sf = None
+
+logger = logging.getLogger(__name__)
+
+# Spec accepted by ``source_from_spec`` for the default synthetic program
+DEFAULT_SYNTHETIC_PROGRAM = "tone:1:freq=440,noise:0.5:amp=0.3,silence:1"
+
+
+class ReplayStream:
+    """
+    Thread delivering blocks from an iterator to an audio callback.
+
+    Mimics the ``start``/``stop``/``close`` interface of
+    ``sounddevice.InputStream``.
+    """
+
+    def __init__(self,
+                 blocks: Iterator[np.ndarray],
+                 callback: Callable,
+                 sample_rate: int,
+                 block_size: int,
+                 speed: float = 1.0,
+                 backlog: Optional[Callable[[], int]] = None,
+                 max_backlog: int = 0):
+        """
+        Initialize the stream.
+
+        Args:
+            blocks: Iterator of float32 arrays of shape (block_size, channels)
+            callback: Called as ``callback(block, frames, None, None)``
+            sample_rate: Sample rate of the blocks in Hz
+            block_size: Frames per block
+            speed: Multiple of real time; 0 delivers blocks as fast as the
+                consumer keeps up
+            backlog: Returns the frames the consumer has not processed yet;
+                used to pace delivery when ``speed`` is 0
+            max_backlog: Frames allowed to be pending before waiting
+        """
+        self.blocks = blocks
+        self.callback = callback
+        self.interval = block_size / sample_rate / speed if speed > 0 else 0.0
+        self.backlog = backlog
+        self.max_backlog = max_backlog
+        self.blocks_delivered = 0
+        self.finished = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        next_block = time.monotonic()
+        try:
+            for block in self.blocks:
+                if not self._running:
+                    return
+                if self.interval:
+                    next_block += self.interval
+                    delay = next_block - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                elif self.backlog is not None:
+                    while self._running and self.backlog() > self.max_backlog:
+                        time.sleep(0.0005)
+                self.callback(block, len(block), None, None)
+                self.blocks_delivered += 1
+        except Exception as e:
+            logger.error(f"Error in replay stream: {e}", exc_info=True)
+        finally:
+            self.finished.set()
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="audio-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def close(self) -> None:
+        pass
+
+
+def _match_channels(data: np.ndarray, channels: int) -> np.ndarray:
+    """Mix down or duplicate channels so that ``data`` has ``channels`` columns."""
+    have = data.shape[1]
+    if have == channels:
+        return data
+    if channels == 1:
+        return data.mean(axis=1, keepdims=True)
+    if have == 1:
+        return np.repeat(data, channels, axis=1)
+    if have > channels:
+        return data[:, :channels]
+    return np.pad(data, ((0, 0), (0, channels - have)), mode="edge")
+
+
+def _reblock(chunks: Iterator[np.ndarray], block_size: int, channels: int) -> Iterator[np.ndarray]:
+    """Cut chunks of any length into blocks of exactly ``block_size`` frames."""
+    pending = np.zeros((0, channels), dtype=np.float32)
+    for chunk in chunks:
+        pending = np.concatenate((pending, _match_channels(chunk, channels).astype(np.float32)))
+        full = len(pending) // block_size * block_size
+        for start in range(0, full, block_size):
+            yield pending[start:start + block_size]
+        pending = pending[full:]
+    if len(pending):
+        # Pad the last block with silence so every block is complete
+        yield np.concatenate((pending, np.zeros((block_size - len(pending), channels), np.float32)))
+
+
+class CaptureSource:
+    """
+    Base class of non-device audio sources.
+
+    Attributes:
+        sample_rate: Native sample rate the capture should use, or None to
+            keep the capture's configured rate
+        speed: Multiple of real time (0: as fast as possible)
+    """
+
+    name = "source"
+    sample_rate: Optional[int] = None
+
+    def __init__(self, speed: float = 1.0):
+        if speed < 0:
+            raise ValueError("speed must not be negative")
+        self.speed = speed
+
+    def blocks(self, sample_rate: int, channels: int, block_size: int) -> Iterator[np.ndarray]:
+        """Yield float32 blocks of shape (block_size, channels)."""
+        raise NotImplementedError
+
+    def open(self, callback: Callable, sample_rate: int, channels: int, block_size: int,
+             backlog: Optional[Callable[[], int]] = None, max_backlog: int = 0) -> ReplayStream:
+        """Create a stream feeding ``callback``; see ``ReplayStream``."""
+        return ReplayStream(
+            self.blocks(sample_rate, channels, block_size),
+            callback, sample_rate, block_size,
+            speed=self.speed, backlog=backlog, max_backlog=max_backlog
+        )
+
+
+class FileSource(CaptureSource):
+    """Replays a WAV or FLAC file (FLAC and non-PCM WAV need ``soundfile``)."""
+
+    def __init__(self, path: str, loop: bool = False, speed: float = 1.0):
+        """
+        Initialize the source.
+
+        Args:
+            path: Audio file to replay
+            loop: Start over at the end of the file instead of stopping
+            speed: Multiple of real time (0: as fast as possible)
+        """
+        super().__init__(speed)
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileNotFoundError(f"Audio file not found: {path}")
+        self.loop = loop
+        self.name = f"file:{self.path.name}"
+        if sf is not None:
+            info = sf.info(str(self.path))
+            self.sample_rate, frames = info.samplerate, info.frames
+        else:
+            with wave.open(str(self.path), "rb") as f:
+                self.sample_rate, frames = f.getframerate(), f.getnframes()
+        if frames <= 0:
+            raise ValueError(f"Audio file is empty: {path}")
+
+    def _read_chunks(self, chunk_frames: int) -> Iterator[np.ndarray]:
+        """Read the file once as float32 chunks of shape (frames, channels)."""
+        if sf is not None:
+            yield from sf.blocks(str(self.path), blocksize=chunk_frames, dtype="float32", always_2d=True)
+            return
+        with wave.open(str(self.path), "rb") as f:
+            width, file_channels = f.getsampwidth(), f.getnchannels()
+            if width not in (1, 2, 4):
+                raise ValueError(f"Unsupported WAV sample width {width}; install soundfile")
+            while True:
+                raw = f.readframes(chunk_frames)
+                if not raw:
+                    return
+                if width == 1:
+                    data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+                else:
+                    dtype = "<i2" if width == 2 else "<i4"
+                    data = np.frombuffer(raw, dtype=dtype).astype(np.float32) / float(2 ** (8 * width - 1))
+                yield data.reshape(-1, file_channels)
+
+    def blocks(self, sample_rate: int, channels: int, block_size: int) -> Iterator[np.ndarray]:
+        def chunks():
+            while True:
+                frames = 0
+                for chunk in self._read_chunks(max(block_size, 16384)):
+                    frames += len(chunk)
+                    yield chunk
+                # Looping over nothing would spin the stream's thread
+                if not frames:
+                    raise ValueError(f"Audio file is empty: {self.path}")
+                if not self.loop:
+                    return
+        return _reblock(chunks(), block_size, channels)
+
+
+@dataclass
+class Segment:
+    """One part of a synthetic program."""
+    kind: str  # "tone", "noise" or "silence"
+    seconds: float
+    frequency: float = 440.0
+    amplitude: float = 0.1
+
+
+def parse_program(spec: str) -> List[Segment]:
+    """
+    Parse a synthetic program such as ``"tone:2:freq=1000:amp=0.5,silence:1,noise:0.2:amp=0.8"``.
+
+    Each comma-separated segment is ``kind:seconds`` followed by optional
+    ``freq=`` (tones) and ``amp=`` parameters.
+    """
+    segments = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, rest = part.partition(":")
+        fields = rest.split(":") if rest else []
+        if kind not in ("tone", "noise", "silence") or not fields:
+            raise ValueError(f"Invalid synthetic segment: {part!r}")
+        segment = Segment(kind, float(fields[0]))
+        if segment.seconds < 0:
+            raise ValueError(f"Invalid synthetic segment length: {part!r}")
+        for field in fields[1:]:
+            key, _, value = field.partition("=")
+            if key == "freq":
+                segment.frequency = float(value)
+            elif key == "amp":
+                segment.amplitude = float(value)
+            else:
+                raise ValueError(f"Invalid synthetic parameter: {field!r}")
+        segments.append(segment)
+    if not any(segment.seconds > 0 for segment in segments):
+        raise ValueError("Synthetic program is empty")
+    return segments
+
+
+class SyntheticSource(CaptureSource):
+    """Generates a repeatable program of tones, noise bursts and silence."""
+
+    name = "synthetic"
+
+    def __init__(self, program: str = DEFAULT_SYNTHETIC_PROGRAM, loop: bool = True,
+                 speed: float = 1.0, seed: int = 0):
+        """
+        Initialize the source.
+
+        Args:
+            program: Segments to play, see ``parse_program``
+            loop: Repeat the program instead of stopping after one pass
+            speed: Multiple of real time (0: as fast as possible)
+            seed: Seed for the noise generator
+        """
+        super().__init__(speed)
+        self.segments = parse_program(program)
+        self.loop = loop
+        self.seed = seed
+
+    def _render(self, segment: Segment, sample_rate: int, rng, phase: float):
+        frames = int(round(segment.seconds * sample_rate))
+        if segment.kind == "tone":
+            step = 2 * np.pi * segment.frequency / sample_rate
+            signal = segment.amplitude * np.sin(phase + step * np.arange(frames))
+            phase = (phase + step * frames) % (2 * np.pi)
+        elif segment.kind == "noise":
+            signal = segment.amplitude * rng.uniform(-1.0, 1.0, frames)
+        else:
+            signal = np.zeros(frames)
+        return signal.astype(np.float32)[:, None], phase
+
+    def blocks(self, sample_rate: int, channels: int, block_size: int) -> Iterator[np.ndarray]:
+        def chunks():
+            rng = np.random.default_rng(self.seed)
+            phase = 0.0
+            while True:
+                frames = 0
+                for segment in self.segments:
+                    # Render long segments piecewise to bound memory
+                    remaining = segment.seconds
+                    while remaining > 0:
+                        piece = Segment(segment.kind, min(remaining, 1.0), segment.frequency, segment.amplitude)
+                        chunk, phase = self._render(piece, sample_rate, rng, phase)
+                        remaining -= piece.seconds
+                        frames += len(chunk)
+                        yield chunk
+                # Segments too short for a single sample at this rate
+                if not frames:
+                    raise ValueError(f"Synthetic program has no samples at {sample_rate} Hz")
+                if not self.loop:
+                    return
+        return _reblock(chunks(), block_size, channels)
+
+
+def source_from_spec(spec: str, speed: float = 1.0, loop: bool = True) -> Optional[CaptureSource]:
+    """
+    Create a source from an ``AUDIO_SOURCE`` setting.
+
+    Args:
+        spec: ``"device"`` (or empty) for the sound device, ``"file:<path>"``,
+            ``"synthetic"`` or ``"synthetic:<program>"``
+        speed: Multiple of real time (0: as fast as possible)
+        loop: Repeat files and synthetic programs when they end
+
+    Returns:
+        The source, or None for the sound device
+    """
+    kind, _, arg = (spec or "device").partition(":")
+    kind = kind.strip().lower()
+    if kind == "device":
+        return None
+    if kind == "file":
+        return FileSource(arg, loop=loop, speed=speed)
+    if kind == "synthetic":
+        return SyntheticSource(arg or DEFAULT_SYNTHETIC_PROGRAM, loop=loop, speed=speed)
+    raise ValueError(f"Unknown audio source: {spec!r}")
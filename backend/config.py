@@ -30,12 +30,180 @@ class Settings(BaseSettings):
         default=int(os.getenv("AUDIO_BLOCK_SIZE", "1024")),
         description="Audio block size for processing"
     )
+    AUDIO_HISTORY_SECONDS: float = Field(
+        default=float(os.getenv("AUDIO_HISTORY_SECONDS", "600")),
+        description="Seconds of per-block audio levels kept in memory"
+    )
+    AUDIO_SOURCE: str = Field(
+        default=os.getenv("AUDIO_SOURCE", "device"),
+        description="Audio input: 'device', 'file:<path to WAV/FLAC>', 'synthetic' or 'synthetic:<program>'"
+    )
+    AUDIO_SOURCE_SPEED: float = Field(
+        default=float(os.getenv("AUDIO_SOURCE_SPEED", "1.0")),
+        description="Playback speed of file/synthetic sources as a multiple of real time (0: as fast as possible)"
+    )
+    AUDIO_SOURCE_LOOP: bool = Field(
+        default=os.getenv("AUDIO_SOURCE_LOOP", "true").lower() in ("1", "true", "yes"),
+        description="Restart file/synthetic sources when they end"
+    )
+    AUDIO_IDLE_STOP_SECONDS: float = Field(
+        default=float(os.getenv("AUDIO_IDLE_STOP_SECONDS", "60")),
+        description="Seconds audio capture keeps running after the last WebSocket client disconnects (negative: never stop)"
+    )
     
     # WebSocket settings
     WEBSOCKET_UPDATE_INTERVAL: float = Field(
         default=float(os.getenv("WEBSOCKET_UPDATE_INTERVAL", "0.1")),
         description="WebSocket update interval in seconds"
     )
+    WEBSOCKET_RATES: str = Field(
+        default=os.getenv("WEBSOCKET_RATES", "1,2,5,10,20,30"),
+        description="Comma-separated level update rates (per second) WebSocket clients can subscribe to"
+    )
+    WEBSOCKET_QUEUE_SIZE: int = Field(
+        default=int(os.getenv("WEBSOCKET_QUEUE_SIZE", "8")),
+        description="Broadcast messages buffered per WebSocket client before the oldest are dropped"
+    )
+    
+    # Spectrogram stream settings (sizes in samples at the capture rate)
+    SPECTROGRAM_N_FFT: int = Field(
+        default=int(os.getenv("SPECTROGRAM_N_FFT", "2048")),
+        description="FFT window size for the live spectrogram"
+    )
+    SPECTROGRAM_HOP_LENGTH: int = Field(
+        default=int(os.getenv("SPECTROGRAM_HOP_LENGTH", "1024")),
+        description="Samples between live spectrogram frames"
+    )
+    SPECTROGRAM_N_MELS: int = Field(
+        default=int(os.getenv("SPECTROGRAM_N_MELS", "64")),
+        description="Number of mel bins in the live spectrogram"
+    )
+    
+    # Sound classification model settings
+    AI_MODEL_URL: str = Field(
+        default=os.getenv("AI_MODEL_URL", "https://tfhub.dev/google/yamnet/1"),
+        description="TF Hub handle or local SavedModel directory of the YAMNet model"
+    )
+    AI_LABELS_PATH: str = Field(
+        default=os.getenv("AI_LABELS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "yamnet_class_map.csv")),
+        description="YAMNet class map CSV"
+    )
+    AI_MODEL_DIR: str = Field(
+        default=os.getenv("AI_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "yamnet")),
+        description="Offline model bundle (see model_bundle.py); used instead of AI_MODEL_URL when present"
+    )
+    AI_OFFLINE: bool = Field(
+        default=os.getenv("AI_OFFLINE", "false").lower() in ("1", "true", "yes"),
+        description="Never download the model or labels; fail unless AI_MODEL_DIR holds a valid bundle"
+    )
+    AI_WARMUP: bool = Field(
+        default=os.getenv("AI_WARMUP", "true").lower() in ("1", "true", "yes"),
+        description="Load the model in the background at startup instead of on the first request"
+    )
+    AI_LOAD_RETRY_SECONDS: float = Field(
+        default=float(os.getenv("AI_LOAD_RETRY_SECONDS", "30")),
+        description="Retry a failed model load after this many seconds, doubling after each failure (0: never)"
+    )
+    AI_BACKEND: str = Field(
+        default=os.getenv("AI_BACKEND", "tfhub"),
+        description="Inference backend: tfhub (TensorFlow), tflite or onnx"
+    )
+    AI_BACKEND_MODEL: str = Field(
+        default=os.getenv("AI_BACKEND_MODEL", ""),
+        description="Model file for the tflite/onnx backends; defaults to the one listed in the AI_MODEL_DIR bundle"
+    )
+    AI_NUM_THREADS: int = Field(
+        default=int(os.getenv("AI_NUM_THREADS", "0")),
+        description="CPU threads per inference (0: runtime default)"
+    )
+    AI_SHAPE_BUCKETS: str = Field(
+        default=os.getenv("AI_SHAPE_BUCKETS", "1,2,4,6,8,12,16,24,32,48,64"),
+        description="Comma-separated patch counts model inputs are padded to, each compiled at warmup (empty: no padding)"
+    )
+    AI_INFERENCE_WORKERS: int = Field(
+        default=int(os.getenv("AI_INFERENCE_WORKERS", "0")),
+        description="Threads decoding uploads and running the model (0: derived from AI_NUM_THREADS and the CPU count)"
+    )
+    AI_MAX_PENDING: int = Field(
+        default=int(os.getenv("AI_MAX_PENDING", "32")),
+        description="Most /ai/predict requests in progress at once; more are refused with 429 (0: unlimited)"
+    )
+    AI_WORKER_PROCESSES: int = Field(
+        default=int(os.getenv("AI_WORKER_PROCESSES", "0")),
+        description="Model worker processes, each with its own copy of the model (0: run the model in the API process)"
+    )
+    AI_WORKER_TIMEOUT: float = Field(
+        default=float(os.getenv("AI_WORKER_TIMEOUT", "60")),
+        description="Seconds a worker process may take for one batch before it is restarted"
+    )
+    AI_WORKER_HEALTH_SECONDS: float = Field(
+        default=float(os.getenv("AI_WORKER_HEALTH_SECONDS", "10")),
+        description="Seconds between health checks of the worker processes (0: none)"
+    )
+    AI_BATCH_MAX_SIZE: int = Field(
+        default=int(os.getenv("AI_BATCH_MAX_SIZE", "8")),
+        description="Most /ai/predict requests classified in one model call (1: no batching)"
+    )
+    AI_BATCH_MAX_WAIT_MS: float = Field(
+        default=float(os.getenv("AI_BATCH_MAX_WAIT_MS", "5")),
+        description="Longest time a request waits for others to join its batch, in milliseconds"
+    )
+    AI_STREAM_WINDOW_SECONDS: float = Field(
+        default=float(os.getenv("AI_STREAM_WINDOW_SECONDS", "30")),
+        description="Audio classified per model call by /ai/predict/stream, in seconds"
+    )
+    AI_CACHE_MAX_ENTRIES: int = Field(
+        default=int(os.getenv("AI_CACHE_MAX_ENTRIES", "256")),
+        description="Uploads whose scores are cached in memory (0: no memory cache)"
+    )
+    AI_CACHE_MAX_MB: float = Field(
+        default=float(os.getenv("AI_CACHE_MAX_MB", "64")),
+        description="Most memory used by cached scores, in megabytes"
+    )
+    AI_CACHE_DB: str = Field(
+        default=os.getenv("AI_CACHE_DB", ""),
+        description="SQLite file that keeps cached scores across restarts (empty: memory only)"
+    )
+    AI_CACHE_DB_MAX_ENTRIES: int = Field(
+        default=int(os.getenv("AI_CACHE_DB_MAX_ENTRIES", "10000")),
+        description="Most uploads kept in the AI_CACHE_DB file"
+    )
+    AI_EMBEDDING_DIR: str = Field(
+        default=os.getenv("AI_EMBEDDING_DIR", "embeddings"),
+        description="Directory of the sound event embedding store (empty: embeddings are not kept)"
+    )
+    AI_EMBEDDING_IVF_LISTS: int = Field(
+        default=int(os.getenv("AI_EMBEDDING_IVF_LISTS", "0")),
+        description="Clusters of the IVF index for similarity search (0: always search every embedding)"
+    )
+    AI_EMBEDDING_IVF_PROBES: int = Field(
+        default=int(os.getenv("AI_EMBEDDING_IVF_PROBES", "8")),
+        description="IVF clusters scanned per similarity search"
+    )
+    AI_EMBEDDING_IVF_MIN_VECTORS: int = Field(
+        default=int(os.getenv("AI_EMBEDDING_IVF_MIN_VECTORS", "50000")),
+        description="Stored embeddings needed before the IVF index is used"
+    )
+    AI_REALTIME: bool = Field(
+        default=os.getenv("AI_REALTIME", "false").lower() in ("1", "true", "yes"),
+        description="Classify the live capture continuously while capture runs, not only for classification subscribers"
+    )
+    AI_REALTIME_INTERVAL: float = Field(
+        default=float(os.getenv("AI_REALTIME_INTERVAL", "0.25")),
+        description="Seconds between reads of the capture buffer by the realtime classifier"
+    )
+    AI_REALTIME_MIN_CONFIDENCE: float = Field(
+        default=float(os.getenv("AI_REALTIME_MIN_CONFIDENCE", "0.3")),
+        description="Live patches whose top score is lower belong to no sound event"
+    )
+    AI_REALTIME_SILENCE_FLOOR: float = Field(
+        default=float(os.getenv("AI_REALTIME_SILENCE_FLOOR", "-6.5")),
+        description="Live windows whose loudest YAMNet log-mel frame is below this skip the model and count as silence"
+    )
+    AI_REALTIME_SAVE_EVENTS: bool = Field(
+        default=os.getenv("AI_REALTIME_SAVE_EVENTS", "true").lower() in ("1", "true", "yes"),
+        description="Store live classification segments as sound events"
+    )
     
     # Database settings
     DATABASE_URL: str = Field(
@@ -0,0 +1,340 @@
+"""
+Store of YAMNet embeddings per sound event, with nearest-neighbour search.
+
+YAMNet computes a 1024-d embedding for every patch along with the class
+scores. A sound event keeps the mean of its patch embeddings, L2-normalized,
+so the dot product of two stored vectors is their cosine similarity. Finding
+recurrences of a sound is then a search over stored vectors instead of
+another model run.
+
+Vectors live in a memory-mapped float16 file (2 KB per event) next to a
+memory-mapped int64 file of ``SoundEvent.id``s, one row each. Rows are
+appended in order; a row whose id is 0 was never completed and a row whose
+id is -1 belongs to a deleted event. Searching scans the vectors in chunks
+with one matrix product per chunk and keeps a running top-k with
+``argpartition``, so memory stays bounded however many vectors there are.
+
+For millions of vectors an optional IVF index (``ivf_lists``) clusters the
+vectors with spherical k-means and only scans the ``ivf_probes`` clusters
+closest to the query. The index is built in memory on first use once there
+are ``ivf_min_vectors`` vectors, and new vectors are assigned to clusters as
+they are added. Results are exact within the scanned clusters.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from inference_backends import EMBEDDING_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Rows converted to float32 and scored at once while searching
+SEARCH_CHUNK = 8192
+# Rows added to the files whenever they are full
+GROWTH = 4096
+
+
+def clip_embedding(embeddings: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Mean of per-patch embeddings, L2-normalized; None without embeddings."""
+    if embeddings is None or len(embeddings) == 0:
+        return None
+    mean = np.asarray(embeddings, dtype=np.float32).reshape(-1, np.shape(embeddings)[-1]).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return mean / norm if norm > 0 else mean
+
+
+class IVFIndex:
+    """Inverted-file index: every vector belongs to the cluster with the nearest centroid."""
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int32)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, lists: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means over a sample of normalized vectors."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        lists = min(lists, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+        for _ in range(iterations):
+            nearest = (vectors @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        return cls(centroids)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) @ self.centroids.T).argmax(axis=1).astype(np.int32)
+
+    def set_rows(self, start: int, vectors: np.ndarray) -> None:
+        """Record the clusters of the rows starting at ``start``."""
+        end = start + len(vectors)
+        if end > len(self.assignments):
+            grown = np.full(max(end, 2 * len(self.assignments)), -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+        self.assignments[start:end] = self.assign(vectors)
+
+    def candidates(self, query: np.ndarray, probes: int, rows: int) -> np.ndarray:
+        """Rows in the ``probes`` clusters closest to ``query``."""
+        probes = min(probes, len(self.centroids))
+        similarity = self.centroids @ query
+        closest = np.argpartition(similarity, len(similarity) - probes)[len(similarity) - probes:]
+        return np.flatnonzero(np.isin(self.assignments[:rows], closest))
+
+
+class EmbeddingStore:
+    """Memory-mapped float16 embeddings keyed by sound event id; thread-safe."""
+
+    def __init__(self, directory: Optional[str], dim: int = EMBEDDING_SIZE, ivf_lists: int = 0,
+                 ivf_probes: int = 8, ivf_min_vectors: int = 50000):
+        """
+        Initialize the store; files are opened or created on first use.
+
+        Args:
+            directory: Where the files go (None or empty: store disabled)
+            dim: Embedding size
+            ivf_lists: Clusters of the IVF index (0: always search exhaustively)
+            ivf_probes: Clusters scanned per IVF search
+            ivf_min_vectors: Vectors needed before the IVF index is used
+        """
+        self.directory = directory or None
+        self.dim = dim
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_vectors = ivf_min_vectors
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._rows: Dict[int, int] = {}
+        self._count = 0
+        self._index: Optional[IVFIndex] = None
+        self.searches = 0
+        self.index_searches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self) -> None:
+        if self._vectors is not None:
+            return
+        if not self.enabled:
+            raise RuntimeError("The embedding store is disabled")
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != self.dim or meta["dtype"] != "float16":
+                raise ValueError(f"Embedding store {self.directory} holds {meta['dim']}-d {meta['dtype']} vectors, "
+                                 f"expected {self.dim}-d float16")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": self.dim, "dtype": "float16"}, f)
+        capacity = 0
+        if os.path.exists(self._path("ids.i64")):
+            capacity = os.path.getsize(self._path("ids.i64")) // 8
+        self._map(max(capacity, GROWTH))
+        # Rows are filled in order, so the first never-written id ends the used rows
+        unused = np.flatnonzero(self._ids == 0)
+        self._count = int(unused[0]) if len(unused) else len(self._ids)
+        live = np.flatnonzero(self._ids[:self._count] > 0)
+        self._rows = dict(zip(self._ids[live].tolist(), live.tolist()))
+
+    def _map(self, capacity: int) -> None:
+        """(Re)map both files at ``capacity`` rows, growing them as needed."""
+        for name, row_bytes in (("vectors.f16", self.dim * 2), ("ids.i64", 8)):
+            path = self._path(name)
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()
+        self._vectors = np.memmap(self._path("vectors.f16"), dtype="<f2", mode="r+", shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path("ids.i64"), dtype="<i8", mode="r+", shape=(capacity,))
+
+    def add(self, event_id: int, embedding: np.ndarray) -> None:
+        """Store (or replace) the embedding of an event; it is normalized first."""
+        if event_id <= 0:
+            raise ValueError(f"Sound event ids are positive, got {event_id}")
+        vector = clip_embedding(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Expected a {self.dim}-d embedding, got {vector.shape[0]}-d")
+        with self._lock:
+            self._open()
+            row = self._rows.get(event_id)
+            if row is None:
+                row = self._count
+                if row == len(self._ids):
+                    self._map(len(self._ids) + max(GROWTH, len(self._ids) // 4))
+                self._count += 1
+            # The vector goes in before the id, so a crash never leaves an id with a partial vector
+            self._vectors[row] = vector
+            self._ids[row] = event_id
+            self._rows[event_id] = row
+            if self._index is not None:
+                self._index.set_rows(row, vector[None, :])
+
+    def remove(self, event_id: int) -> bool:
+        """Forget an event's embedding; returns whether there was one."""
+        with self._lock:
+            if not self.enabled:
+                return False
+            self._open()
+            row = self._rows.pop(event_id, None)
+            if row is None:
+                return False
+            self._ids[row] = -1
+            return True
+
+    def get(self, event_id: int) -> Optional[np.ndarray]:
+        """Stored (normalized) embedding of an event as float32, or None."""
+        with self._lock:
+            if not self.enabled:
+                return None
+            self._open()
+            row = self._rows.get(event_id)
+            return None if row is None else np.asarray(self._vectors[row], dtype=np.float32)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self.enabled:
+                return 0
+            self._open()
+            return len(self._rows)
+
+    def similar(self, event_id: int, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """Events most similar to ``event_id``, or None when it has no embedding."""
+        query = self.get(event_id)
+        if query is None:
+            return None
+        return self.search(query, k, exclude=event_id)
+
+    def search(self, query: np.ndarray, k: int = 10, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Stored events nearest to ``query`` by cosine similarity.
+
+        Returns:
+            Up to ``k`` (event id, similarity) pairs, most similar first
+        """
+        query = clip_embedding(np.asarray(query, dtype=np.float32).reshape(1, -1))
+        with self._lock:
+            self._open()
+            self.searches += 1
+            count = self._count
+            index = self._ensure_index()
+            if index is not None:
+                self.index_searches += 1
+                rows = index.candidates(query, self.ivf_probes, count)
+                ids, similarity = self._score_rows(rows, query, exclude)
+            else:
+                ids, similarity = self._scan(count, query, k, exclude)
+        best = _top(similarity, k)
+        return [(int(ids[i]), float(similarity[i])) for i in best if similarity[i] > -np.inf]
+
+    def _scan(self, count: int, query: np.ndarray, k: int, exclude: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Score every row chunk by chunk, keeping only the best ``k`` so far."""
+        best_ids = np.empty(0, dtype=np.int64)
+        best_similarity = np.empty(0, dtype=np.float32)
+        for start in range(0, count, SEARCH_CHUNK):
+            ids, similarity = self._score_rows(np.arange(start, min(start + SEARCH_CHUNK, count)), query, exclude)
+            ids = np.concatenate([best_ids, ids])
+            similarity = np.concatenate([best_similarity, similarity])
+            keep = _top(similarity, k)
+            best_ids, best_similarity = ids[keep], similarity[keep]
+        return best_ids, best_similarity
+
+    def _score_rows(self, rows: np.ndarray, query: np.ndarray,
+                    exclude: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1:
+            # Contiguous rows: slice the memory map instead of gathering
+            vectors, ids = self._vectors[rows[0]:rows[-1] + 1], self._ids[rows[0]:rows[-1] + 1]
+        else:
+            vectors, ids = self._vectors[rows], self._ids[rows]
+        similarity = vectors.astype(np.float32) @ query
+        similarity[ids <= 0] = -np.inf
+        if exclude is not None:
+            similarity[ids == exclude] = -np.inf
+        return np.array(ids), similarity
+
+    def _ensure_index(self) -> Optional[IVFIndex]:
+        if self.ivf_lists <= 0 or len(self._rows) < self.ivf_min_vectors:
+            return None
+        if self._index is None:
+            self.build_index()
+        return self._index
+
+    def build_index(self) -> None:
+        """Train the IVF index on a sample of the stored vectors and assign every row."""
+        with self._lock:
+            self._open()
+            live = np.fromiter(self._rows.values(), dtype=np.int64)
+            sample = np.random.default_rng(0).choice(live, min(len(live), 256 * self.ivf_lists), replace=False)
+            index = IVFIndex.train(self._vectors[np.sort(sample)].astype(np.float32), self.ivf_lists)
+            for start in range(0, self._count, SEARCH_CHUNK):
+                index.set_rows(start, self._vectors[start:min(start + SEARCH_CHUNK, self._count)].astype(np.float32))
+            self._index = index
+            logger.info(f"Built IVF index with {len(index.centroids)} lists over {len(live)} embeddings")
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._ids.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._vectors = self._ids = None
+            self._rows = {}
+            self._count = 0
+            self._index = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for status endpoints."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "embeddings": len(self._rows),
+                "rows": self._count,
+                "bytes": self._count * self.dim * 2,
+                "searches": self.searches,
+                "index": {
+                    "lists": len(self._index.centroids),
+                    "probes": self.ivf_probes,
+                    "searches": self.index_searches
+                } if self._index is not None else None
+            }
+
+
+def _top(similarity: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` largest values, largest first."""
+    k = min(k, len(similarity))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(similarity, len(similarity) - k)[len(similarity) - k:]
+    return best[np.argsort(similarity[best])[::-1]]
+
+
+# The one embedding store of the process
+store = EmbeddingStore(
+    settings.AI_EMBEDDING_DIR,
+    ivf_lists=settings.AI_EMBEDDING_IVF_LISTS,
+    ivf_probes=settings.AI_EMBEDDING_IVF_PROBES,
+    ivf_min_vectors=settings.AI_EMBEDDING_IVF_MIN_VECTORS
+)
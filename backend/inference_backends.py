@@ -0,0 +1,585 @@
+"""
+Inference backends for the YAMNet classifier.
+
+Every backend turns a 16 kHz mono float32 waveform into per-patch class
+scores of shape (patches, 521), where a patch is YAMNet's 0.96 s window
+taken every 0.48 s. The full TensorFlow/TF Hub model is the reference;
+TFLite (float or int8-quantized) and ONNX Runtime run the same network with a
+fraction of the memory and import time, which matters on small devices.
+
+TFLite and ONNX exports of YAMNet usually take one fixed-size window of
+``PATCH_WINDOW`` samples instead of a whole waveform. For those models the
+waveform is cut into windows with ``frame_waveform``, padded the same way the
+TF Hub model pads internally, so all backends see identical patches.
+``predict_batch`` classifies several waveforms with a single model call.
+
+Every upload has a different length, and a runtime that sees a new input
+shape compiles for it: TensorFlow traces a new graph, TFLite reallocates its
+tensors and ONNX Runtime plans new buffers. With shape buckets
+(``AI_SHAPE_BUCKETS``) inputs are zero-padded to the next bucket's patch count
+and the extra patches are dropped from the output, so the model only ever
+sees a fixed set of shapes, each compiled by ``warmup`` at load time. Inputs
+longer than the largest bucket are classified in pieces of that bucket.
+Patches only depend on their own samples, so padding and splitting don't
+change any score.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Samples per YAMNet patch (0.96 s of frames plus the STFT window overhang)
+PATCH_WINDOW = 15600
+# Samples between patch starts (0.48 s)
+PATCH_HOP = 7680
+NUM_CLASSES = 521
+# Size of YAMNet's per-patch embedding
+EMBEDDING_SIZE = 1024
+
+BACKENDS = ("tfhub", "tflite", "onnx")
+# Model bundle format used by each backend
+MODEL_FORMATS = {"tfhub": "saved_model", "tflite": "tflite", "onnx": "onnx"}
+
+
+def frame_waveform(waveform: np.ndarray, window: int = PATCH_WINDOW, hop: int = PATCH_HOP) -> np.ndarray:
+    """
+    Cut a waveform into overlapping YAMNet patch windows.
+
+    Like the TF Hub model, the waveform is zero-padded to at least one window
+    and then to a whole number of hops.
+
+    Returns:
+        Array of shape (patches, window); a strided view when no padding
+        was needed
+    """
+    waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+    n = len(waveform)
+    patches = patch_count(n, window, hop)
+    padded_length = (patches - 1) * hop + window
+    if padded_length != n:
+        waveform = np.pad(waveform, (0, padded_length - n))
+    return np.lib.stride_tricks.sliding_window_view(waveform, window)[::hop]
+
+
+def patch_count(samples: int, window: int = PATCH_WINDOW, hop: int = PATCH_HOP) -> int:
+    """Number of patches YAMNet produces for a waveform of ``samples`` samples."""
+    return 1 + max(0, -(-(samples - window) // hop))
+
+
+def stream_window(seconds: float) -> Tuple[int, int]:
+    """
+    Window length and step, in samples, for classifying a long recording in pieces.
+
+    The window holds a whole number of patches and the step is that many hops,
+    so consecutive windows overlap by ``PATCH_WINDOW - PATCH_HOP`` samples and
+    their patches are exactly the patches of the whole recording.
+    """
+    patches = max(1, round(seconds * SAMPLE_RATE / PATCH_HOP))
+    return (patches - 1) * PATCH_HOP + PATCH_WINDOW, patches * PATCH_HOP
+
+
+def parse_buckets(spec: str) -> Tuple[int, ...]:
+    """Sorted patch-count buckets from a comma-separated ``AI_SHAPE_BUCKETS`` value."""
+    buckets = sorted({int(part) for part in spec.split(",") if part.strip()})
+    if buckets and buckets[0] < 1:
+        raise ValueError(f"Shape buckets must be positive patch counts, got {spec!r}")
+    return tuple(buckets)
+
+
+def bucket_span(patches: int) -> int:
+    """Samples of a waveform that YAMNet cuts into exactly ``patches`` patches."""
+    return (patches - 1) * PATCH_HOP + PATCH_WINDOW
+
+
+def bucket_chunks(patches: int, buckets: Sequence[int]) -> List[Tuple[int, int, int]]:
+    """
+    Split a run of patches into pieces that each fit one shape bucket.
+
+    Pieces of the largest bucket come first; the rest goes into the smallest
+    bucket that holds it.
+
+    Returns:
+        (first patch, patch count, bucket) of each piece
+    """
+    largest = buckets[-1]
+    chunks, first = [], 0
+    while patches - first > largest:
+        chunks.append((first, largest, largest))
+        first += largest
+    rest = patches - first
+    chunks.append((first, rest, next(bucket for bucket in buckets if bucket >= rest)))
+    return chunks
+
+
+def pack_waveforms(waveforms: Sequence[np.ndarray]) -> Tuple[np.ndarray, List[int], List[int]]:
+    """
+    Concatenate waveforms so that one model call classifies all of them.
+
+    A YAMNet patch only sees its own ``PATCH_WINDOW`` samples, so each
+    waveform is zero-padded to its patch span and placed at a multiple of
+    ``PATCH_HOP``. Its patches are then exactly patches of the packed
+    waveform; patches straddling two waveforms are discarded.
+
+    Returns:
+        Tuple of (packed waveform, first patch index of each waveform,
+        patch count of each waveform)
+    """
+    starts, counts, offset = [], [], 0
+    for waveform in waveforms:
+        count = patch_count(len(waveform))
+        starts.append(offset // PATCH_HOP)
+        counts.append(count)
+        offset += -(-((count - 1) * PATCH_HOP + PATCH_WINDOW) // PATCH_HOP) * PATCH_HOP
+    last_span = (counts[-1] - 1) * PATCH_HOP + PATCH_WINDOW
+    packed = np.zeros(starts[-1] * PATCH_HOP + last_span, dtype=np.float32)
+    for waveform, start in zip(waveforms, starts):
+        waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+        packed[start * PATCH_HOP:start * PATCH_HOP + len(waveform)] = waveform
+    return packed, starts, counts
+
+
+def _split(scores: np.ndarray, embeddings: Optional[np.ndarray], starts: Sequence[int],
+           counts: Sequence[int]) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+    return [
+        (scores[start:start + count], embeddings[start:start + count] if embeddings is not None else None)
+        for start, count in zip(starts, counts)
+    ]
+
+
+def quantize(x: np.ndarray, dtype, scale: float, zero_point: int) -> np.ndarray:
+    """Quantize float values for an integer model input."""
+    info = np.iinfo(dtype)
+    q = np.round(x / scale + zero_point)
+    return np.clip(q, info.min, info.max).astype(dtype)
+
+
+def dequantize(q: np.ndarray, scale: float, zero_point: int) -> np.ndarray:
+    """Convert integer model outputs back to float32."""
+    return ((q.astype(np.float32) - zero_point) * scale).astype(np.float32)
+
+
+class InferenceBackend:
+    """Base class of YAMNet inference backends."""
+
+    name = "backend"
+
+    def __init__(self, model_path: str, num_threads: int = 0, buckets: Sequence[int] = ()):
+        """
+        Initialize the backend without loading anything.
+
+        Args:
+            model_path: Model file, SavedModel directory or TF Hub handle
+            num_threads: CPU threads for inference (0: runtime default)
+            buckets: Patch counts inputs are padded to (empty: no padding)
+        """
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.buckets = tuple(sorted(buckets))
+        # Graphs or tensor allocations built for a new input shape
+        self.compilations = 0
+        self.warm_compilations: Optional[int] = None
+        self.padded_patches = 0
+
+    @property
+    def bucketed(self) -> bool:
+        """Whether inputs are padded to shape buckets."""
+        return bool(self.buckets)
+
+    def load(self) -> None:
+        """Load the model; called once by the model registry."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release what ``load`` started; in-process backends hold nothing to release."""
+
+    def predict(self, waveform: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Classify a waveform.
+
+        Args:
+            waveform: 16 kHz mono float32 samples
+
+        Returns:
+            Tuple of (scores, embeddings): float32 arrays of shape
+            (patches, 521) and (patches, 1024); embeddings are None when the
+            model does not output them
+        """
+        raise NotImplementedError
+
+    def predict_scores(self, waveform: np.ndarray) -> np.ndarray:
+        """Per-patch class scores of shape (patches, 521)."""
+        return self.predict(waveform)[0]
+
+    def predict_batch(self, waveforms: Sequence[np.ndarray]) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """
+        Classify several waveforms with one model call.
+
+        Returns:
+            (scores, embeddings) of each waveform, as from ``predict``
+        """
+        packed, starts, counts = pack_waveforms(waveforms)
+        scores, embeddings = self.predict(packed)
+        return _split(scores, embeddings, starts, counts)
+
+    def warmup(self) -> np.ndarray:
+        """
+        Run the model once per shape bucket, so that requests never compile.
+
+        Returns:
+            Scores of the last run, for checking the number of classes
+        """
+        lengths = [bucket_span(bucket) for bucket in self.buckets] if self.bucketed else [SAMPLE_RATE]
+        for length in lengths:
+            scores = self.predict_scores(np.zeros(length, dtype=np.float32))
+        self.warm_compilations = self.compilations
+        return scores
+
+    def _run_bucketed(self, patches: int, cut: Callable[[int, int, int], np.ndarray],
+                      run: Callable[[np.ndarray], Tuple[np.ndarray, Optional[np.ndarray]]]
+                      ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Run each bucket-sized piece ``cut(first, count, bucket)`` and join the unpadded results."""
+        scores, embeddings = [], []
+        for first, count, bucket in bucket_chunks(patches, self.buckets):
+            piece_scores, piece_embeddings = run(cut(first, count, bucket))
+            scores.append(piece_scores[:count])
+            embeddings.append(piece_embeddings[:count] if piece_embeddings is not None else None)
+            self.padded_patches += bucket - count
+        if len(scores) == 1:
+            return scores[0], embeddings[0]
+        return np.concatenate(scores), np.concatenate(embeddings) if embeddings[0] is not None else None
+
+    def _predict_waveform(self, waveform: np.ndarray,
+                          run: Callable[[np.ndarray], Tuple[np.ndarray, Optional[np.ndarray]]]
+                          ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """``run`` a model taking a whole waveform, padded to the bucket spans."""
+        waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+        if not self.bucketed:
+            return run(waveform)
+
+        def cut(first, count, bucket):
+            piece = waveform[first * PATCH_HOP:first * PATCH_HOP + bucket_span(count)]
+            padded = np.zeros(bucket_span(bucket), dtype=np.float32)
+            padded[:len(piece)] = piece
+            return padded
+
+        return self._run_bucketed(patch_count(len(waveform)), cut, run)
+
+    def shape_stats(self) -> Dict[str, Any]:
+        """Shape buckets and compilation counters for status endpoints."""
+        return {
+            "buckets": list(self.buckets) if self.bucketed else [],
+            "compilations": self.compilations,
+            # Compilations after warmup; stays 0 when every input fits a bucket
+            "retraces": (self.compilations - self.warm_compilations
+                         if self.warm_compilations is not None else None),
+            "padded_patches": self.padded_patches
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Backend details for status endpoints."""
+        return {"backend": self.name, "model_path": self.model_path}
+
+
+class TFHubBackend(InferenceBackend):
+    """The reference TensorFlow model, from TF Hub or a SavedModel directory."""
+
+    name = "tfhub"
+
+    def __init__(self, model_path: str, num_threads: int = 0, saved_model: bool = False,
+                 buckets: Sequence[int] = ()):
+        super().__init__(model_path, num_threads, buckets)
+        self.saved_model = saved_model
+        self.model = None
+        self._function = None
+
+    def load(self) -> None:
+        # Imported here so that importing the API doesn't pay for TensorFlow
+        import tensorflow as tf
+
+        if self.num_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(self.num_threads)
+        physical_devices = tf.config.list_physical_devices('GPU')
+        if physical_devices:
+            try:
+                tf.config.experimental.set_memory_growth(physical_devices[0], True)
+            except Exception as e:
+                logger.warning(f"Could not enable memory growth on GPU: {e}")
+
+        if self.saved_model:
+            self.model = tf.saved_model.load(self.model_path)
+        else:
+            import tensorflow_hub as hub
+            self.model = hub.load(self.model_path)
+
+        # With buckets every bucket length gets its own fixed-shape graph;
+        # without, one graph for waveforms of any length
+        signature = None if self.bucketed else [tf.TensorSpec([None], tf.float32)]
+        self._function = tf.function(self._forward, input_signature=signature)
+        self._to_tensor = tf.convert_to_tensor
+
+    def _forward(self, waveform):
+        # Python code in a tf.function only runs while it is being traced
+        self.compilations += 1
+        return self.model(waveform)
+
+    def _run(self, waveform: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        scores, embeddings, _ = self._function(self._to_tensor(waveform))
+        return scores.numpy(), embeddings.numpy()
+
+    def predict(self, waveform: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return self._predict_waveform(waveform, self._run)
+
+
+def _tflite_interpreter_class():
+    """Find the lightest installed TFLite interpreter."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class PatchBackend(InferenceBackend):
+    """Backend whose model takes patch windows rather than a whole waveform."""
+
+    window = PATCH_WINDOW
+    # Whether the model takes any number of patches in one call
+    _batched = False
+
+    @property
+    def bucketed(self) -> bool:
+        # Models run once per patch have a single shape anyway
+        return bool(self.buckets) and self._batched
+
+    def predict_patches(self, patches: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Classify an array of patch windows of shape (patches, window)."""
+        raise NotImplementedError
+
+    def _predict_padded(self, patches: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """``predict_patches`` on batches padded to the shape buckets."""
+        if not self.bucketed:
+            return self.predict_patches(patches)
+
+        def cut(first, count, bucket):
+            batch = patches[first:first + count]
+            if bucket > count:
+                batch = np.concatenate([batch, np.zeros((bucket - count, batch.shape[1]), dtype=batch.dtype)])
+            return batch
+
+        return self._run_bucketed(len(patches), cut, self.predict_patches)
+
+    def predict(self, waveform: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return self._predict_padded(frame_waveform(waveform, window=self.window))
+
+    def predict_batch(self, waveforms: Sequence[np.ndarray]) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        framed = [frame_waveform(waveform, window=self.window) for waveform in waveforms]
+        counts = [len(patches) for patches in framed]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).tolist()
+        scores, embeddings = self._predict_padded(np.concatenate(framed))
+        return _split(scores, embeddings, starts, counts)
+
+
+class TFLiteBackend(PatchBackend):
+    """
+    TFLite model, float or int8-quantized.
+
+    Uses ``ai_edge_litert`` or ``tflite_runtime`` when installed and only
+    falls back to ``tensorflow.lite``. Models with a dynamic batch
+    dimension get all patches in one call; others are run once per patch.
+    Resizing the input reallocates every tensor, so with shape buckets each
+    bucket keeps an interpreter of its own instead of resizing one back and
+    forth. Interpreters aren't thread-safe, so one call runs at a time.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: int = 0, buckets: Sequence[int] = ()):
+        super().__init__(model_path, num_threads, buckets)
+        self.interpreter = None
+        self._interpreters: Dict[int, Any] = {}
+        # Guards the interpreters' tensors from set_tensor to get_tensor
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent unloaded to worker processes, which can't receive a lock
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _make_interpreter(self):
+        kwargs = {"num_threads": self.num_threads} if self.num_threads else {}
+        return _tflite_interpreter_class()(model_path=self.model_path, **kwargs)
+
+    def load(self) -> None:
+        self.interpreter = self._make_interpreter()
+        self.interpreter.allocate_tensors()
+        self.compilations += 1
+        self._input = self.interpreter.get_input_details()[0]
+        outputs = self.interpreter.get_output_details()
+        self._scores = next((o for o in outputs if "score" in o["name"].lower()), outputs[0])
+        self._embeddings = next((o for o in outputs if "embedding" in o["name"].lower()), None)
+        signature = self._input.get("shape_signature", self._input["shape"])
+        self.window = int(self._input["shape"][-1])
+        self._batched = len(signature) == 2 and signature[0] == -1
+        self._interpreters = {int(self._input["shape"][0]): self.interpreter} if self._batched else {}
+        logger.info(f"TFLite model {self.model_path}: input {self._input['dtype'].__name__}"
+                    f"{list(signature)}, {'batched' if self._batched else 'one patch per call'}")
+
+    def _output(self, detail) -> np.ndarray:
+        value = self.interpreter.get_tensor(detail["index"])
+        if np.issubdtype(value.dtype, np.integer):
+            scale, zero_point = detail["quantization"]
+            value = dequantize(value, scale, zero_point)
+        return value
+
+    def _set_input(self, patches: np.ndarray) -> None:
+        detail = self._input
+        if np.issubdtype(detail["dtype"], np.integer):
+            scale, zero_point = detail["quantization"]
+            patches = quantize(patches, detail["dtype"], scale, zero_point)
+        if len(detail["shape"]) == 1:
+            patches = patches.reshape(-1)
+        self.interpreter.set_tensor(detail["index"], np.ascontiguousarray(patches, dtype=detail["dtype"]))
+
+    def _interpreter_for(self, batch: int):
+        """Interpreter allocated for ``batch`` patches."""
+        interpreter = self._interpreters.get(batch)
+        if interpreter is None:
+            if self.bucketed:
+                interpreter = self._make_interpreter()
+            else:
+                interpreter = self.interpreter
+                self._interpreters.clear()
+            interpreter.resize_tensor_input(self._input["index"], [batch, self.window])
+            interpreter.allocate_tensors()
+            self._interpreters[batch] = interpreter
+            self.compilations += 1
+        return interpreter
+
+    def predict_patches(self, patches: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        with self._lock:
+            return self._invoke(patches)
+
+    def _invoke(self, patches: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self._batched:
+            self.interpreter = self._interpreter_for(len(patches))
+            self._set_input(patches)
+            self.interpreter.invoke()
+            scores = self._output(self._scores).reshape(len(patches), -1)
+            embeddings = (self._output(self._embeddings).reshape(len(patches), -1)
+                          if self._embeddings is not None else None)
+            return scores, embeddings
+
+        scores, embeddings = [], []
+        for patch in patches:
+            self._set_input(patch[None, :])
+            self.interpreter.invoke()
+            scores.append(self._output(self._scores).reshape(-1))
+            if self._embeddings is not None:
+                embeddings.append(self._output(self._embeddings).reshape(-1))
+        return np.stack(scores), np.stack(embeddings) if embeddings else None
+
+
+class ONNXBackend(PatchBackend):
+    """
+    ONNX Runtime on the CPU.
+
+    Accepts models taking either a whole waveform (rank-1 input, as exported
+    from the TF Hub model) or a batch of patch windows (rank-2 input).
+    ONNX Runtime plans its buffers per input shape, so every new shape counts
+    as a compilation.
+    """
+
+    name = "onnx"
+    _whole_waveform = False
+
+    def __init__(self, model_path: str, num_threads: int = 0, buckets: Sequence[int] = ()):
+        super().__init__(model_path, num_threads, buckets)
+        self.session = None
+        self._shapes = set()
+
+    @property
+    def bucketed(self) -> bool:
+        return bool(self.buckets) and (self._whole_waveform or self._batched)
+
+    def load(self) -> None:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0]
+        outputs = [o.name for o in self.session.get_outputs()]
+        self._scores = next((o for o in outputs if "score" in o.lower()), outputs[0])
+        self._embeddings = next((o for o in outputs if "embedding" in o.lower()), None)
+        shape = self._input.shape
+        self._whole_waveform = len(shape) == 1
+        self.window = shape[-1] if isinstance(shape[-1], int) else PATCH_WINDOW
+        self._batched = len(shape) == 2 and not isinstance(shape[0], int)
+
+    def predict(self, waveform: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self._whole_waveform:
+            return self._predict_waveform(waveform, lambda padded: self._run([padded]))
+        return super().predict(waveform)
+
+    def predict_batch(self, waveforms: Sequence[np.ndarray]) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        if self._whole_waveform:
+            return InferenceBackend.predict_batch(self, waveforms)
+        return super().predict_batch(waveforms)
+
+    def predict_patches(self, patches: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        patches = np.ascontiguousarray(patches, dtype=np.float32)
+        return self._run([patches] if self._batched else [p[None, :] for p in patches])
+
+    def _run(self, feeds: List[np.ndarray]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        names = [self._scores] + ([self._embeddings] if self._embeddings else [])
+        for feed in feeds:
+            if feed.shape not in self._shapes:
+                self._shapes.add(feed.shape)
+                self.compilations += 1
+        results = [self.session.run(names, {self._input.name: feed}) for feed in feeds]
+        scores = np.concatenate([r[0].reshape(-1, r[0].shape[-1]) for r in results]).astype(np.float32)
+        embeddings = None
+        if self._embeddings:
+            embeddings = np.concatenate([r[1].reshape(-1, r[1].shape[-1]) for r in results]).astype(np.float32)
+        return scores, embeddings
+
+
+def create_backend(name: str, model_path: str, num_threads: int = 0,
+                   saved_model: bool = False, buckets: Sequence[int] = ()) -> InferenceBackend:
+    """
+    Create an (unloaded) backend by its ``AI_BACKEND`` name.
+
+    Args:
+        name: "tfhub", "tflite" or "onnx"
+        model_path: Model file, SavedModel directory or TF Hub handle
+        num_threads: CPU threads for inference (0: runtime default)
+        saved_model: For "tfhub", load ``model_path`` as a local SavedModel
+        buckets: Patch counts inputs are padded to (empty: no padding)
+    """
+    name = name.strip().lower()
+    if name == "tfhub":
+        return TFHubBackend(model_path, num_threads, saved_model=saved_model, buckets=buckets)
+    if name == "tflite":
+        return TFLiteBackend(model_path, num_threads, buckets)
+    if name == "onnx":
+        return ONNXBackend(model_path, num_threads, buckets)
+    raise ValueError(f"Unknown inference backend {name!r}; expected one of {', '.join(BACKENDS)}")
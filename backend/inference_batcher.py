@@ -0,0 +1,205 @@
+"""
+Micro-batching scheduler for sound classification requests.
+
+Every model call has a fixed overhead (dispatch, graph execution setup,
+thread hand-off) on top of the per-patch work. Under concurrent uploads the
+batcher collects requests for at most ``max_wait_ms`` (or until
+``max_batch_size`` are queued), runs them through the backend as one batch
+with ``InferenceBackend.predict_batch`` and hands each request its own
+scores. Requests arriving while a batch runs are queued for the next one, so
+batches grow with load on their own; an idle server only adds the wait.
+Batches run on the ``InferenceExecutor`` when one is given.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Set
+
+import numpy as np
+
+from inference_executor import InferenceExecutor
+from inference_metrics import STATS_WINDOW, percentiles
+from model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+class BatchResult(NamedTuple):
+    """Scores of one request, how long it waited for its batch to start and how long the batch ran."""
+    scores: np.ndarray
+    embeddings: Optional[np.ndarray]
+    queue_wait: float
+    inference: float = 0.0
+
+
+class _Request:
+    """A queued waveform and the future its result goes to."""
+
+    __slots__ = ("waveform", "future", "enqueued")
+
+    def __init__(self, waveform: np.ndarray, future: asyncio.Future):
+        self.waveform = waveform
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class InferenceBatcher:
+    """
+    Collects classification requests into batches for the shared model.
+
+    Up to ``max_in_flight`` batches run at a time, on worker threads; the
+    collecting happens on the event loop of the callers.
+    """
+
+    def __init__(self, registry: ModelRegistry, max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 executor: Optional[InferenceExecutor] = None, max_in_flight: int = 1):
+        """
+        Initialize the batcher.
+
+        Args:
+            registry: Registry of the (loaded) model
+            max_batch_size: Most requests per model call; 1 disables batching
+            max_wait_ms: Longest time the oldest queued request waits for
+                others to join its batch
+            executor: Pool to run batches on (default: asyncio's)
+            max_in_flight: Batches running at once, e.g. one per worker
+                process of a ``WorkerPoolBackend``
+        """
+        self.registry = registry
+        self.executor = executor
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: Deque[_Request] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running: Set[asyncio.Task] = set()
+
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._patches = 0
+        self._largest_batch = 0
+        self._inference_seconds = 0.0
+        self._waits: Deque[float] = deque(maxlen=STATS_WINDOW)
+        self._latencies: Deque[float] = deque(maxlen=STATS_WINDOW)
+        self._completed: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    async def submit(self, waveform: np.ndarray) -> BatchResult:
+        """
+        Classify a waveform as part of the next batch.
+
+        Returns:
+            Scores and embeddings as from ``InferenceBackend.predict``, with
+            the time spent waiting for the batch to start
+
+        Raises:
+            Exception: Whatever the model raised for the batch
+        """
+        self._ensure_worker()
+        request = _Request(waveform, self._loop.create_future())
+        self._queue.append(request)
+        self._wakeup.set()
+        return await request.future
+
+    def _ensure_worker(self) -> None:
+        """Start the collecting task on the running loop (again, if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = deque()
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._running = set()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue:
+                # Requests keep queueing while every slot is busy, so the next batch fills up
+                await self._slots.acquire()
+                if not self._queue:
+                    self._slots.release()
+                    break
+                task = asyncio.get_running_loop().create_task(self._run_batch(await self._collect()))
+                self._running.add(task)
+                task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        self._slots.release()
+
+    async def _collect(self) -> List[_Request]:
+        """Wait until the batch is full or the oldest request waited long enough."""
+        deadline = self._queue[0].enqueued + self.max_wait
+        while len(self._queue) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch_size))]
+        # Callers that went away (cancelled) don't need a result
+        return [request for request in batch if not request.future.done()]
+
+    async def _run_batch(self, batch: List[_Request]) -> None:
+        if not batch:
+            return
+        started = time.monotonic()
+        waveforms = [request.waveform for request in batch]
+        try:
+            if self.executor is not None:
+                results = await self.executor.run(self.registry.model.predict_batch, waveforms)
+            else:
+                results = await asyncio.to_thread(self.registry.model.predict_batch, waveforms)
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} classification requests failed: {e}", exc_info=True)
+            self._errors += len(batch)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        self._batches += 1
+        self._requests += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        self._inference_seconds += finished - started
+        for request, (scores, embeddings) in zip(batch, results):
+            self._patches += len(scores)
+            self._waits.append(started - request.enqueued)
+            self._latencies.append(finished - request.enqueued)
+            self._completed.append(finished)
+            if not request.future.done():
+                request.future.set_result(BatchResult(scores, embeddings, started - request.enqueued,
+                                                      finished - started))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching counters and recent latencies."""
+        span = self._completed[-1] - self._completed[0] if len(self._completed) > 1 else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self._running),
+            "queued": len(self._queue),
+            "requests": self._requests,
+            "batches": self._batches,
+            "errors": self._errors,
+            "patches": self._patches,
+            "mean_batch_size": round(self._requests / self._batches, 3) if self._batches else None,
+            "largest_batch": self._largest_batch,
+            "inference_seconds": round(self._inference_seconds, 3),
+            "requests_per_second": round((len(self._completed) - 1) / span, 3) if span > 0 else None,
+            "queue_wait_ms": percentiles(self._waits),
+            "latency_ms": percentiles(self._latencies)
+        }
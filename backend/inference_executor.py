@@ -0,0 +1,171 @@
+"""
+Bounded executor for sound classification work.
+
+Decoding uploads and running the model are CPU-bound and must stay off the
+event loop, or every WebSocket stream stalls while a file is classified.
+They run on a dedicated thread pool instead of asyncio's default one, sized
+so that ``workers x AI_NUM_THREADS`` doesn't oversubscribe the CPU.
+
+Admission control keeps the backlog bounded: at most ``max_pending``
+requests may be admitted (queued, decoding or in the model) at a time.
+Further requests are turned away straight away with ``OverloadedError``,
+which the API answers with 429 and a ``Retry-After`` estimate, rather than
+queueing work the client will have given up on by the time it runs.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(Exception):
+    """Raised when a request is not admitted because too many are pending."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def default_workers(num_threads: int, worker_processes: int = 0) -> int:
+    """
+    Number of executor threads for a per-inference thread count.
+
+    With the runtime's default threading (0) each model call already uses
+    every core, so two workers are enough to decode one upload while another
+    batch runs. With worker processes, one thread waits on each of them and
+    two more decode uploads.
+    """
+    if worker_processes > 0:
+        return worker_processes + 2
+    if num_threads <= 0:
+        return 2
+    return max(1, (os.cpu_count() or 1) // num_threads)
+
+
+class Admission:
+    """An admitted request; release it when done, or use it as a context manager."""
+
+    __slots__ = ("_executor", "admitted", "released")
+
+    def __init__(self, executor: "InferenceExecutor"):
+        self._executor = executor
+        self.admitted = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._executor._release(self)
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class InferenceExecutor:
+    """Thread pool with a cap on admitted requests."""
+
+    def __init__(self, workers: int = 2, max_pending: int = 32):
+        """
+        Initialize the executor; threads start on first use.
+
+        Args:
+            workers: Threads running decode and inference jobs
+            max_pending: Most requests admitted at once (0: unlimited)
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._pending = 0
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self._admitted = 0
+        self._rejected = 0
+        self._jobs = 0
+        self._service_times: Deque[float] = deque(maxlen=256)
+        self._job_waits: Deque[float] = deque(maxlen=256)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free, from recent request durations."""
+        if not self._service_times:
+            return 1
+        mean = sum(self._service_times) / len(self._service_times)
+        return max(1, math.ceil(mean * self._pending / self.workers))
+
+    def admit(self) -> Admission:
+        """
+        Admit a request, to be released when its response is ready.
+
+        Raises:
+            OverloadedError: If ``max_pending`` requests are already admitted
+        """
+        if self.max_pending and self._pending >= self.max_pending:
+            self._rejected += 1
+            raise OverloadedError(
+                f"{self._pending} classification requests pending (limit {self.max_pending})",
+                self.retry_after()
+            )
+        self._pending += 1
+        self._admitted += 1
+        return Admission(self)
+
+    def _release(self, admission: Admission) -> None:
+        self._pending -= 1
+        self._service_times.append(time.monotonic() - admission.admitted)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run ``func(*args)`` on the pool and wait for its result."""
+        return (await self.run_timed(func, *args))[0]
+
+    async def run_timed(self, func: Callable[..., Any], *args) -> Tuple[Any, float]:
+        """Like ``run``, also returning the seconds the job waited for a thread."""
+        submitted = time.monotonic()
+        waited = 0.0
+
+        def job():
+            nonlocal waited
+            waited = time.monotonic() - submitted
+            self._job_waits.append(waited)
+            with self._busy_lock:
+                self._busy += 1
+            try:
+                return func(*args)
+            finally:
+                with self._busy_lock:
+                    self._busy -= 1
+
+        self._jobs += 1
+        result = await asyncio.get_running_loop().run_in_executor(self._pool, job)
+        return result, waited
+
+    def shutdown(self) -> None:
+        """Stop the threads once queued jobs are done."""
+        self._pool.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission counters."""
+        waits = sorted(self._job_waits)
+        return {
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "jobs": self._jobs,
+            "job_wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 3) if waits else None
+        }
@@ -0,0 +1,194 @@
+"""
+Per-stage timing and throughput of classification requests.
+
+A slow ``/ai/predict`` can be slow anywhere: reading the upload, decoding,
+resampling, waiting for a thread or a batch, the model itself, or turning
+scores into a response. Each request hands its stage durations to
+``InferenceMetrics`` once it is done. A stage keeps cumulative counts over
+fixed latency buckets (as a Prometheus histogram) plus its most recent
+durations for percentiles, so recording is a bisect and two appends on the
+event loop, with no locking and nothing growing with uptime.
+
+``prometheus_text`` renders the counters in the Prometheus text exposition
+format for ``/ai/metrics``; ``memory_rss`` reads the resident memory of this
+or another process for the model footprint.
+"""
+
+import bisect
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Upper bounds of the latency buckets, in seconds (the last bucket is +Inf)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stages of an /ai/predict request, in the order they happen
+STAGES = ("read", "cache", "decode", "resample", "queue_wait", "inference", "postprocess", "total")
+
+# Number of recent values latency percentiles are computed over
+STATS_WINDOW = 1024
+
+
+def percentiles(values) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 of a sequence of seconds, in milliseconds."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.fromiter(values, dtype=float) * 1000, [50, 95, 99])
+    return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+
+
+def memory_rss(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Resident set size in bytes of a process (default: this one).
+
+    Read from /proc where there is one; elsewhere only this process' peak
+    resident size is known, and other processes give None.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if pid is not None and pid != os.getpid():
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageHistogram:
+    """Latency histogram of one stage, with its recent values for percentiles."""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, observations at or below it) per bucket, ending with +Inf."""
+        total, buckets = 0, []
+        for bound, count in zip([*map(repr, self.bounds), "+Inf"], self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else None,
+            **percentiles(self.recent)
+        }
+
+
+class InferenceMetrics:
+    """Stage histograms, request counters and recent throughput of classification requests."""
+
+    def __init__(self, stages: Iterable[str] = STAGES):
+        self.stages: Dict[str, StageHistogram] = {stage: StageHistogram() for stage in stages}
+        self.requests = 0
+        self.audio_seconds = 0.0
+        self.started = time.monotonic()
+        # (finish time, audio seconds) of recent requests
+        self._completed: Deque[Tuple[float, float]] = deque(maxlen=STATS_WINDOW)
+
+    def record(self, durations: Dict[str, float], audio_seconds: float = 0.0) -> None:
+        """
+        Record a finished request.
+
+        Args:
+            durations: Seconds per stage; stages the request skipped (e.g.
+                decoding of a cached upload) are left out
+            audio_seconds: Length of the audio the model classified for it
+        """
+        for stage, seconds in durations.items():
+            histogram = self.stages.get(stage)
+            if histogram is not None:
+                histogram.observe(seconds)
+        self.requests += 1
+        self.audio_seconds += audio_seconds
+        self._completed.append((time.monotonic(), audio_seconds))
+
+    def rates(self) -> Tuple[Optional[float], Optional[float]]:
+        """Requests and audio seconds per wall-clock second over the recent requests."""
+        if len(self._completed) < 2:
+            return None, None
+        span = self._completed[-1][0] - self._completed[0][0]
+        if span <= 0:
+            return None, None
+        audio = sum(seconds for _, seconds in list(self._completed)[1:])
+        return (len(self._completed) - 1) / span, audio / span
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request counters, throughput and per-stage latencies."""
+        requests_per_second, audio_per_second = self.rates()
+        return {
+            "requests": self.requests,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "requests_per_second": round(requests_per_second, 3) if requests_per_second is not None else None,
+            # Seconds of audio classified per second of wall-clock time
+            "audio_seconds_per_second": round(audio_per_second, 3) if audio_per_second is not None else None,
+            "stages_ms": {stage: histogram.get_stats() for stage, histogram in self.stages.items()}
+        }
+
+
+def _sample(name: str, value: Any, labels: str = "") -> str:
+    return f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+
+
+def prometheus_text(metrics: InferenceMetrics, gauges: Dict[str, Tuple[str, Optional[float]]],
+                    prefix: str = "soundtracker_ai") -> str:
+    """
+    Render the metrics in the Prometheus text exposition format.
+
+    Args:
+        metrics: Request metrics
+        gauges: Further values by name, as (help text, value); None values
+            are left out
+        prefix: Prefix of every metric name
+    """
+    lines = [
+        f"# HELP {prefix}_stage_seconds Duration of each stage of /ai/predict requests",
+        f"# TYPE {prefix}_stage_seconds histogram"
+    ]
+    for stage, histogram in metrics.stages.items():
+        for bound, count in histogram.cumulative():
+            lines.append(_sample(f"{prefix}_stage_seconds_bucket", count, f'stage="{stage}",le="{bound}"'))
+        lines.append(_sample(f"{prefix}_stage_seconds_sum", repr(histogram.sum), f'stage="{stage}"'))
+        lines.append(_sample(f"{prefix}_stage_seconds_count", histogram.count, f'stage="{stage}"'))
+
+    requests_per_second, audio_per_second = metrics.rates()
+    counters = {
+        "requests_total": ("Classification requests completed", metrics.requests),
+        "audio_seconds_total": ("Seconds of audio classified", metrics.audio_seconds)
+    }
+    gauges = {
+        "requests_per_second": ("Recent classification requests per second", requests_per_second),
+        "audio_seconds_per_second": ("Recent seconds of audio classified per wall-clock second", audio_per_second),
+        **gauges
+    }
+    for kind, values in (("counter", counters), ("gauge", gauges)):
+        for name, (help_text, value) in values.items():
+            if value is None:
+                continue
+            lines += [
+                f"# HELP {prefix}_{name} {help_text}",
+                f"# TYPE {prefix}_{name} {kind}",
+                _sample(f"{prefix}_{name}", repr(float(value)))
+            ]
+    return "\n".join(lines) + "\n"
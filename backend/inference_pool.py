@@ -0,0 +1,380 @@
+"""
+Multi-process inference worker pool.
+
+One process with one model session can't keep a many-core machine busy.
+With ``AI_WORKER_PROCESSES`` set, the registry wraps the configured backend
+in a ``WorkerPoolBackend``: N spawned processes each load their own copy of
+the model, and the API process hands them decoded waveforms.
+
+Waveforms and scores travel through ``multiprocessing.shared_memory``, not
+through pickles: each worker has an input and an output segment, created
+and owned by the API process and grown when a batch doesn't fit. Only a
+small message with the segment names and array lengths goes through the
+worker's pipe.
+
+A monitor thread pings idle workers every ``health_interval`` seconds and
+restarts the ones that died or stopped answering. A worker that dies in the
+middle of a batch is restarted and the batch retried once on it.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from inference_backends import EMBEDDING_SIZE, InferenceBackend, NUM_CLASSES, patch_count
+from inference_metrics import memory_rss
+
+logger = logging.getLogger(__name__)
+
+# Smallest shared memory segment, in bytes
+MIN_SEGMENT = 1 << 20
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker process fails a request."""
+    pass
+
+
+def _attach(name: str, cache: Dict[str, shared_memory.SharedMemory]) -> shared_memory.SharedMemory:
+    """Attach to a parent-owned segment, dropping a previous one it replaced."""
+    segment = cache.get(name)
+    if segment is None:
+        for old in cache.values():
+            old.close()
+        cache.clear()
+        segment = cache[name] = shared_memory.SharedMemory(name=name)
+    return segment
+
+
+def _worker_main(conn, backend: InferenceBackend) -> None:
+    """Entry point of a worker process: load the model, then serve requests."""
+    try:
+        started = time.monotonic()
+        backend.load()
+        backend.warmup()
+        conn.send(("ready", time.monotonic() - started, backend.shape_stats()))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+
+    inputs: Dict[str, shared_memory.SharedMemory] = {}
+    outputs: Dict[str, shared_memory.SharedMemory] = {}
+    try:
+        while True:
+            message = conn.recv()
+            command = message[0]
+            if command == "stop":
+                break
+            if command == "ping":
+                conn.send(("pong",))
+                continue
+
+            _, input_name, output_name, lengths = message
+            try:
+                source = _attach(input_name, inputs)
+                samples = np.ndarray((sum(lengths),), dtype=np.float32, buffer=source.buf)
+                bounds = np.cumsum([0] + list(lengths))
+                results = backend.predict_batch([samples[a:b] for a, b in zip(bounds[:-1], bounds[1:])])
+
+                total = sum(len(scores) for scores, _ in results)
+                with_embeddings = all(embeddings is not None for _, embeddings in results)
+                target = _attach(output_name, outputs)
+                scores_out = np.ndarray((total, NUM_CLASSES), dtype=np.float32, buffer=target.buf)
+                scores_out[:] = np.concatenate([scores for scores, _ in results])
+                if with_embeddings:
+                    embeddings_out = np.ndarray((total, EMBEDDING_SIZE), dtype=np.float32, buffer=target.buf,
+                                                offset=scores_out.nbytes)
+                    embeddings_out[:] = np.concatenate([embeddings for _, embeddings in results])
+                conn.send(("ok", [len(scores) for scores, _ in results], with_embeddings, backend.shape_stats()))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for segment in list(inputs.values()) + list(outputs.values()):
+            segment.close()
+
+
+class _Worker:
+    """The API process' handle on one worker process."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.input: Optional[shared_memory.SharedMemory] = None
+        self.output: Optional[shared_memory.SharedMemory] = None
+        self.requests = 0
+        self.restarts = 0
+        self.load_seconds: Optional[float] = None
+        self.shapes: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    def segment(self, attribute: str, size: int) -> shared_memory.SharedMemory:
+        """Get the input or output segment, replacing it if it is too small."""
+        current = getattr(self, attribute)
+        if current is None or current.size < size:
+            if current is not None:
+                current.close()
+                current.unlink()
+            current = shared_memory.SharedMemory(create=True, size=max(MIN_SEGMENT, 1 << (size - 1).bit_length()))
+            setattr(self, attribute, current)
+        return current
+
+    def release_segments(self) -> None:
+        for attribute in ("input", "output"):
+            segment = getattr(self, attribute)
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+                setattr(self, attribute, None)
+
+
+class WorkerPoolBackend(InferenceBackend):
+    """Runs another backend in several worker processes."""
+
+    name = "pool"
+
+    def __init__(self, backend: InferenceBackend, processes: int,
+                 request_timeout: float = 60.0, health_interval: float = 10.0,
+                 start_timeout: float = 300.0):
+        """
+        Initialize the pool without starting processes.
+
+        Args:
+            backend: Unloaded backend each worker loads its own copy of
+            processes: Number of worker processes
+            request_timeout: Seconds a batch may take before the worker is
+                considered hung and restarted
+            health_interval: Seconds between health checks (0: none)
+            start_timeout: Seconds a worker may take to load the model
+        """
+        super().__init__(backend.model_path, backend.num_threads)
+        self.backend = backend
+        self.processes = max(1, processes)
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.start_timeout = start_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(i) for i in range(self.processes)]
+        # One permit per unlocked worker, so whoever gets a permit finds a free worker
+        self._available = threading.Semaphore(self.processes)
+        self._closed = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def load(self) -> None:
+        # Workers load their models in parallel
+        try:
+            for worker in self._workers:
+                self._spawn(worker)
+            for worker in self._workers:
+                self._wait_ready(worker)
+        except Exception:
+            self.close()
+            raise
+        if self.health_interval > 0:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="inference-pool-monitor", daemon=True)
+            self._monitor.start()
+        logger.info(f"Started {self.processes} {self.backend.name} inference worker processes")
+
+    def _start(self, worker: _Worker) -> None:
+        """Start a worker process and wait until its model is loaded."""
+        self._spawn(worker)
+        self._wait_ready(worker)
+
+    def _spawn(self, worker: _Worker) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn, self.backend),
+                                         name=f"inference-worker-{worker.index}", daemon=True)
+        process.start()
+        child_conn.close()
+        worker.process, worker.conn = process, parent_conn
+
+    def _wait_ready(self, worker: _Worker) -> None:
+        parent_conn, process = worker.conn, worker.process
+        if not parent_conn.poll(self.start_timeout):
+            self._stop(worker)
+            raise WorkerError(f"Worker {worker.index} did not load the model within {self.start_timeout:.0f} s")
+        try:
+            status, detail, *shapes = parent_conn.recv()
+        except EOFError:
+            process.join(1)
+            status, detail = "error", f"exit code {process.exitcode}"
+        if status != "ready":
+            self._stop(worker)
+            raise WorkerError(f"Worker {worker.index} failed to load the model: {detail}")
+        worker.load_seconds = detail
+        worker.shapes = shapes[0]
+
+    def _stop(self, worker: _Worker) -> None:
+        if worker.conn is not None:
+            try:
+                worker.conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+            worker.conn.close()
+            worker.conn = None
+        if worker.process is not None:
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join(1)
+            worker.process = None
+
+    def _restart(self, worker: _Worker, reason: str) -> None:
+        logger.warning(f"Restarting inference worker {worker.index}: {reason}")
+        worker.last_error = reason
+        worker.restarts += 1
+        self._stop(worker)
+        self._start(worker)
+
+    def _acquire(self) -> _Worker:
+        if not self._available.acquire(timeout=self.request_timeout):
+            raise WorkerError(f"No inference worker became free within {self.request_timeout:.0f} s")
+        for worker in self._workers:
+            if worker.lock.acquire(blocking=False):
+                return worker
+        self._available.release()
+        raise WorkerError("No free inference worker")
+
+    def _release(self, worker: _Worker) -> None:
+        worker.lock.release()
+        self._available.release()
+
+    def _call(self, worker: _Worker, waveforms: Sequence[np.ndarray]):
+        """Run one batch on a worker; returns the results, raises WorkerError."""
+        lengths = [len(w) for w in waveforms]
+        source = worker.segment("input", max(1, sum(lengths)) * 4)
+        samples = np.ndarray((sum(lengths),), dtype=np.float32, buffer=source.buf)
+        offset = 0
+        for waveform, length in zip(waveforms, lengths):
+            samples[offset:offset + length] = waveform
+            offset += length
+        patches = sum(patch_count(length) for length in lengths)
+        target = worker.segment("output", patches * (NUM_CLASSES + EMBEDDING_SIZE) * 4)
+
+        try:
+            worker.conn.send(("predict", source.name, target.name, lengths))
+            if not worker.conn.poll(self.request_timeout):
+                self._restart(worker, f"no answer within {self.request_timeout:.0f} s")
+                raise WorkerError(f"Inference worker {worker.index} timed out")
+            reply = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            raise ConnectionError(f"Inference worker {worker.index} exited") from e
+        if reply[0] != "ok":
+            raise WorkerError(f"Inference worker {worker.index}: {reply[1]}")
+
+        _, counts, with_embeddings, worker.shapes = reply
+        total = sum(counts)
+        scores = np.ndarray((total, NUM_CLASSES), dtype=np.float32, buffer=target.buf).copy()
+        embeddings = None
+        if with_embeddings:
+            embeddings = np.ndarray((total, EMBEDDING_SIZE), dtype=np.float32, buffer=target.buf,
+                                    offset=scores.nbytes).copy()
+        worker.requests += 1
+        results, start = [], 0
+        for count in counts:
+            results.append((scores[start:start + count],
+                            embeddings[start:start + count] if embeddings is not None else None))
+            start += count
+        return results
+
+    def predict_batch(self, waveforms: Sequence[np.ndarray]) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        worker = self._acquire()
+        try:
+            if worker.conn is None:
+                # An earlier restart failed
+                self._restart(worker, "not running")
+            try:
+                return self._call(worker, waveforms)
+            except ConnectionError as e:
+                # The process died under this batch; start a fresh one and retry once
+                self._restart(worker, str(e))
+                try:
+                    return self._call(worker, waveforms)
+                except ConnectionError as e:
+                    self._restart(worker, str(e))
+                    raise WorkerError(f"{e} twice on the same batch") from e
+        finally:
+            self._release(worker)
+
+    def predict(self, waveform: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return self.predict_batch([waveform])[0]
+
+    def check_health(self, ping_timeout: float = 5.0) -> None:
+        """Ping every idle worker; restart the ones that are dead or don't answer."""
+        for worker in self._workers:
+            if self._closed.is_set() or not self._available.acquire(blocking=False):
+                return
+            if not worker.lock.acquire(blocking=False):
+                self._available.release()
+                continue
+            try:
+                if worker.process is None or not worker.process.is_alive():
+                    code = worker.process.exitcode if worker.process is not None else None
+                    self._restart(worker, f"process exited (code {code})")
+                    continue
+                try:
+                    worker.conn.send(("ping",))
+                    alive = worker.conn.poll(ping_timeout) and worker.conn.recv() == ("pong",)
+                except (EOFError, OSError):
+                    alive = False
+                if not alive:
+                    self._restart(worker, "no answer to health check")
+            except Exception as e:
+                logger.error(f"Could not restart inference worker {worker.index}: {e}")
+            finally:
+                self._release(worker)
+
+    def _monitor_loop(self) -> None:
+        while not self._closed.wait(self.health_interval):
+            self.check_health()
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        self._closed.set()
+        for worker in self._workers:
+            with worker.lock:
+                self._stop(worker)
+                worker.release_segments()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "model_path": self.model_path, "processes": self.processes}
+
+    def shape_stats(self) -> Dict[str, Any]:
+        """Shape counters summed over the workers, each of which compiles its own model."""
+        shapes = [worker.shapes for worker in self._workers if worker.shapes is not None]
+        retraces = [stats["retraces"] for stats in shapes if stats["retraces"] is not None]
+        return {
+            "buckets": shapes[0]["buckets"] if shapes else [],
+            "compilations": sum(stats["compilations"] for stats in shapes),
+            "retraces": sum(retraces) if retraces else None,
+            "padded_patches": sum(stats["padded_patches"] for stats in shapes)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-worker state for status endpoints."""
+        return {
+            "processes": self.processes,
+            "restarts": sum(worker.restarts for worker in self._workers),
+            "workers": [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid if worker.process is not None else None,
+                    "alive": worker.process is not None and worker.process.is_alive(),
+                    "busy": worker.lock.locked(),
+                    "requests": worker.requests,
+                    "restarts": worker.restarts,
+                    "load_seconds": worker.load_seconds,
+                    "rss_bytes": memory_rss(worker.process.pid) if worker.process is not None else None,
+                    "last_error": worker.last_error
+                }
+                for worker in self._workers
+            ]
+        }
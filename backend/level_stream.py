@@ -0,0 +1,363 @@
+"""
+Rate-limited audio level streaming for WebSocket clients.
+
+Instead of pushing every capture block (~43 per second) to every client, level
+updates are produced by rate tiers. Each tier wakes up at its own rate, reads
+the blocks recorded since its last tick from the level history, aggregates
+them once and publishes the resulting frame on its hub channel, so the work
+per tick is the same whether one client or a thousand are subscribed.
+
+Frames are available as JSON (the default) or in a compact binary layout that
+carries every block reading of the tick instead of just the summary:
+
+    offset  type       field
+    0       4s         magic b"STLV"
+    4       uint8      format version (1)
+    5       uint8      flags (bit 0: backfill frame, see below)
+    6       uint16     header size in bytes (32)
+    8       uint32     number of readings N
+    12      uint32     capture sample rate
+    16      uint64     level history index of the first reading
+    24      float32    tier rate (frames per second)
+    28      4 bytes    padding
+    32      float64[N] block timestamps (UNIX seconds)
+    32+8N   float32[N] block RMS
+    32+12N  float32[N] block peak
+
+All values are little-endian and every array is aligned to its element size,
+so browsers can wrap them directly in typed arrays.
+
+Level history indices double as sequence numbers: they increase by one per
+capture block and keep increasing when capture is restarted. JSON frames carry
+the index of their last block as ``seq``. A reconnecting client that passes
+the last ``seq`` it saw as ``resume_from`` gets every block it missed, still
+held in the history, replayed in a single backfill message.
+"""
+
+import asyncio
+import logging
+import struct
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from audio_buffer import LevelHistory, rms_to_db
+from broadcast import BroadcastHub, Subscriber
+
+logger = logging.getLogger(__name__)
+
+# Rates (updates per second) clients may choose from
+DEFAULT_RATES = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0)
+
+# Binary frame layout, see the module docstring
+BINARY_SUBPROTOCOL = "soundtracker.levels.v1"
+BINARY_MAGIC = b"STLV"
+BINARY_VERSION = 1
+FLAG_BACKFILL = 0x01
+_HEADER = struct.Struct("<4sBBHIIQf4x")
+
+
+def pack_levels(first_index: int,
+                timestamps: np.ndarray,
+                rms: np.ndarray,
+                peak: np.ndarray,
+                rate: float,
+                sample_rate: int,
+                flags: int = 0) -> bytes:
+    """Pack block readings into a binary level frame."""
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flags, _HEADER.size,
+                          len(timestamps), sample_rate, first_index, rate)
+    return b"".join((
+        header,
+        timestamps.astype("<f8", copy=False).tobytes(),
+        rms.astype("<f4", copy=False).tobytes(),
+        peak.astype("<f4", copy=False).tobytes()
+    ))
+
+
+def unpack_levels(data: bytes) -> Dict[str, Any]:
+    """Decode a binary level frame produced by ``pack_levels``."""
+    magic, version, flags, header_size, count, sample_rate, first_index, rate = _HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC:
+        raise ValueError("not a level frame")
+    offset = header_size
+    timestamps = np.frombuffer(data, dtype="<f8", count=count, offset=offset)
+    offset += 8 * count
+    rms = np.frombuffer(data, dtype="<f4", count=count, offset=offset)
+    offset += 4 * count
+    peak = np.frombuffer(data, dtype="<f4", count=count, offset=offset)
+    return {
+        "version": version,
+        "flags": flags,
+        "first_index": first_index,
+        "sample_rate": sample_rate,
+        "rate": rate,
+        "timestamps": timestamps,
+        "rms": rms,
+        "peak": peak
+    }
+
+
+def aggregate_levels(timestamps: np.ndarray,
+                     rms: np.ndarray,
+                     peak: np.ndarray) -> Dict[str, Any]:
+    """
+    Summarize a run of per-block levels as a single frame.
+
+    ``rms`` in the result is the RMS over the whole run (the square root of the
+    mean block power), so it matches what a single long block would measure.
+
+    Returns:
+        Dictionary with timestamps, block count, RMS/dB statistics and peak
+    """
+    rms64 = rms.astype(np.float64)
+    window_rms = float(np.sqrt(np.mean(np.square(rms64))))
+    rms_min = float(rms64.min())
+    rms_max = float(rms64.max())
+    db_min, db_max, db = rms_to_db(np.array([rms_min, rms_max, window_rms])).tolist()
+    end = float(timestamps[-1])
+    return {
+        "type": "audio_level",
+        "timestamp": datetime.fromtimestamp(end).isoformat(),
+        "t": end,
+        "start": float(timestamps[0]),
+        "blocks": int(len(rms)),
+        "rms": window_rms,
+        "rms_min": rms_min,
+        "rms_max": rms_max,
+        "db": db,
+        "db_min": db_min,
+        "db_max": db_max,
+        "peak": float(peak.max())
+    }
+
+
+class LevelTier:
+    """Aggregated level frames at one fixed rate, shared by all its subscribers."""
+
+    def __init__(self,
+                 rate: float,
+                 hub: BroadcastHub,
+                 history_source: Callable[[], Optional[LevelHistory]],
+                 extra: Callable[[], Dict[str, Any]] = dict):
+        """
+        Initialize the tier.
+
+        Args:
+            rate: Frames per second
+            hub: Hub used to publish frames
+            history_source: Returns the current level history (or None when
+                capture is not set up); looked up on every tick because the
+                capture may be restarted
+            extra: Returns additional fields added to every frame
+        """
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.channel = f"levels:{rate:g}"
+        self.binary_channel = f"levels:{rate:g}:bin"
+        self.hub = hub
+        self.history_source = history_source
+        self.extra = extra
+        self.frames = 0
+        self._history = history_source()
+        self._cursor = self._history.count if self._history is not None else 0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscriber_count(self) -> int:
+        return self.hub.channel_size(self.channel) + self.hub.channel_size(self.binary_channel)
+
+    def take(self) -> Optional[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Get the blocks recorded since the previous call.
+
+        Returns:
+            Tuple of (first_index, timestamps, rms, peak), or None if there
+            are no new blocks
+        """
+        history = self.history_source()
+        if history is None:
+            return None
+        if history is not self._history:
+            # Capture was restarted; everything in the new history is unseen
+            self._history = history
+            self._cursor = history.oldest
+
+        stop = history.count
+        first = max(self._cursor, history.oldest)
+        timestamps, rms, peak = history.slice(first, stop)
+        self._cursor = stop
+        if len(timestamps) == 0:
+            return None
+        return first, timestamps, rms, peak
+
+    def position(self) -> int:
+        """History index of the first block the next frame will contain."""
+        history = self.history_source()
+        if history is None:
+            return self._cursor
+        if history is not self._history:
+            return history.oldest
+        return max(self._cursor, history.oldest)
+
+    def _json_frame(self, first, timestamps, rms, peak) -> Dict[str, Any]:
+        frame = aggregate_levels(timestamps, rms, peak)
+        frame["seq"] = first + len(timestamps) - 1
+        frame["rate"] = self.rate
+        frame.update(self.extra())
+        return frame
+
+    def _binary_frame(self, first, timestamps, rms, peak) -> bytes:
+        return pack_levels(first, timestamps, rms, peak, self.rate,
+                           int(self.extra().get("sample_rate", 0)))
+
+    def tick(self) -> None:
+        """Publish one frame in every format that has subscribers."""
+        taken = self.take()
+        if taken is None:
+            return
+        if self.hub.channel_size(self.channel):
+            self.hub.publish(self._json_frame(*taken), self.channel)
+        if self.hub.channel_size(self.binary_channel):
+            self.hub.publish(self._binary_frame(*taken), self.binary_channel)
+        self.frames += 1
+
+    async def run(self) -> None:
+        """Publish a frame every interval until cancelled."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error building level frame at {self.rate:g} Hz: {e}", exc_info=True)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class LevelStream:
+    """
+    Registry of rate tiers.
+
+    A tier is created and started when its first client subscribes and
+    stopped when its last client leaves.
+    """
+
+    def __init__(self,
+                 hub: BroadcastHub,
+                 history_source: Callable[[], Optional[LevelHistory]],
+                 rates: Iterable[float] = DEFAULT_RATES,
+                 extra: Callable[[], Dict[str, Any]] = dict):
+        """
+        Initialize the stream.
+
+        Args:
+            hub: Hub used to publish frames
+            history_source: Returns the current level history
+            rates: Allowed rates in frames per second
+            extra: Returns additional fields added to every frame
+        """
+        self.hub = hub
+        self.history_source = history_source
+        self.rates: List[float] = sorted(float(r) for r in rates if float(r) > 0)
+        if not self.rates:
+            raise ValueError("at least one positive rate is required")
+        self.extra = extra
+        self._tiers: Dict[float, LevelTier] = {}
+
+    def normalize_rate(self, rate: float) -> float:
+        """Map a requested rate to the closest allowed rate."""
+        return min(self.rates, key=lambda r: abs(r - float(rate)))
+
+    def subscribe(self, subscriber: Subscriber, rate: float, binary: bool = False) -> LevelTier:
+        """
+        Move a client to the tier closest to ``rate``.
+
+        Args:
+            subscriber: Client to move
+            rate: Requested frames per second
+            binary: Send binary frames instead of JSON
+        """
+        self.unsubscribe(subscriber)
+        rate = self.normalize_rate(rate)
+        tier = self._tiers.get(rate)
+        if tier is None:
+            tier = LevelTier(rate, self.hub, self.history_source, self.extra)
+            self._tiers[rate] = tier
+            tier.start()
+        self.hub.subscribe(subscriber, tier.binary_channel if binary else tier.channel)
+        return tier
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Remove a client from whatever tier it is on, stopping idle tiers."""
+        for rate, tier in list(self._tiers.items()):
+            self.hub.unsubscribe(subscriber, tier.channel)
+            self.hub.unsubscribe(subscriber, tier.binary_channel)
+            if not tier.subscriber_count():
+                tier.stop()
+                del self._tiers[rate]
+
+    def backfill(self, tier: LevelTier, resume_from: int,
+                 binary: bool = False) -> Union[Dict[str, Any], bytes]:
+        """
+        Build the message replaying the blocks a client missed.
+
+        Covers every retained block after ``resume_from`` up to where
+        ``tier`` will continue, so together with the tier's following
+        frames the client sees each block exactly once.
+
+        Args:
+            tier: Tier the client is subscribed to
+            resume_from: Last sequence number the client received
+            binary: Build a binary frame (flagged ``FLAG_BACKFILL``) instead of JSON
+
+        Returns:
+            JSON backfill message or binary level frame
+        """
+        stop = tier.position()
+        history = self.history_source()
+        reset = resume_from >= stop
+        if history is None or reset:
+            first = stop
+            timestamps = np.empty(0, dtype=np.float64)
+            rms = peak = np.empty(0, dtype=np.float32)
+        else:
+            first = max(resume_from + 1, history.oldest)
+            timestamps, rms, peak = history.slice(first, stop)
+
+        if binary:
+            return pack_levels(first, timestamps, rms, peak, tier.rate,
+                               int(self.extra().get("sample_rate", 0)), flags=FLAG_BACKFILL)
+        return {
+            "type": "backfill",
+            "resume_from": resume_from,
+            "first_seq": first,
+            "seq": stop - 1,
+            "missed": 0 if reset else first - (resume_from + 1),
+            "reset": reset,
+            "rate": tier.rate,
+            "timestamps": timestamps.tolist(),
+            "rms": rms.astype(np.float64).tolist(),
+            "peak": peak.astype(np.float64).tolist(),
+            **self.extra()
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-tier subscriber and frame counts."""
+        return {
+            f"{rate:g}": {
+                "subscribers": self.hub.channel_size(tier.channel),
+                "binary_subscribers": self.hub.channel_size(tier.binary_channel),
+                "frames": tier.frames
+            }
+            for rate, tier in self._tiers.items()
+        }
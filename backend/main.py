@@ -56,9 +56,13 @@ app.add_middleware(
 
 # Include API routers with v1 prefix
 api_router = APIRouter(prefix="/api/v1")
-api_router.include_router(sound_event_router, prefix="/sounds", tags=["Sound Events"])
+# The sound event router already has its own /sounds prefix
+api_router.include_router(sound_event_router, tags=["Sound Events"])
 # The AI router already has its own /ai prefix
 api_router.include_router(ai_router, tags=["AI"])
+# The audio router already has its own /audio prefix
+if audio_capture and hasattr(audio_capture, 'router'):
+    api_router.include_router(audio_capture.router)
 
 # Include WebSocket router at the root level
 if audio_capture and hasattr(audio_capture, 'ws_router'):
@@ -0,0 +1,246 @@
+"""
+Offline YAMNet model bundles.
+
+A bundle is a directory holding everything the classifier needs, so the
+backend can start without network access:
+
+    <bundle>/
+        manifest.json           format, source and SHA-256 of every file
+        yamnet_class_map.csv    class labels
+        saved_model/            the model (TensorFlow SavedModel)
+        yamnet.tflite           optional exports for the tflite/onnx backends
+        yamnet.onnx
+
+The registry verifies the checksums before loading a bundle. Create or check
+one with the CLI, on a machine that has network access:
+
+    python model_bundle.py fetch --dir models/yamnet
+    python model_bundle.py add --dir models/yamnet yamnet_int8.tflite
+    python model_bundle.py verify --dir models/yamnet
+
+``--url`` also accepts a local SavedModel directory, e.g. one exported on
+another machine and copied over.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+LABELS_NAME = "yamnet_class_map.csv"
+MANIFEST_VERSION = 1
+# Model file suffixes accepted by ``add_model``, and their formats
+MODEL_SUFFIXES = {".tflite": "tflite", ".onnx": "onnx"}
+
+
+class BundleError(Exception):
+    """Raised when a model bundle is missing, incomplete or corrupted."""
+    pass
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _bundle_files(bundle_dir: Path):
+    """Every file of the bundle except the manifest, as sorted POSIX relative paths."""
+    return sorted(
+        p.relative_to(bundle_dir).as_posix()
+        for p in bundle_dir.rglob("*")
+        if p.is_file() and p.name != MANIFEST_NAME
+    )
+
+
+def write_manifest(bundle_dir: str,
+                   model_path: str,
+                   model_format: str = "saved_model",
+                   source: Optional[str] = None,
+                   models: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Checksum the files of a bundle directory and write its manifest.
+
+    Args:
+        bundle_dir: Bundle directory
+        model_path: Model file or directory, relative to ``bundle_dir``
+        model_format: Format of the model, e.g. "saved_model"
+        source: Where the model came from, for reference
+        models: Further models by format, e.g. {"tflite": "yamnet.tflite"}
+
+    Returns:
+        The manifest
+    """
+    root = Path(bundle_dir)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "name": "yamnet",
+        "created": datetime.utcnow().isoformat(),
+        "source": source,
+        "model": {"format": model_format, "path": model_path},
+        "models": {**(models or {}), model_format: model_path},
+        "labels": LABELS_NAME,
+        "files": {name: file_sha256(root / name) for name in _bundle_files(root)}
+    }
+    with open(root / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def manifest_models(manifest: Dict[str, Any]) -> Dict[str, str]:
+    """Model paths of a manifest by format, including manifests without a ``models`` map."""
+    models = dict(manifest.get("models") or {})
+    primary = manifest.get("model") or {}
+    if primary.get("format"):
+        models.setdefault(primary["format"], primary.get("path"))
+    return models
+
+
+def read_manifest(bundle_dir: str) -> Dict[str, Any]:
+    """Read a bundle manifest without verifying the files."""
+    path = Path(bundle_dir) / MANIFEST_NAME
+    if not path.is_file():
+        raise BundleError(f"No model bundle in {bundle_dir} (missing {MANIFEST_NAME})")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError as e:
+        raise BundleError(f"Invalid bundle manifest {path}: {e}") from e
+
+
+def verify_bundle(bundle_dir: str) -> Dict[str, Any]:
+    """
+    Check that every file listed in the manifest exists with the recorded checksum.
+
+    Returns:
+        The manifest
+
+    Raises:
+        BundleError: If the bundle is missing, incomplete or modified
+    """
+    root = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+    files = manifest.get("files") or {}
+    for required in (manifest.get("labels"), *manifest_models(manifest).values()):
+        if not required or not (root / required).exists():
+            raise BundleError(f"Model bundle {bundle_dir} is incomplete: {required!r} missing")
+    for name, expected in files.items():
+        path = root / name
+        if not path.is_file():
+            raise BundleError(f"Model bundle file missing: {path}")
+        actual = file_sha256(path)
+        if actual != expected:
+            raise BundleError(f"Checksum mismatch for {path}: expected {expected}, got {actual}")
+    return manifest
+
+
+def fetch_bundle(bundle_dir: str, model_url: str, labels_path: str) -> Dict[str, Any]:
+    """
+    Download a model from TF Hub and store it as a bundle.
+
+    Args:
+        bundle_dir: Directory to create (replaced if it exists)
+        model_url: TF Hub handle of the model
+        labels_path: Class map CSV to copy into the bundle
+
+    Returns:
+        The manifest
+    """
+    import tensorflow_hub as hub
+
+    root = Path(bundle_dir)
+    staging = root.with_name(root.name + ".tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    logger.info(f"Downloading {model_url}...")
+    shutil.copytree(hub.resolve(model_url), staging / "saved_model")
+    shutil.copyfile(labels_path, staging / LABELS_NAME)
+    manifest = write_manifest(str(staging), "saved_model", "saved_model", source=model_url)
+
+    # Swap in the complete bundle only once everything is in place
+    if root.exists():
+        shutil.rmtree(root)
+    staging.rename(root)
+    return manifest
+
+
+def add_model(bundle_dir: str, model_file: str) -> Dict[str, Any]:
+    """
+    Copy a TFLite or ONNX export of the model into a verified bundle.
+
+    The format follows from the file suffix; a model of the same format
+    already in the bundle is replaced.
+
+    Returns:
+        The updated manifest
+    """
+    root = Path(bundle_dir)
+    source = Path(model_file)
+    model_format = MODEL_SUFFIXES.get(source.suffix.lower())
+    if model_format is None:
+        raise BundleError(f"Unsupported model file {source.name}; expected one of {', '.join(MODEL_SUFFIXES)}")
+    if not source.is_file():
+        raise BundleError(f"Model file not found: {source}")
+    manifest = verify_bundle(bundle_dir)
+
+    models = manifest_models(manifest)
+    previous = models.get(model_format)
+    name = "yamnet" + source.suffix.lower()
+    if previous and previous != name and (root / previous).is_file():
+        (root / previous).unlink()
+    shutil.copyfile(source, root / name)
+    models[model_format] = name
+    return write_manifest(bundle_dir, manifest["model"]["path"], manifest["model"]["format"],
+                          source=manifest.get("source"), models=models)
+
+
+def main(argv=None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Manage offline YAMNet model bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser("fetch", help="Download the model into a bundle directory")
+    fetch.add_argument("--dir", default=settings.AI_MODEL_DIR, help="Bundle directory")
+    fetch.add_argument("--url", default=settings.AI_MODEL_URL, help="TF Hub model handle")
+    fetch.add_argument("--labels", default=settings.AI_LABELS_PATH, help="Class map CSV to include")
+    add = commands.add_parser("add", help="Add a .tflite or .onnx export of the model to a bundle")
+    add.add_argument("--dir", default=settings.AI_MODEL_DIR, help="Bundle directory")
+    add.add_argument("file", help="Model file to copy into the bundle")
+    verify = commands.add_parser("verify", help="Check the checksums of a bundle")
+    verify.add_argument("--dir", default=settings.AI_MODEL_DIR, help="Bundle directory")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "fetch":
+            manifest = fetch_bundle(args.dir, args.url, args.labels)
+            print(f"Wrote {len(manifest['files'])} files to {args.dir}")
+        elif args.command == "add":
+            manifest = add_model(args.dir, args.file)
+            print(f"{args.dir}: models {', '.join(sorted(manifest['models']))}")
+        else:
+            manifest = verify_bundle(args.dir)
+            formats = ", ".join(sorted(manifest_models(manifest)))
+            print(f"{args.dir}: {len(manifest['files'])} files OK ({formats} from {manifest.get('source')})")
+    except BundleError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
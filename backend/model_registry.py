@@ -0,0 +1,360 @@
+"""
+Process-wide registry of the YAMNet sound classification model.
+
+Both the legacy ``ai`` module and the ``/ai`` router get the model from here,
+so it is loaded at most once per process. Nothing heavy happens at import
+time: TensorFlow is imported and the model loaded either on first use or by
+a background warmup thread started when the application starts, so the API
+binds its port immediately and reports readiness through ``/ai/status``.
+
+When the offline bundle directory (``AI_MODEL_DIR``) exists, the model and
+labels come from there after checksum verification and nothing touches the
+network. Otherwise the model is fetched from TF Hub, unless ``AI_OFFLINE`` is
+set, in which case loading fails instead.
+
+A failed load is retried after ``AI_LOAD_RETRY_SECONDS``, twice as long after
+each further failure, by the next request or warmup that comes along, so a
+model that was briefly unreachable doesn't need a restart.
+
+``AI_BACKEND`` picks how the model runs (see ``inference_backends``): the
+TensorFlow model itself, or a TFLite/ONNX export from the bundle or from
+``AI_BACKEND_MODEL``, which need neither TensorFlow nor the network. With
+``AI_WORKER_PROCESSES`` the backend runs in that many worker processes
+(see ``inference_pool``).
+"""
+
+import csv
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from inference_backends import MODEL_FORMATS, InferenceBackend, create_backend, parse_buckets
+from inference_metrics import memory_rss
+from inference_pool import WorkerPoolBackend
+from model_bundle import BundleError, file_sha256, manifest_models, verify_bundle
+
+logger = logging.getLogger(__name__)
+
+YAMNET_MODEL_URL = "https://tfhub.dev/google/yamnet/1"
+YAMNET_LABELS_URL = "https://raw.githubusercontent.com/tensorflow/models/master/research/audioset/yamnet/yamnet_class_map.csv"
+TF_HUB_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tfhub_modules")
+
+# Registry states
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Longest wait before retrying a failed load
+MAX_RETRY_SECONDS = 600.0
+
+
+class ModelNotReadyError(RuntimeError):
+    """Raised when the model is requested before it finished loading."""
+    pass
+
+
+def load_labels(path: str) -> List[str]:
+    """Load YAMNet display names from the class map CSV, in class index order."""
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        return [row["display_name"] for row in csv.DictReader(csvfile)]
+
+
+def model_version(backend: str, model_path: str) -> str:
+    """
+    Short fingerprint of a model: its backend and the contents of its file or
+    directory, or the handle itself for models that aren't local.
+    """
+    digest = hashlib.sha256(f"{backend}\0".encode())
+    path = Path(model_path)
+    if path.is_file():
+        digest.update(file_sha256(path).encode())
+    elif path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(f"{file.relative_to(path).as_posix()}\0{file_sha256(file)}\0".encode())
+    else:
+        digest.update(model_path.encode())
+    return digest.hexdigest()[:16]
+
+
+class ModelRegistry:
+    """
+    Lazily loaded, shared YAMNet model and class labels.
+
+    Loading is thread-safe and happens once; concurrent callers wait for the
+    first load instead of starting their own. After a failure the next load
+    is only attempted once the retry backoff has passed.
+    """
+
+    def __init__(self,
+                 model_url: str = settings.AI_MODEL_URL,
+                 labels_path: str = settings.AI_LABELS_PATH,
+                 labels_url: str = YAMNET_LABELS_URL,
+                 cache_dir: str = TF_HUB_CACHE_DIR,
+                 model_dir: Optional[str] = settings.AI_MODEL_DIR,
+                 offline: bool = settings.AI_OFFLINE,
+                 backend: str = settings.AI_BACKEND,
+                 backend_model: Optional[str] = settings.AI_BACKEND_MODEL,
+                 num_threads: int = settings.AI_NUM_THREADS,
+                 worker_processes: int = settings.AI_WORKER_PROCESSES,
+                 shape_buckets: str = settings.AI_SHAPE_BUCKETS,
+                 retry_seconds: float = settings.AI_LOAD_RETRY_SECONDS):
+        """
+        Initialize the registry without loading anything.
+
+        Args:
+            model_url: TF Hub handle or local SavedModel directory
+            labels_path: YAMNet class map CSV
+            labels_url: Where to download the class map if ``labels_path`` is missing
+            cache_dir: TF Hub download cache
+            model_dir: Offline bundle directory, preferred when it exists
+            offline: Never download; require the bundle in ``model_dir``
+            backend: Inference backend, "tfhub", "tflite" or "onnx"
+            backend_model: Model file for the tflite/onnx backends, instead
+                of the one in the bundle
+            num_threads: CPU threads per inference (0: runtime default)
+            worker_processes: Run the model in this many worker processes
+                (0: in this process)
+            shape_buckets: Comma-separated patch counts inputs are padded
+                to, each compiled during warmup (empty: no padding)
+            retry_seconds: Wait before retrying a failed load, doubled after
+                each further failure up to ``MAX_RETRY_SECONDS`` (0: never retry)
+        """
+        self.model_url = model_url
+        self.labels_path = labels_path
+        self.labels_url = labels_url
+        self.cache_dir = cache_dir
+        self.model_dir = model_dir
+        self.offline = offline
+        self.backend = backend.strip().lower()
+        self.backend_model = backend_model or None
+        self.num_threads = num_threads
+        self.worker_processes = worker_processes
+        self.shape_buckets = parse_buckets(shape_buckets)
+        self.retry_seconds = max(0.0, retry_seconds)
+        self.source: Optional[str] = None
+        self.model_path: Optional[str] = None
+        self.model_version: Optional[str] = None
+        self.model: Optional[InferenceBackend] = None
+        self.labels: Optional[List[str]] = None
+        self.state = IDLE
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        # Growth of this process' resident memory while loading the model
+        self.memory_bytes: Optional[int] = None
+        # Consecutive failed loads, and when the next one may start
+        self.failures = 0
+        self._retry_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def retry_in(self) -> Optional[float]:
+        """Seconds until a failed load may be retried (0: now), or None if it won't be."""
+        if self.state != FAILED or self._retry_at is None:
+            return None
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def _can_start(self) -> bool:
+        return self.state == IDLE or self.retry_in() == 0.0
+
+    def _download_labels(self) -> None:
+        import requests
+
+        logger.info(f"Downloading YAMNet class map from {self.labels_url}")
+        response = requests.get(self.labels_url, timeout=10)
+        response.raise_for_status()
+        with open(self.labels_path, "wb") as f:
+            f.write(response.content)
+
+    def _has_bundle(self) -> bool:
+        return bool(self.model_dir) and os.path.isdir(self.model_dir)
+
+    def _resolve(self):
+        """Pick the model and labels to load; returns (unloaded backend, labels)."""
+        if self.backend not in MODEL_FORMATS:
+            raise ValueError(f"Unknown AI_BACKEND {self.backend!r}; expected one of {', '.join(MODEL_FORMATS)}")
+        model_format = MODEL_FORMATS[self.backend]
+
+        if self._has_bundle():
+            manifest = verify_bundle(self.model_dir)
+            model_path = self.backend_model
+            if not model_path:
+                bundled = manifest_models(manifest).get(model_format)
+                if not bundled:
+                    raise BundleError(
+                        f"Model bundle {self.model_dir} has no {model_format} model; "
+                        "add one with 'python model_bundle.py add'"
+                    )
+                model_path = os.path.join(self.model_dir, bundled)
+            self.source = self.model_dir
+            labels = load_labels(os.path.join(self.model_dir, manifest["labels"]))
+            backend = create_backend(self.backend, model_path, self.num_threads, saved_model=True,
+                                     buckets=self.shape_buckets)
+            return backend, labels
+
+        if self.offline and (self.backend == "tfhub" or not self.backend_model):
+            raise BundleError(
+                f"AI_OFFLINE is set but there is no model bundle in {self.model_dir}; "
+                "create one with 'python model_bundle.py fetch'"
+            )
+        if not os.path.exists(self.labels_path):
+            if self.offline:
+                raise BundleError(f"AI_OFFLINE is set but the class map {self.labels_path} is missing")
+            self._download_labels()
+
+        if self.backend == "tfhub":
+            os.makedirs(self.cache_dir, exist_ok=True)
+            os.environ.setdefault("TFHUB_CACHE_DIR", self.cache_dir)
+            model_path = self.model_url
+        elif self.backend_model:
+            model_path = self.backend_model
+        else:
+            raise BundleError(
+                f"AI_BACKEND={self.backend} needs AI_BACKEND_MODEL or a model bundle "
+                f"with a {model_format} model in {self.model_dir}"
+            )
+        self.source = model_path
+        backend = create_backend(self.backend, model_path, self.num_threads, buckets=self.shape_buckets)
+        return backend, load_labels(self.labels_path)
+
+    def _load(self) -> None:
+        backend, labels = self._resolve()
+        if self.worker_processes > 0:
+            backend = WorkerPoolBackend(backend, self.worker_processes,
+                                        request_timeout=settings.AI_WORKER_TIMEOUT,
+                                        health_interval=settings.AI_WORKER_HEALTH_SECONDS)
+        logger.info(f"Loading YAMNet model with the {backend.name} backend from {backend.model_path}...")
+        backend.load()
+        logger.info(f"Loaded {len(labels)} YAMNet class labels")
+
+        try:
+            # Compile every input shape up front so the first requests aren't slow
+            scores = backend.warmup()
+            if scores.shape[-1] != len(labels):
+                raise ValueError(f"Model outputs {scores.shape[-1]} classes but the class map has {len(labels)}")
+        except Exception:
+            # Or a retry would start worker processes next to these ones
+            backend.close()
+            raise
+        logger.info(f"YAMNet warmup inference done for shape buckets {list(self.shape_buckets)}")
+
+        self.model = backend
+        self.model_path = backend.model_path
+        self.model_version = model_version(self.backend, backend.model_path)
+        self.labels = labels
+
+    def load(self) -> bool:
+        """
+        Load the model and labels unless already loaded.
+
+        Returns:
+            True if the model is ready
+        """
+        with self._lock:
+            if self.ready or (self.state == FAILED and self.retry_in() != 0.0):
+                return self.ready
+            self.state = LOADING
+            self._done.clear()
+            started = time.monotonic()
+            rss_before = memory_rss()
+            try:
+                self._load()
+                rss_after = memory_rss()
+                if rss_before is not None and rss_after is not None:
+                    self.memory_bytes = max(0, rss_after - rss_before)
+                self.state = READY
+                self.error = None
+                self.failures = 0
+                self._retry_at = None
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                self.failures += 1
+                if self.retry_seconds:
+                    delay = min(self.retry_seconds * 2 ** (self.failures - 1), MAX_RETRY_SECONDS)
+                    self._retry_at = time.monotonic() + delay
+                    logger.error(f"Failed to load YAMNet model, retrying in {delay:.0f}s: {e}", exc_info=True)
+                else:
+                    logger.error(f"Failed to load YAMNet model: {e}", exc_info=True)
+            finally:
+                self.load_seconds = time.monotonic() - started
+                self._done.set()
+        return self.ready
+
+    def close(self) -> None:
+        """Stop worker processes, if the model runs in any."""
+        if self.model is not None:
+            self.model.close()
+
+    def start_warmup(self) -> None:
+        """Load the model on a background thread if nobody has started to, or retry a failed load that is due."""
+        if not self._can_start() or (self._thread is not None and self._thread.is_alive()):
+            return
+        self.state = LOADING
+        self._done.clear()
+        self._thread = threading.Thread(target=self.load, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a load in progress; returns True if the model is ready."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def get(self, wait: bool = True):
+        """
+        Get the model, loading it first if nothing has started to or a
+        failed load is due for a retry.
+
+        Args:
+            wait: Block until a load in progress completes; if False, raise
+                ``ModelNotReadyError`` instead
+
+        Raises:
+            ModelNotReadyError: If the model is loading (and ``wait`` is
+                False) or failed to load and isn't due for a retry
+        """
+        if self.ready:
+            return self.model
+        if not wait and self.state == LOADING:
+            raise ModelNotReadyError("Model is still loading")
+        if not self.load():
+            raise ModelNotReadyError(f"Model failed to load: {self.error}")
+        return self.model
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the loading state for status endpoints."""
+        retry_in = self.retry_in()
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "failures": self.failures,
+            "retry_in": round(retry_in, 1) if retry_in is not None else None,
+            "load_seconds": self.load_seconds,
+            "memory_bytes": self.memory_bytes,
+            "classes": len(self.labels) if self.labels else 0,
+            "source": self.source,
+            "offline": self.offline,
+            "backend": self.backend,
+            "worker_processes": self.worker_processes,
+            "shape_buckets": list(self.shape_buckets),
+            "backend_model": self.model_path or self.backend_model,
+            "model_version": self.model_version,
+            "model_url": self.model_url,
+            "model_dir": self.model_dir,
+            "cache_dir": self.cache_dir
+        }
+
+
+# The one registry of the process
+registry = ModelRegistry()
@@ -0,0 +1,197 @@
+"""
+Cache of YAMNet scores keyed by the content of uploaded audio.
+
+Devices re-upload the same clip on retries and duplicate triggers. The cache
+maps a BLAKE2b hash of the uploaded bytes plus the model version to the
+per-patch score matrix, so a repeated upload skips decoding and inference.
+Scores rather than finished responses are cached, because ``top_k``, pooling
+and timeline options are cheap to apply afterwards.
+
+The in-memory tier is an LRU bounded by entry count and by bytes of scores.
+With a database path, entries are also written to SQLite, which survives
+restarts and is consulted on memory misses; it is bounded by entry count and
+drops the least recently used rows.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_cache (
+    key TEXT PRIMARY KEY,
+    patches INTEGER NOT NULL,
+    classes INTEGER NOT NULL,
+    scores BLOB NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def content_key(data: bytes, model_version: str) -> str:
+    """Cache key of uploaded bytes for one model version."""
+    digest = hashlib.blake2b(data, digest_size=16, person=b"soundtracker")
+    return f"{model_version}:{digest.hexdigest()}"
+
+
+class PredictionCache:
+    """Two-tier (memory LRU, optional SQLite) cache of score matrices; thread-safe."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 << 20,
+                 db_path: Optional[str] = None, db_max_entries: int = 10000):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Most score matrices kept in memory (0: no memory tier)
+            max_bytes: Most bytes of scores kept in memory
+            db_path: SQLite file for the persistent tier (None or empty: none)
+            db_max_entries: Most rows kept in the SQLite file
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path or None
+        self.db_max_entries = db_max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db_evictions = 0
+        self.db_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return (self.max_entries > 0 and self.max_bytes > 0) or self.db_path is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(SCHEMA)
+            self._db.commit()
+        return self._db
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Cached scores for ``key``, or None. Database hits are promoted to memory."""
+        with self._lock:
+            scores = self._entries.get(key)
+            if scores is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return scores
+            if self.db_path is not None:
+                scores = self._db_get(key)
+                if scores is not None:
+                    self.db_hits += 1
+                    self._remember(key, scores)
+                    return scores
+            self.misses += 1
+            return None
+
+    def put(self, key: str, scores: np.ndarray) -> None:
+        """Store scores under ``key`` in every tier."""
+        scores = np.array(scores, dtype=np.float32)
+        scores.setflags(write=False)
+        with self._lock:
+            self._remember(key, scores)
+            if self.db_path is not None:
+                self._db_put(key, scores)
+
+    def _remember(self, key: str, scores: np.ndarray) -> None:
+        if self.max_entries <= 0 or scores.nbytes > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = scores
+        self._bytes += scores.nbytes
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _db_get(self, key: str) -> Optional[np.ndarray]:
+        try:
+            db = self._connect()
+            row = db.execute("SELECT patches, classes, scores FROM prediction_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE prediction_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+        except sqlite3.Error as e:
+            self.db_errors += 1
+            logger.warning(f"Prediction cache database read failed: {e}")
+            return None
+        patches, classes, blob = row
+        return np.frombuffer(blob, dtype="<f4").reshape(patches, classes)
+
+    def _db_put(self, key: str, scores: np.ndarray) -> None:
+        try:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO prediction_cache (key, patches, classes, scores, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, scores.shape[0], scores.shape[1], scores.astype("<f4").tobytes(), time.time())
+            )
+            (count,) = db.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()
+            if count > self.db_max_entries:
+                excess = count - self.db_max_entries
+                db.execute(
+                    "DELETE FROM prediction_cache WHERE key IN "
+                    "(SELECT key FROM prediction_cache ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.db_evictions += excess
+            db.commit()
+        except sqlite3.Error as e:
+            self.db_errors += 1
+            logger.warning(f"Prediction cache database write failed: {e}")
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self.db_path is not None:
+                try:
+                    self._connect().execute("DELETE FROM prediction_cache")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self.db_errors += 1
+                    logger.warning(f"Prediction cache database clear failed: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for the status endpoint."""
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.db_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "db_path": self.db_path,
+                "db_evictions": self.db_evictions,
+                "db_errors": self.db_errors
+            }
@@ -0,0 +1,379 @@
+"""
+Continuous YAMNet classification of the live capture stream.
+
+``SlidingWindows`` turns capture blocks into YAMNet's input as they arrive:
+the audio is resampled to 16 kHz with a stateful ``StreamResampler`` and cut
+into 0.975 s windows every 0.48 s, the same patches YAMNet cuts from a whole
+recording. Alongside, YAMNet's log-mel frames (25 ms every 10 ms, 64 bands)
+are computed once each with ``MelSpectrogram``; consecutive windows share 48
+of their 96 frames, which are kept rather than recomputed.
+
+The inference backends take waveforms and compute log-mel inside the model,
+so the frames don't replace the model's front end. They gate it instead: a
+window whose loudest frame is below the silence floor is reported as
+"Silence" without a model call, so an idle microphone costs almost nothing.
+
+``RealtimeClassifier`` reads the capture ring buffer from an asyncio task and
+sends the windows through the shared ``InferenceBatcher``, so live audio and
+uploads never run the model at the same time. It publishes one message per
+window on the hub's classification channel and merges windows into segments
+with ``StreamSummary``; every closed segment is saved as a ``SoundEvent``.
+Lag is measured from the capture of a window's last sample to its message.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from audio_decode import StreamResampler
+from broadcast import BroadcastHub
+from inference_backends import PATCH_HOP, PATCH_WINDOW, SAMPLE_RATE
+from inference_batcher import InferenceBatcher
+from inference_executor import InferenceExecutor
+from inference_metrics import STATS_WINDOW, percentiles
+from models import SoundEvent
+from score_summary import PATCH_SECONDS, StreamSummary, describe_top_k
+from spectrogram import MelSpectrogram
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATION_CHANNEL = "classification"
+
+# YAMNet's log-mel front end at 16 kHz
+YAMNET_WINDOW_LENGTH = 400  # 25 ms
+YAMNET_HOP_LENGTH = 160  # 10 ms
+YAMNET_N_FFT = 512
+YAMNET_N_MELS = 64
+YAMNET_FMIN = 125.0
+YAMNET_FMAX = 7500.0
+YAMNET_LOG_OFFSET = 0.001
+
+# Log-mel frames per window; a window is exactly 400 + 95 * 160 samples
+PATCH_FRAMES = 1 + (PATCH_WINDOW - YAMNET_WINDOW_LENGTH) // YAMNET_HOP_LENGTH
+
+SILENCE_LABEL = "Silence"
+
+
+def yamnet_log_mel() -> MelSpectrogram:
+    """Streaming log-mel spectrogram with YAMNet's parameters."""
+    return MelSpectrogram(SAMPLE_RATE, n_fft=YAMNET_N_FFT, hop_length=YAMNET_HOP_LENGTH,
+                          n_mels=YAMNET_N_MELS, window_length=YAMNET_WINDOW_LENGTH,
+                          fmin=YAMNET_FMIN, fmax=YAMNET_FMAX, log_offset=YAMNET_LOG_OFFSET)
+
+
+class LiveWindow(NamedTuple):
+    """One YAMNet window of live audio."""
+    start: int  # Position of its first sample in the 16 kHz stream
+    waveform: np.ndarray  # PATCH_WINDOW samples at 16 kHz
+    log_mel: np.ndarray  # (PATCH_FRAMES, YAMNET_N_MELS) natural-log mel frames
+
+
+class SlidingWindows:
+    """
+    Resample live audio to 16 kHz and cut it into overlapping YAMNet windows.
+
+    Only the samples and frames that the next window still needs are kept
+    between calls.
+    """
+
+    def __init__(self, orig_sr: int):
+        self.orig_sr = orig_sr
+        self.reset()
+
+    def reset(self) -> None:
+        """Start over, e.g. after a gap in the audio."""
+        self._resampler = StreamResampler(self.orig_sr, SAMPLE_RATE)
+        self._mel = yamnet_log_mel()
+        self._samples = np.zeros(0, dtype=np.float32)
+        self._frames = np.zeros((0, YAMNET_N_MELS), dtype=np.float32)
+        # 16 kHz positions of the first kept sample and frame, and of the next window
+        self._sample_base = 0
+        self._frame_base = 0
+        self.next_start = 0
+
+    def push(self, samples: np.ndarray) -> List[LiveWindow]:
+        """
+        Add mono samples at the capture rate.
+
+        Returns:
+            The windows completed by these samples, oldest first
+        """
+        resampled = self._resampler.process(samples)
+        self._samples = np.concatenate((self._samples, resampled))
+        # process() returns a reused buffer; concatenating copies it
+        self._frames = np.concatenate((self._frames, self._mel.process(resampled)))
+
+        windows = []
+        while self.next_start + PATCH_WINDOW <= self._sample_base + len(self._samples):
+            offset = self.next_start - self._sample_base
+            first = self.next_start // YAMNET_HOP_LENGTH - self._frame_base
+            windows.append(LiveWindow(
+                self.next_start,
+                self._samples[offset:offset + PATCH_WINDOW].copy(),
+                self._frames[first:first + PATCH_FRAMES].copy()
+            ))
+            self.next_start += PATCH_HOP
+
+        drop = self.next_start - self._sample_base
+        if drop > 0:
+            self._samples = self._samples[drop:]
+            self._sample_base += drop
+        drop = self.next_start // YAMNET_HOP_LENGTH - self._frame_base
+        if drop > 0:
+            self._frames = self._frames[drop:]
+            self._frame_base += drop
+        return windows
+
+
+def loudest_frame(window: LiveWindow) -> float:
+    """Mean log-mel level of the window's loudest frame."""
+    return float(window.log_mel.mean(axis=1).max())
+
+
+class RealtimeClassifier:
+    """Asyncio task classifying live capture audio window by window."""
+
+    def __init__(self,
+                 hub: BroadcastHub,
+                 capture_source: Callable[[], Any],
+                 batcher: InferenceBatcher,
+                 model: Any,
+                 executor: Optional[InferenceExecutor] = None,
+                 interval: float = 0.25,
+                 min_confidence: float = 0.3,
+                 silence_floor: float = -6.5,
+                 session_factory: Optional[Callable[[], Any]] = None,
+                 channel: str = CLASSIFICATION_CHANNEL):
+        """
+        Initialize the classifier.
+
+        Args:
+            hub: Hub used to publish messages
+            capture_source: Returns the current AudioCapture (or None)
+            batcher: Batcher of the shared model
+            model: ``routers.ai.AIModel`` giving the readiness, labels and
+                sound types of the shared model
+            executor: Pool for resampling and framing (default: asyncio's);
+                database writes always use asyncio's, so the last segment
+                is still saved after the AI router shut the pool down
+            interval: Seconds between reads of the capture buffer
+            min_confidence: Patches whose top score is lower belong to no event
+            silence_floor: Windows whose loudest log-mel frame (mean natural
+                log mel magnitude) is below this skip the model
+            session_factory: Returns a database session for saving events
+                (None: events are published but not saved)
+            channel: Hub channel to publish on
+        """
+        self.hub = hub
+        self.capture_source = capture_source
+        self.batcher = batcher
+        self.model = model
+        self.executor = executor
+        self.interval = interval
+        self.min_confidence = min_confidence
+        self.silence_floor = silence_floor
+        self.session_factory = session_factory
+        self.channel = channel
+
+        self._capture = None
+        self._seq = 0
+        self._origin = 0
+        self._origin_time: Optional[float] = None
+        self._windows: Optional[SlidingWindows] = None
+        self._summary: Optional[StreamSummary] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.windows = 0
+        self.windows_silent = 0
+        self.events = 0
+        self.gaps = 0
+        self._lags: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the classification task on the running loop if it isn't running."""
+        if not self.is_running():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the task and save the segment that was still open."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self._close_segment()
+        except Exception as e:
+            logger.error(f"Error saving the last live segment: {e}", exc_info=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Error classifying live audio: {e}", exc_info=True)
+
+    async def _call(self, func: Callable[..., Any], *args) -> Any:
+        if self.executor is not None:
+            return await self.executor.run(func, *args)
+        return await asyncio.to_thread(func, *args)
+
+    async def poll(self) -> int:
+        """
+        Classify the audio captured since the last call.
+
+        Returns:
+            Number of windows classified
+        """
+        capture = self.capture_source()
+        if capture is None:
+            return 0
+        if not self.model.initialized:
+            self.model.registry.start_warmup()
+            return 0
+        if capture is not self._capture:
+            # New capture instance: start from its current position
+            await self._close_segment()
+            self._capture = capture
+            self._seq = capture.read_since(0)[1]
+            self._restart(self._seq)
+
+        data, seq = capture.read_since(self._seq)
+        if seq - len(data) > self._seq:
+            # Lost audio to the ring buffer; no window or segment spans the gap
+            self.gaps += 1
+            await self._close_segment()
+            self._restart(seq - len(data))
+        self._seq = seq
+        if len(data) == 0:
+            return 0
+
+        mono = data[:, 0] if data.shape[1] == 1 else data.mean(axis=1)
+        windows = await self._call(self._windows.push, mono)
+        if windows:
+            await self._classify(capture, windows)
+        return len(windows)
+
+    def _restart(self, position: int) -> None:
+        """Start a new run of windows at a capture buffer position."""
+        self._origin = position
+        self._origin_time = None
+        self._windows = SlidingWindows(self._capture.sample_rate)
+        self._summary = StreamSummary(self.model.class_labels, self.min_confidence)
+
+    def _capture_position(self, start: int) -> int:
+        """Capture buffer position of a 16 kHz stream position."""
+        return self._origin + int(start * self._capture.sample_rate / SAMPLE_RATE)
+
+    async def _classify(self, capture, windows: List[LiveWindow]) -> None:
+        labels = self.model.class_labels
+        sound_types = self.model.sound_types
+        silence = labels.index(SILENCE_LABEL) if SILENCE_LABEL in labels else None
+        loud = [w for w in windows if silence is None or loudest_frame(w) >= self.silence_floor]
+        results = await asyncio.gather(*(self.batcher.submit(w.waveform) for w in loud))
+        scores_of = {w.start: result.scores[:1] for w, result in zip(loud, results)}
+
+        segments = []
+        for window in windows:
+            scores = scores_of.get(window.start)
+            silent = scores is None
+            if silent:
+                scores = np.zeros((1, len(labels)), dtype=np.float32)
+                scores[0, silence] = 1.0
+                self.windows_silent += 1
+            self.windows += 1
+
+            end = window.start + PATCH_WINDOW
+            end_time = capture.capture_time(self._capture_position(end) - 1)
+            if self._origin_time is None:
+                self._origin_time = end_time - end / SAMPLE_RATE
+            sound_type, type_confidence = sound_types.classify(scores)
+            lag = time.time() - end_time
+            self._lags.append(lag)
+            self.hub.publish({
+                "type": "classification",
+                "start": round(end_time - PATCH_SECONDS, 3),
+                "end": round(end_time, 3),
+                "predictions": describe_top_k(scores, labels, 3),
+                "sound_type": sound_type.value,
+                "sound_type_confidence": round(type_confidence, 4),
+                "silent": silent,
+                "lag_ms": round(lag * 1000, 1)
+            }, self.channel)
+            segments.extend(self._summary.add(scores))
+        await self._save(segments)
+
+    async def _close_segment(self) -> None:
+        if self._summary is not None:
+            await self._save(self._summary.finish())
+
+    async def _save(self, segments: List[dict]) -> None:
+        """Save closed segments as sound events and announce them."""
+        if not segments or self._origin_time is None:
+            return
+        sound_types = self.model.sound_types
+        events = [
+            SoundEvent(
+                timestamp=datetime.fromtimestamp(self._origin_time + segment["start"], timezone.utc),
+                sound_type=sound_types.type_of(segment["class_id"]),
+                confidence=min(max(segment["confidence"], 0.0), 1.0),
+                duration_seconds=segment["end"] - segment["start"],
+                sample_rate=SAMPLE_RATE,
+                channels=1,
+                event_metadata={
+                    "source": "realtime",
+                    "class_name": segment["class_name"],
+                    "class_id": segment["class_id"]
+                }
+            )
+            for segment in segments
+        ]
+        ids = [None] * len(events)
+        if self.session_factory is not None:
+            ids = await asyncio.to_thread(self._write_events, events)
+            self.events += len(events)
+        for segment, event, event_id in zip(segments, events, ids):
+            self.hub.publish({
+                "type": "sound_event",
+                "event_id": event_id,
+                "start": round(self._origin_time + segment["start"], 3),
+                "end": round(self._origin_time + segment["end"], 3),
+                "class_name": segment["class_name"],
+                "class_id": segment["class_id"],
+                "confidence": segment["confidence"],
+                "sound_type": event.sound_type.value
+            }, self.channel)
+
+    def _write_events(self, events: List[SoundEvent]) -> List[int]:
+        session = self.session_factory()
+        try:
+            session.add_all(events)
+            session.commit()
+            for event in events:
+                session.refresh(event)
+            return [event.id for event in events]
+        finally:
+            session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for the audio status endpoint."""
+        return {
+            "running": self.is_running(),
+            "windows": self.windows,
+            "windows_silent": self.windows_silent,
+            "events": self.events,
+            "gaps": self.gaps,
+            "lag_ms": percentiles(self._lags)
+        }
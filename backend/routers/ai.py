@@ -3,19 +3,37 @@ AI Router for SoundTracker
 
 This module provides endpoints for sound classification using the YAMNet model.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import AsyncIterator, Iterator, List, Literal, Optional, Dict, Any, Tuple
+import asyncio
+import json
 import logging
+import math
 import os
-import io
+import shutil
+import tempfile
+import threading
+import time
 import numpy as np
-import tensorflow as tf
-import tensorflow_hub as hub
-import librosa
-import requests
-import csv
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from sqlmodel import Session
+
+from model_registry import LOADING, ModelNotReadyError, ModelRegistry, registry
+from audio_decode import UnsupportedAudioError, load_audio, overlapping_windows, stream_audio
+from inference_batcher import InferenceBatcher
+from inference_executor import Admission, InferenceExecutor, OverloadedError, default_workers
+from inference_metrics import InferenceMetrics, memory_rss, prometheus_text
+from inference_pool import WorkerPoolBackend
+from inference_backends import NUM_CLASSES, SAMPLE_RATE, stream_window
+from score_summary import StreamSummary, describe_timeline, describe_top_k
+from sound_types import SoundTypeIndex
+from prediction_cache import PredictionCache, content_key
+from embedding_store import clip_embedding, store as embedding_store
+from database import get_session
+from models import SoundEvent
+from config import settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -28,10 +46,22 @@ class AudioPredictionResult(BaseModel):
     confidence: float
     class_id: int
 
+class TimelineSegment(BaseModel):
+    class_name: str
+    class_id: int
+    start: float
+    end: float
+    confidence: float
+
 class AudioPredictionResponse(BaseModel):
     success: bool
     predictions: List[AudioPredictionResult]
+    timeline: Optional[List[TimelineSegment]] = None
     error: Optional[str] = None
+    queue_wait_ms: Optional[float] = None
+    cached: bool = False
+    event_id: Optional[int] = None
+    save_error: Optional[str] = None
 
 class SoundClass(BaseModel):
     id: int
@@ -43,117 +73,260 @@ class SoundClassesResponse(BaseModel):
 
 # AI Model Configuration
 class AIModelConfig:
-    def __init__(self):
-        self.yamnet_model_url = "https://tfhub.dev/google/yamnet/1"
-        self.yamnet_labels_url = "https://raw.githubusercontent.com/tensorflow/models/master/research/audioset/yamnet/yamnet_class_map.csv"
-        self.labels_path = "yamnet_class_map.csv"
-        self.tf_hub_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "tfhub_modules")
+    def __init__(self, registry: ModelRegistry = registry):
+        self.yamnet_model_url = registry.model_url
+        self.yamnet_labels_url = registry.labels_url
+        self.labels_path = registry.labels_path
+        self.tf_hub_cache_dir = registry.cache_dir
 
 class AIModel:
-    def __init__(self, config: AIModelConfig):
+    """Prediction helpers on top of the process-wide model registry."""
+    
+    def __init__(self, config: AIModelConfig, registry: ModelRegistry = registry,
+                 cache: Optional[PredictionCache] = None):
         self.config = config
-        self.model = None
-        self.class_labels = None
-        self.initialized = False
-        self.error = None
+        self.registry = registry
+        self.cache = cache
+        self._sound_types: Optional[SoundTypeIndex] = None
+    
+    @property
+    def model(self):
+        return self.registry.model
+    
+    @property
+    def class_labels(self) -> Optional[list]:
+        return self.registry.labels
+    
+    @property
+    def sound_types(self) -> SoundTypeIndex:
+        """Class-to-SoundType index, rebuilt only when the registry loads new labels."""
+        if self._sound_types is None or self._sound_types.labels is not self.class_labels:
+            self._sound_types = SoundTypeIndex(self.class_labels)
+        return self._sound_types
+    
+    @property
+    def initialized(self) -> bool:
+        return self.registry.ready
+    
+    @property
+    def error(self) -> Optional[str]:
+        return self.registry.error
         
-    def initialize(self):
-        try:
-            logger.info("Initializing AI model...")
-            os.makedirs(self.config.tf_hub_cache_dir, exist_ok=True)
-            os.environ["TFHUB_CACHE_DIR"] = self.config.tf_hub_cache_dir
-            
-            # Download labels if they don't exist
-            self._download_labels()
-            self.class_labels = self._load_labels()
-            
-            # Load the model
-            logger.info("Loading YAMNet model...")
-            self.model = hub.load(self.config.yamnet_model_url)
-            logger.info("YAMNet model loaded successfully")
-            self.initialized = True
-            return True
-        except Exception as e:
-            self.error = str(e)
-            logger.error(f"Failed to initialize AI model: {e}", exc_info=True)
-            return False
-    
-    def _download_labels(self):
-        if not os.path.exists(self.config.labels_path):
-            logger.info(f"Downloading YAMNet labels from {self.config.yamnet_labels_url}")
-            response = requests.get(self.config.yamnet_labels_url)
-            with open(self.config.labels_path, 'w') as f:
-                f.write(response.text)
-    
-    def _load_labels(self) -> list:
-        with open(self.config.labels_path, 'r') as f:
-            reader = csv.reader(f)
-            return [row[2] for row in reader if len(row) > 2]
-    
-    def preprocess_audio(self, audio_bytes: bytes) -> Optional[np.ndarray]:
+    def initialize(self) -> bool:
+        """Load the shared model now (blocking) unless it is already loaded."""
+        return self.registry.load()
+    
+    def preprocess_audio(self, audio_bytes: bytes, timings: Optional[Dict[str, float]] = None) -> Optional[np.ndarray]:
         try:
-            # Convert bytes to numpy array
-            audio, _ = librosa.load(io.BytesIO(audio_bytes), sr=16000, mono=True)
-            return audio
+            # WAV is decoded directly; other formats go through librosa
+            return load_audio(audio_bytes, sr=16000, timings=timings)
         except Exception as e:
             logger.error(f"Error preprocessing audio: {e}")
             return None
     
+    def cached_scores(self, audio_bytes: bytes) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Look an upload up in the prediction cache.
+        
+        Returns:
+            Tuple of (cache key, cached scores or None); the key is None when
+            caching is off
+        """
+        if self.cache is None or not self.cache.enabled or self.registry.model_version is None:
+            return None, None
+        key = content_key(audio_bytes, self.registry.model_version)
+        return key, self.cache.get(key)
+    
+    def remember(self, key: Optional[str], scores: np.ndarray) -> None:
+        """Cache the scores of an upload looked up with ``cached_scores``."""
+        if key is not None:
+            self.cache.put(key, scores)
+    
     def predict(self, audio_data: bytes) -> Optional[Dict[str, Any]]:
         if not self.initialized or self.model is None:
             return {"error": "Model not initialized", "details": self.error}
         
         try:
+            key, scores = self.cached_scores(audio_data)
+            if scores is not None:
+                return self.top_prediction(scores)
+            
             # Preprocess audio
             waveform = self.preprocess_audio(audio_data)
             if waveform is None:
                 return {"error": "Failed to preprocess audio data"}
             
             # Run inference
-            scores, embeddings, spectrogram = self.model(waveform)
-            predicted_class = tf.argmax(scores, axis=-1).numpy()[0]
-            confidence = tf.reduce_max(scores, axis=-1).numpy()[0]
-            
-            return {
-                "class": self.class_labels[predicted_class],
-                "confidence": float(confidence),
-                "class_id": int(predicted_class)
-            }
+            scores = self.model.predict_scores(waveform)
+            self.remember(key, scores)
+            return self.top_prediction(scores)
         except Exception as e:
             logger.error(f"Error during prediction: {e}", exc_info=True)
             return {"error": "Prediction failed", "details": str(e)}
+    
+    def top_prediction(self, scores: np.ndarray) -> Dict[str, Any]:
+        """Best class of the first patch of per-patch scores."""
+        predicted_class = int(np.argmax(scores, axis=-1)[0])
+        confidence = float(np.max(scores, axis=-1)[0])
+        
+        return {
+            "class": self.class_labels[predicted_class],
+            "confidence": confidence,
+            "class_id": predicted_class
+        }
+    
+    def summarize(self, scores: np.ndarray, top_k: int = 0, pooling: str = "mean",
+                  timeline: bool = False, min_confidence: float = 0.0) -> Dict[str, Any]:
+        """
+        Predictions for a whole clip from its per-patch scores.
+        
+        With ``top_k`` the predictions are the best classes pooled over every
+        patch, otherwise the best class of the first patch. ``timeline`` adds
+        segments of consecutive patches with the same top class.
+        """
+        if top_k:
+            predictions = describe_top_k(scores, self.class_labels, top_k, pooling)
+        else:
+            best = self.top_prediction(scores)
+            predictions = [{"class_name": best["class"], "confidence": best["confidence"], "class_id": best["class_id"]}]
+        result = {"predictions": predictions}
+        if timeline:
+            result["timeline"] = describe_timeline(scores, self.class_labels, min_confidence)
+        return result
+
+# Repeated uploads of the same clip skip decoding and inference
+cache = PredictionCache(
+    settings.AI_CACHE_MAX_ENTRIES,
+    int(settings.AI_CACHE_MAX_MB * (1 << 20)),
+    settings.AI_CACHE_DB,
+    settings.AI_CACHE_DB_MAX_ENTRIES
+)
 
 # Initialize the AI model
 ai_config = AIModelConfig()
-ai_model = AIModel(ai_config)
+ai_model = AIModel(ai_config, cache=cache)
+
+# Decoding and inference run on their own bounded pool, never on the event loop
+executor = InferenceExecutor(
+    settings.AI_INFERENCE_WORKERS or default_workers(settings.AI_NUM_THREADS, settings.AI_WORKER_PROCESSES),
+    settings.AI_MAX_PENDING
+)
+# Concurrent /predict requests share model calls; one batch per worker process runs at a time
+batcher = InferenceBatcher(registry, settings.AI_BATCH_MAX_SIZE, settings.AI_BATCH_MAX_WAIT_MS, executor,
+                           max_in_flight=max(1, settings.AI_WORKER_PROCESSES))
+# Stage latencies and throughput of /predict requests
+metrics = InferenceMetrics()
+
+# Formats /predict/stream can decode block by block
+STREAM_EXTENSIONS = ('.wav', '.wave', '.flac', '.ogg')
+
+async def _require_model() -> None:
+    """Raise 503 unless the model is ready, loading it on demand when warmup is disabled."""
+    if ai_model.initialized:
+        return
+    if registry.state == LOADING:
+        raise HTTPException(
+            status_code=503,
+            detail="AI model is still loading. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+    try:
+        await asyncio.to_thread(registry.get)
+    except ModelNotReadyError:
+        # A failed load is retried by the first request after its backoff
+        retry_in = registry.retry_in()
+        raise HTTPException(
+            status_code=503,
+            detail="AI model is not initialized. Please check the /ai/status endpoint.",
+            headers={"Retry-After": str(math.ceil(retry_in))} if retry_in is not None else None
+        )
+
+def _admit() -> Admission:
+    """Admission for one request, or 429 when too many are in progress."""
+    try:
+        return executor.admit()
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"{e}. Please retry later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
 @router.on_event("startup")
 async def startup_event():
-    # Initialize the AI model when the application starts
-    if not ai_model.initialize():
-        logger.error("Failed to initialize AI model. Some features may not work.")
+    # Load the model in the background so the server accepts requests right away
+    if settings.AI_WARMUP:
+        registry.start_warmup()
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    executor.shutdown()
+    registry.close()
+    cache.close()
+    embedding_store.close()
+
+def _memory() -> Dict[str, Optional[int]]:
+    """Resident memory of the API process, and of the model: its growth while loading, or its worker processes."""
+    model = registry.model
+    if isinstance(model, WorkerPoolBackend):
+        workers = [worker["rss_bytes"] for worker in model.get_stats()["workers"]]
+        model_bytes = sum(workers) if workers and None not in workers else None
+    else:
+        model_bytes = registry.memory_bytes
+    return {"process_rss_bytes": memory_rss(), "model_bytes": model_bytes}
 
 @router.get("/status")
 async def ai_status():
     """Check the status of the AI model."""
+    status = registry.get_status()
     return {
         "initialized": ai_model.initialized,
         "model_loaded": ai_model.model is not None,
         "error": ai_model.error,
+        "state": status["state"],
+        "load_seconds": status["load_seconds"],
+        "source": status["source"],
+        "offline": status["offline"],
+        "backend": status["backend"],
+        "backend_model": status["backend_model"],
+        "model_version": status["model_version"],
+        "shapes": registry.model.shape_stats() if registry.model is not None else None,
+        "memory": _memory(),
+        "requests": metrics.get_stats(),
+        "batching": batcher.get_stats(),
+        "executor": executor.get_stats(),
+        "workers": registry.model.get_stats() if isinstance(registry.model, WorkerPoolBackend) else None,
+        "cache": cache.get_stats(),
+        "embeddings": embedding_store.get_stats(),
         "config": {
             "model_url": ai_model.config.yamnet_model_url,
+            "model_dir": status["model_dir"],
             "cache_dir": ai_model.config.tf_hub_cache_dir
         }
     }
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def ai_metrics():
+    """Stage latency histograms, throughput and model counters in the Prometheus text format."""
+    memory = _memory()
+    shapes = registry.model.shape_stats() if registry.model is not None else {}
+    batching = batcher.get_stats()
+    text = prometheus_text(metrics, {
+        "model_ready": ("1 when the model is loaded", float(registry.ready)),
+        "model_memory_bytes": ("Resident memory taken by the model", memory["model_bytes"]),
+        "process_resident_memory_bytes": ("Resident memory of the API process", memory["process_rss_bytes"]),
+        "model_compilations": ("Input shapes the model was compiled for", shapes.get("compilations")),
+        "model_retraces": ("Model compilations since warmup", shapes.get("retraces")),
+        "batches": ("Model calls made by the batcher", batching["batches"]),
+        "batch_queue_length": ("Requests waiting for a batch", batching["queued"]),
+        "pending_requests": ("Admitted /predict requests in progress", executor.get_stats()["pending"])
+    })
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
 @router.get("/classes", response_model=SoundClassesResponse)
 async def list_sound_classes():
     """List all available sound classes that the model can recognize."""
-    if not ai_model.initialized or not ai_model.class_labels:
-        raise HTTPException(
-            status_code=503,
-            detail="AI model is not initialized or class labels are not loaded."
-        )
+    await _require_model()
     
     return {
         "count": len(ai_model.class_labels),
@@ -161,18 +334,23 @@ async def list_sound_classes():
     }
 
 @router.post("/predict", response_model=AudioPredictionResponse)
-async def predict_audio(file: UploadFile = File(...)):
+async def predict_audio(
+    file: UploadFile = File(...),
+    top_k: int = Query(0, ge=0, le=NUM_CLASSES, description="Return the best N classes over the whole clip"),
+    pooling: Literal["mean", "max"] = Query("mean", description="How top_k combines the scores of all patches"),
+    timeline: bool = Query(False, description="Add segments of consecutive patches with the same top class"),
+    min_confidence: float = Query(0.0, ge=0.0, le=1.0, description="Leave patches below this score out of the timeline"),
+    save_event: bool = Query(False, description="Record the clip as a sound event and keep its embedding for similarity search"),
+    session: Session = Depends(get_session)
+):
     """
     Process an audio file and return sound classification predictions.
     
-    Accepts WAV audio files (16kHz, mono, 16-bit PCM recommended).
+    Accepts WAV audio files (16kHz, mono, 16-bit PCM recommended). Without
+    ``top_k`` the single prediction is the best class of the first 0.96 s.
+    With ``save_event`` the clip is recorded as a sound event whose YAMNet
+    embedding goes to the embedding store.
     """
-    if not ai_model.initialized:
-        raise HTTPException(
-            status_code=503,
-            detail="AI model is not initialized. Please check the /ai/status endpoint."
-        )
-    
     # Check file type
     if not file.filename.lower().endswith(('.wav', '.wave')):
         raise HTTPException(
@@ -180,31 +358,84 @@ async def predict_audio(file: UploadFile = File(...)):
             detail="Only WAV audio files are supported"
         )
     
+    await _require_model()
+    admission = _admit()
+    
     try:
-        # Read the uploaded file
-        contents = await file.read()
-        
-        # Make prediction
-        result = ai_model.predict(contents)
+        with admission:
+            # Seconds per stage, recorded in the request metrics once the response is ready
+            started = time.perf_counter()
+            stages: Dict[str, float] = {}
+            audio_seconds = 0.0
+            
+            # Read the uploaded file
+            contents = await file.read()
+            stages["read"] = time.perf_counter() - started
+            
+            # Repeated uploads are answered from the cache; hashing runs off the event loop.
+            # Only scores are cached, so saving an event needs a model run for the embedding
+            key, scores, queue_wait, event_id, save_error = None, None, 0.0, None, None
+            if cache.enabled and not save_event:
+                lookup_started = time.perf_counter()
+                (key, scores), queue_wait = await executor.run_timed(ai_model.cached_scores, contents)
+                stages["cache"] = time.perf_counter() - lookup_started - queue_wait
+            cached = scores is not None
+            
+            if cached:
+                postprocess_started = time.perf_counter()
+                result = ai_model.summarize(scores, top_k, pooling, timeline, min_confidence)
+            else:
+                # Decode off the event loop, then classify together with concurrent requests
+                waveform, decode_wait = await executor.run_timed(ai_model.preprocess_audio, contents, stages)
+                queue_wait += decode_wait
+                postprocess_started = time.perf_counter()
+                if waveform is None:
+                    result = {"error": "Failed to preprocess audio data"}
+                else:
+                    try:
+                        audio_seconds = len(waveform) / SAMPLE_RATE
+                        batch_result = await batcher.submit(waveform)
+                        queue_wait += batch_result.queue_wait
+                        stages["inference"] = batch_result.inference
+                        postprocess_started = time.perf_counter()
+                        result = ai_model.summarize(batch_result.scores, top_k, pooling, timeline, min_confidence)
+                        if key is not None:
+                            await executor.run(ai_model.remember, key, batch_result.scores)
+                    except Exception as e:
+                        result = {"error": "Prediction failed", "details": str(e)}
+                    # The predictions stand even when they can't be saved
+                    if save_event and result.get("predictions"):
+                        try:
+                            event_id = await executor.run(_save_event, session, result["predictions"][0],
+                                                          batch_result.scores, batch_result.embeddings,
+                                                          len(waveform), file.filename)
+                        except Exception as e:
+                            logger.error(f"Error saving sound event: {e}", exc_info=True)
+                            save_error = str(e)
+        queue_wait_ms = round(queue_wait * 1000, 3)
         
         if "error" in result:
-            return AudioPredictionResponse(
+            response = AudioPredictionResponse(
                 success=False,
                 predictions=[],
-                error=result.get("details", "Prediction failed")
+                error=result.get("details", "Prediction failed"),
+                queue_wait_ms=queue_wait_ms
             )
-        
-        # Format the response
-        prediction_result = AudioPredictionResult(
-            class_name=result["class"],
-            confidence=result["confidence"],
-            class_id=result["class_id"]
-        )
-        
-        return AudioPredictionResponse(
-            success=True,
-            predictions=[prediction_result]
-        )
+        else:
+            # Format the response
+            response = AudioPredictionResponse(
+                success=True,
+                predictions=[AudioPredictionResult(**p) for p in result["predictions"]],
+                timeline=[TimelineSegment(**s) for s in result["timeline"]] if timeline else None,
+                queue_wait_ms=queue_wait_ms,
+                cached=cached,
+                event_id=event_id,
+                save_error=save_error
+            )
+        finished = time.perf_counter()
+        stages.update(queue_wait=queue_wait, postprocess=finished - postprocess_started, total=finished - started)
+        metrics.record(stages, audio_seconds if "error" not in result else 0.0)
+        return response
         
     except Exception as e:
         logger.error(f"Error processing audio file: {e}", exc_info=True)
@@ -213,11 +444,195 @@ async def predict_audio(file: UploadFile = File(...)):
             detail=f"Error processing audio file: {str(e)}"
         )
 
+def _save_event(session: Session, prediction: Dict[str, Any], scores: np.ndarray,
+                embeddings: Optional[np.ndarray], samples: int, filename: str) -> int:
+    """Record a classified upload as a sound event and store its embedding; returns the event id."""
+    sound_type, confidence = ai_model.sound_types.classify(scores)
+    event = SoundEvent(
+        sound_type=sound_type,
+        confidence=min(max(confidence, 0.0), 1.0),
+        duration_seconds=samples / SAMPLE_RATE,
+        sample_rate=SAMPLE_RATE,
+        channels=1,
+        event_metadata={
+            "source": "ai/predict",
+            "filename": filename,
+            "class_name": prediction["class_name"],
+            "class_id": prediction["class_id"],
+            "class_confidence": prediction["confidence"]
+        }
+    )
+    # The event is only committed once its embedding is stored, so a failed
+    # save leaves neither behind
+    session.add(event)
+    stored = False
+    try:
+        session.flush()
+        embedding = clip_embedding(embeddings)
+        if embedding is None:
+            logger.warning(f"The {registry.backend} model returned no embeddings; sound event {event.id} can't be searched")
+        elif embedding_store.enabled:
+            embedding_store.add(event.id, embedding)
+            stored = True
+        session.commit()
+    except Exception:
+        session.rollback()
+        if stored:
+            embedding_store.remove(event.id)
+        raise
+    return event.id
+
+def _spool(file: UploadFile) -> str:
+    """Copy an upload to a temporary file on disk and return its path."""
+    suffix = os.path.splitext(file.filename)[1].lower()
+    file.file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="soundtracker-", suffix=suffix, delete=False) as spooled:
+        shutil.copyfileobj(file.file, spooled, 1 << 20)
+    return spooled.name
+
+def _ndjson(line: Dict[str, Any]) -> bytes:
+    return (json.dumps(line) + "\n").encode()
+
+class _SpooledStream:
+    """
+    Windows of a spooled upload, decoded on the inference pool.
+
+    Closing it closes the decoder and deletes the file. A decode still running
+    on the pool (the client went away while it read the file) is left to
+    finish first and closes the stream itself; a stream nobody iterated is
+    closed when it is garbage collected.
+    """
+
+    def __init__(self, path: str, blocks: Iterator[np.ndarray], admission: Admission, window: int, step: int):
+        self.path = path
+        self.blocks = blocks
+        self.admission = admission
+        self.windows = overlapping_windows(blocks, window, step)
+        self.closed = False
+        self._closing = False
+        self._lock = threading.Lock()
+
+    def next(self) -> Optional[Tuple[int, np.ndarray]]:
+        """Decode the next window, or None at the end of the recording."""
+        with self._lock:
+            item = None if self._closing else next(self.windows, None)
+        if self._closing:
+            self.close()
+        return item
+
+    def close(self) -> None:
+        self._closing = True
+        self.admission.release()
+        if not self._lock.acquire(blocking=False):
+            # next() closes the stream once its decode is done
+            return
+        try:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self.windows.close()
+            finally:
+                try:
+                    self.blocks.close()
+                finally:
+                    os.unlink(self.path)
+        finally:
+            self._lock.release()
+
+    async def aclose(self) -> None:
+        """Close on the event loop, where the admission is released, not on a worker thread."""
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+async def _classify_stream(stream: _SpooledStream, top_k: int, pooling: str,
+                           min_confidence: float) -> AsyncIterator[bytes]:
+    """Classify a spooled recording window by window, yielding NDJSON lines as results come in."""
+    summary = StreamSummary(ai_model.class_labels, min_confidence)
+    count, duration = 0, 0.0
+    try:
+        while True:
+            # Decoding reads the file, so it runs on the inference pool too
+            item = await executor.run(stream.next)
+            if item is None:
+                break
+            start, samples = item
+            batch_result = await batcher.submit(samples)
+            duration = (start + len(samples)) / SAMPLE_RATE
+            line = {"type": "window", "index": count, "start": round(start / SAMPLE_RATE, 3), "end": round(duration, 3)}
+            if top_k:
+                line["predictions"] = describe_top_k(batch_result.scores, ai_model.class_labels, top_k, pooling)
+            count += 1
+            yield _ndjson(line)
+            for segment in summary.add(batch_result.scores):
+                yield _ndjson({"type": "segment", **segment})
+        for segment in summary.finish():
+            yield _ndjson({"type": "segment", **segment})
+        yield _ndjson({
+            "type": "summary",
+            "duration": round(duration, 3),
+            "windows": count,
+            "patches": summary.patches,
+            "predictions": summary.top_k(top_k, pooling)
+        })
+    except Exception as e:
+        logger.error(f"Error streaming classification: {e}", exc_info=True)
+        yield _ndjson({"type": "error", "error": str(e)})
+    finally:
+        stream.close()
+
+@router.post("/predict/stream")
+async def predict_audio_stream(
+    file: UploadFile = File(...),
+    top_k: int = Query(3, ge=0, le=NUM_CLASSES, description="Best classes per window and over the whole recording"),
+    pooling: Literal["mean", "max"] = Query("mean", description="How top_k combines the scores of all patches"),
+    min_confidence: float = Query(0.0, ge=0.0, le=1.0, description="Leave patches below this score out of the segments")
+):
+    """
+    Classify a long recording in fixed-size windows, streaming NDJSON results.
+    
+    The upload is spooled to disk and decoded one window at a time, so memory
+    use does not depend on the length of the recording.
+    """
+    if not file.filename.lower().endswith(STREAM_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only {', '.join(STREAM_EXTENSIONS)} audio files are supported"
+        )
+    
+    await _require_model()
+    admission = _admit()
+    
+    try:
+        path = await asyncio.to_thread(_spool, file)
+    except Exception:
+        admission.release()
+        raise
+    try:
+        blocks = await asyncio.to_thread(stream_audio, path, SAMPLE_RATE)
+    except Exception as e:
+        admission.release()
+        os.unlink(path)
+        if isinstance(e, UnsupportedAudioError):
+            raise HTTPException(status_code=400, detail=f"Cannot decode audio file: {e}")
+        raise
+    
+    stream = _SpooledStream(path, blocks, admission, *stream_window(settings.AI_STREAM_WINDOW_SECONDS))
+    return StreamingResponse(
+        _classify_stream(stream, top_k, pooling, min_confidence),
+        media_type="application/x-ndjson",
+        # Also when the client went away before the body was sent
+        background=BackgroundTask(stream.aclose)
+    )
+
 # For backward compatibility
 @router.post("/identify")
 async def identify_endpoint(file: UploadFile = File(...)):
     """Legacy endpoint for backward compatibility."""
-    response = await predict_audio(file)
+    response = await predict_audio(file, top_k=0, pooling="mean", timeline=False, min_confidence=0.0,
+                                   save_event=False, session=None)
     if response.success and response.predictions:
         return {"label": response.predictions[0].class_name}
     return {"error": response.error or "Failed to identify sound"}
@@ -12,11 +12,22 @@ import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Callable
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+import numpy as np
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import HTMLResponse
 
-from ..audio_capture import AudioCapture, AudioSample, list_audio_devices
-from ..config import settings
+from audio_buffer import downsample_levels, rms_to_db
+from audio_capture import AudioCapture, AudioDeviceError, list_audio_devices
+from broadcast import BroadcastHub
+from capture_sources import source_from_spec
+from level_stream import BINARY_SUBPROTOCOL, LevelStream
+from spectrogram import SPECTROGRAM_CHANNEL, SpectrogramStream
+from realtime_classifier import CLASSIFICATION_CHANNEL, RealtimeClassifier
+from score_summary import PATCH_HOP_SECONDS, PATCH_SECONDS
+from database import SessionLocal
+from routers.ai import ai_model, batcher, executor
+from config import settings
 
 # Create a router for audio capture endpoints
 router = APIRouter(prefix="/audio", tags=["audio"])
@@ -30,38 +41,97 @@ logger = logging.getLogger(__name__)
 # Global audio capture instance
 audio_capture: Optional[AudioCapture] = None
 
-# WebSocket connections
-active_connections: List[WebSocket] = []
+# Pending delayed stop after the last WebSocket client left
+_idle_stop_task: Optional[asyncio.Task] = None
+
+# WebSocket clients
+hub = BroadcastHub(max_queue=settings.WEBSOCKET_QUEUE_SIZE)
 
-# Audio processing callback
-def audio_callback(sample: AudioSample):
-    """Process audio samples and broadcast to WebSocket clients."""
+def _stream_info() -> Dict[str, Any]:
+    """Fields added to every level frame."""
     if not audio_capture:
-        return
-        
-    # Prepare data to send
-    data = {
-        "type": "audio_level",
-        "timestamp": sample.timestamp.isoformat(),
-        "rms": sample.rms,
-        "db": sample.db,
-        "sample_rate": sample.sample_rate,
+        return {}
+    return {
+        "sample_rate": audio_capture.sample_rate,
         "channels": audio_capture.channels
     }
-    
-    # Broadcast to all connected WebSocket clients
-    disconnected = []
-    for connection in active_connections:
-        try:
-            asyncio.create_task(connection.send_json(data))
-        except Exception as e:
-            logger.warning(f"Error sending to WebSocket, will disconnect: {e}")
-            disconnected.append(connection)
-    
-    # Clean up disconnected clients
-    for connection in disconnected:
-        if connection in active_connections:
-            active_connections.remove(connection)
+
+# Level frames are aggregated once per rate tier and shared by its subscribers
+level_stream = LevelStream(
+    hub,
+    lambda: audio_capture.history if audio_capture else None,
+    rates=[float(r) for r in settings.WEBSOCKET_RATES.split(",") if r.strip()],
+    extra=_stream_info
+)
+DEFAULT_RATE = 1.0 / settings.WEBSOCKET_UPDATE_INTERVAL
+
+# Log-mel frames computed once from the capture for all spectrogram viewers
+spectrogram_stream = SpectrogramStream(
+    hub,
+    lambda: audio_capture,
+    n_fft=settings.SPECTROGRAM_N_FFT,
+    hop_length=settings.SPECTROGRAM_HOP_LENGTH,
+    n_mels=settings.SPECTROGRAM_N_MELS
+)
+
+# Live YAMNet labels, classified through the same batcher as /ai/predict uploads
+realtime_classifier = RealtimeClassifier(
+    hub,
+    lambda: audio_capture,
+    batcher,
+    ai_model,
+    executor,
+    interval=settings.AI_REALTIME_INTERVAL,
+    min_confidence=settings.AI_REALTIME_MIN_CONFIDENCE,
+    silence_floor=settings.AI_REALTIME_SILENCE_FLOOR,
+    session_factory=SessionLocal if settings.AI_REALTIME_SAVE_EVENTS else None
+)
+
+# Serializes starting and stopping the spectrogram stream between clients
+_spectrogram_lock = asyncio.Lock()
+
+def _capturing() -> bool:
+    return audio_capture is not None and audio_capture.is_running()
+
+async def _sync_spectrogram_stream() -> None:
+    """
+    Run the spectrogram stream while the capture runs and a client watches it.
+
+    Just stopping the stream, which joins its thread, runs off the event loop.
+    """
+    async with _spectrogram_lock:
+        # Decided under the lock, after any stop another client was waiting for
+        if _capturing() and hub.channel_size(SPECTROGRAM_CHANNEL):
+            spectrogram_stream.start()
+        else:
+            await asyncio.to_thread(spectrogram_stream.stop)
+
+async def _sync_realtime_classifier() -> None:
+    """Run live classification while the capture runs, with AI_REALTIME or for subscribed clients."""
+    if _capturing() and (settings.AI_REALTIME or hub.channel_size(CLASSIFICATION_CHANNEL)):
+        realtime_classifier.start()
+    else:
+        await realtime_classifier.stop()
+
+async def _set_spectrogram_subscription(subscriber, enabled: bool) -> None:
+    """
+    Add or remove a client from the spectrogram channel, running the stream only while needed.
+
+    The hub is only safe to change on the event loop.
+    """
+    if enabled:
+        hub.subscribe(subscriber, SPECTROGRAM_CHANNEL)
+    else:
+        hub.unsubscribe(subscriber, SPECTROGRAM_CHANNEL)
+    await _sync_spectrogram_stream()
+
+async def _set_classification_subscription(subscriber, enabled: bool) -> None:
+    """Add or remove a client from the classification channel; without AI_REALTIME the classifier runs only while needed."""
+    if enabled:
+        hub.subscribe(subscriber, CLASSIFICATION_CHANNEL)
+    else:
+        hub.unsubscribe(subscriber, CLASSIFICATION_CHANNEL)
+    await _sync_realtime_classifier()
 
 async def start_audio_capture() -> bool:
     """Initialize and start the audio capture system."""
@@ -76,17 +146,29 @@ async def start_audio_capture() -> bool:
         if audio_capture:
             await stop_audio_capture()
         
-        # Create new audio capture instance
+        # Create new audio capture instance, continuing the level sequence
+        # numbers of the previous one so reconnecting clients can resume
         audio_capture = AudioCapture(
             sample_rate=settings.AUDIO_SAMPLE_RATE,
             channels=settings.AUDIO_CHANNELS,
             block_size=settings.AUDIO_BLOCK_SIZE,
-            device=settings.AUDIO_DEVICE
+            device=settings.AUDIO_DEVICE,
+            history_seconds=settings.AUDIO_HISTORY_SECONDS,
+            worker_thread=True,
+            history_start=audio_capture.history.count if audio_capture else 0,
+            source=source_from_spec(
+                settings.AUDIO_SOURCE,
+                speed=settings.AUDIO_SOURCE_SPEED,
+                loop=settings.AUDIO_SOURCE_LOOP
+            )
         )
         
-        # Start capture with callback
-        audio_capture.start(callback=audio_callback)
-        logger.info(f"Audio capture started on device {settings.AUDIO_DEVICE}")
+        # Levels are read from the capture's history by the rate tiers
+        audio_capture.start()
+        # Resume what a previous stop paused for clients still subscribed
+        await _sync_spectrogram_stream()
+        await _sync_realtime_classifier()
+        logger.info(f"Audio capture started (source: {settings.AUDIO_SOURCE}, device: {settings.AUDIO_DEVICE})")
         return True
         
     except AudioDeviceError as e:
@@ -105,108 +187,111 @@ async def stop_audio_capture() -> bool:
     
     try:
         audio_capture.stop()
+        # Nothing left to analyse; the classifier saves the segment still open
+        await _sync_spectrogram_stream()
+        await _sync_realtime_classifier()
         logger.info("Audio capture stopped")
         return True
     except Exception as e:
         logger.error(f"Error stopping audio capture: {e}", exc_info=True)
         return False
 
+def _cancel_idle_stop() -> None:
+    """Cancel a pending delayed stop, e.g. because a client reconnected."""
+    global _idle_stop_task
+    if _idle_stop_task is not None:
+        _idle_stop_task.cancel()
+        _idle_stop_task = None
+
+async def _stop_when_idle(delay: float) -> None:
+    """Stop audio capture after ``delay`` seconds unless a client connects meanwhile."""
+    await asyncio.sleep(delay)
+    if not len(hub) and audio_capture and audio_capture.is_running():
+        logger.info(f"No WebSocket clients for {delay:g}s, stopping audio capture")
+        await stop_audio_capture()
+
+def _schedule_idle_stop() -> None:
+    """Stop audio capture once the idle grace period has passed."""
+    global _idle_stop_task
+    _cancel_idle_stop()
+    delay = settings.AUDIO_IDLE_STOP_SECONDS
+    if delay >= 0:
+        _idle_stop_task = asyncio.get_running_loop().create_task(_stop_when_idle(delay))
+
+def _send_backfill(subscriber, tier, resume_from: Any, binary: bool) -> None:
+    """Queue the blocks a client missed after ``resume_from``, or an error if it is invalid."""
+    try:
+        seq = int(resume_from)
+    except (TypeError, ValueError):
+        seq = None
+    if seq is None or seq < -1:
+        subscriber.send({
+            "type": "error",
+            "message": f"Invalid resume_from: {resume_from}",
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        return
+    subscriber.send(level_stream.backfill(tier, seq, binary=binary))
+
 @ws_router.websocket("/ws/audio")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time audio level streaming.
     
     Clients will receive JSON messages with the following format:
     {
-        "type": "status" | "audio_level" | "error",
+        "type": "status" | "audio_level" | "subscribed" | "error",
         "message": string,  # Optional status/error message
         "timestamp": "ISO-8601 timestamp",
-        "rms": float,  # RMS value (0.0 to 1.0)
-        "db": float,   # dBFS value (-inf to 0)
+        "rms": float,  # RMS over the frame (0.0 to 1.0)
+        "db": float,   # dBFS value (-100 to 0)
         "sample_rate": int,
         "channels": int,
         "device": string  # Device name/ID
     }
+    
+    Level frames aggregate all blocks captured since the previous frame and
+    also carry "rms_min", "rms_max", "db_min", "db_max", "peak", "blocks",
+    "start"/"t" (UNIX seconds) and "rate". Frames are sent at
+    1 / WEBSOCKET_UPDATE_INTERVAL per second by default; send
+    {"type": "subscribe", "rate": 30} to switch to the closest allowed rate.
+    
+    Adding "format": "binary" to the subscribe message, or opening the socket
+    with the "soundtracker.levels.v1" subprotocol, switches level frames to
+    binary messages carrying every block reading of the tick (layout in
+    level_stream.py). Control messages stay JSON text.
+    
+    {"type": "subscribe", "stream": "spectrogram"} additionally streams
+    binary log-mel frames quantized to uint8 (layout in spectrogram.py);
+    {"type": "unsubscribe", "stream": "spectrogram"} stops them.
+    
+    {"type": "subscribe", "stream": "classification"} streams live YAMNet
+    results: a "classification" message per 0.975 s window every 0.48 s and
+    a "sound_event" message whenever a segment of windows with the same top
+    class ends (layout in realtime_classifier.py).
+    
+    Level frames carry "seq", the level history index of their last block
+    (binary frames carry the index of their first block and the block count).
+    A reconnecting client passes the last seq it received as a
+    "resume_from" query parameter, or sends {"type": "resume",
+    "resume_from": seq}, and gets the missed blocks still in memory in a
+    single "backfill" message before live frames continue.
+    
+    Capture keeps running for AUDIO_IDLE_STOP_SECONDS after the last client
+    disconnects so brief reconnects don't lose data.
+    
+    Each client has a small bounded queue; if it can't keep up, its oldest
+    pending level updates are dropped.
     """
-    logger.info("WebSocket connection attempt")
+    client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown client"
+    logger.info(f"New WebSocket connection from {client}")
     
-    try:
-        # Log client information
-        client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown client"
-        logger.info(f"New WebSocket connection from {client}")
-        
-        # Log headers for debugging
-        headers = dict(websocket.headers)
-        logger.info(f"WebSocket headers: {headers}")
-        
-        # Accept the WebSocket connection
-        logger.info("Accepting WebSocket connection...")
-        await websocket.accept()
-        logger.info("WebSocket connection accepted")
-        
-        # Add to active connections
-        active_connections.append(websocket)
-        logger.info(f"New WebSocket connection. Active connections: {len(active_connections)}")
-        
-        # Send initial status
-        status_msg = {
-            "type": "status",
-            "message": "Connected to audio stream",
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        await websocket.send_json(status_msg)
-        logger.info(f"Sent initial status: {status_msg}")
-        
-        # Handle incoming messages
-        while True:
-            try:
-                # Wait for a message from the client
-                data = await websocket.receive_text()
-                logger.info(f"Received message: {data}")
-                
-                try:
-                    message = json.loads(data)
-                    message_type = message.get("type")
-                    
-                    if message_type == "get_devices":
-                        # List available audio devices
-                        devices = list_audio_devices()
-                        response = {
-                            "type": "devices",
-                            "devices": devices,
-                            "timestamp": datetime.utcnow().isoformat()
-                        }
-                        await websocket.send_json(response)
-                        logger.info(f"Sent devices list: {devices}")
-                        
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error parsing message: {e}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Invalid JSON: {e}",
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                    
-            except WebSocketDisconnect as e:
-                logger.info(f"WebSocket disconnected: {e}")
-                break
-                
-            except Exception as e:
-                logger.error(f"WebSocket error: {e}", exc_info=True)
-                await websocket.send_json({
-                    "type": "error",
-                    "message": f"Internal server error: {str(e)}",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                break
-                
-    except Exception as e:
-        logger.error(f"WebSocket connection error: {e}", exc_info=True)
-        
-    finally:
-        # Remove from active connections
-        if websocket in active_connections:
-            active_connections.remove(websocket)
-            logger.info(f"WebSocket connection closed. Active connections: {len(active_connections)}")
+    binary = BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
+    hub.attach(asyncio.get_running_loop())
+    _cancel_idle_stop()
+    subscriber = hub.add(websocket)
+    tier = level_stream.subscribe(subscriber, DEFAULT_RATE, binary=binary)
+    logger.info(f"WebSocket connection accepted. Active connections: {len(hub)}")
     
     try:
         # Start audio capture if not already running
@@ -219,73 +304,112 @@ async def websocket_endpoint(websocket: WebSocket):
                 return
         
         # Send initial status with audio capture details
-        if audio_capture:
-            device_info = audio_capture.get_device_info() or {}
-            status_msg = {
-                "type": "status",
-                "message": "Connected to audio stream",
-                "sample_rate": audio_capture.sample_rate,
-                "channels": audio_capture.channels,
-                "device": device_info.get('name', str(audio_capture.device)),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            await websocket.send_json(status_msg)
-            logger.info(f"Sent initial status: {status_msg}")
+        device_info = audio_capture.get_device_info() or {}
+        subscriber.send({
+            "type": "status",
+            "message": "Connected to audio stream",
+            "sample_rate": audio_capture.sample_rate,
+            "channels": audio_capture.channels,
+            "device": device_info.get('name', str(audio_capture.device)),
+            "rate": tier.rate,
+            "format": "binary" if binary else "json",
+            "seq": tier.position() - 1,
+            "timestamp": datetime.utcnow().isoformat()
+        })
         
-        # Keep connection alive and handle incoming messages
+        # Replay what the client missed while it was disconnected
+        if "resume_from" in websocket.query_params:
+            _send_backfill(subscriber, tier, websocket.query_params["resume_from"], binary)
+        
+        # Handle incoming messages (e.g., control commands)
         while True:
+            data = await websocket.receive_text()
             try:
-                # Handle any incoming messages (e.g., control commands)
-                data = await asyncio.wait_for(
-                    websocket.receive_text(),
-                    timeout=1.0
-                )
+                message = json.loads(data)
+            except json.JSONDecodeError:
+                logger.warning(f"Received invalid JSON: {data}")
+                subscriber.send({
+                    "type": "error",
+                    "message": "Invalid JSON received",
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                continue
+            
+            message_type = message.get("type")
+            if message_type == "ping":
+                subscriber.send({"type": "pong"})
+            elif message_type == "resume":
+                _send_backfill(subscriber, tier, message.get("resume_from"), binary)
+            elif message_type in ("subscribe", "unsubscribe") and message.get("stream") == "spectrogram":
+                await _set_spectrogram_subscription(subscriber, message_type == "subscribe")
+                subscriber.send({
+                    "type": f"{message_type}d",
+                    "stream": "spectrogram",
+                    "n_mels": spectrogram_stream.n_mels,
+                    "hop_seconds": spectrogram_stream.hop_length / audio_capture.sample_rate
+                })
+            elif message_type in ("subscribe", "unsubscribe") and message.get("stream") == "classification":
+                await _set_classification_subscription(subscriber, message_type == "subscribe")
+                subscriber.send({
+                    "type": f"{message_type}d",
+                    "stream": "classification",
+                    "window_seconds": PATCH_SECONDS,
+                    "hop_seconds": PATCH_HOP_SECONDS
+                })
+            elif message_type == "subscribe":
                 try:
-                    message = json.loads(data)
-                    if message.get("type") == "ping":
-                        await websocket.send_json({"type": "pong"})
-                    elif message.get("type") == "get_devices":
-                        # Get list of available audio devices
-                        try:
-                            devices = list_audio_devices()
-                            await websocket.send_json({
-                                "type": "devices",
-                                "devices": devices,
-                                "default_device": settings.AUDIO_DEVICE,
-                                "timestamp": datetime.utcnow().isoformat()
-                            })
-                            logger.info(f"Sent {len(devices)} audio devices to client")
-                        except Exception as e:
-                            logger.error(f"Error getting audio devices: {e}", exc_info=True)
-                            await websocket.send_json({
-                                "type": "error",
-                                "message": f"Failed to get audio devices: {str(e)}",
-                                "timestamp": datetime.utcnow().isoformat()
-                            })
-                except json.JSONDecodeError:
-                    logger.warning(f"Received invalid JSON: {data}")
-                    await websocket.send_json({
+                    binary = message.get("format", "binary" if binary else "json") == "binary"
+                    tier = level_stream.subscribe(
+                        subscriber,
+                        float(message.get("rate", tier.rate)),
+                        binary=binary
+                    )
+                    subscriber.send({
+                        "type": "subscribed",
+                        "rate": tier.rate,
+                        "format": "binary" if binary else "json"
+                    })
+                except (TypeError, ValueError):
+                    subscriber.send({
                         "type": "error",
-                        "message": "Invalid JSON received",
+                        "message": f"Invalid rate: {message.get('rate')}",
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+            elif message_type == "get_devices":
+                # Get list of available audio devices
+                try:
+                    devices = list_audio_devices()
+                    subscriber.send({
+                        "type": "devices",
+                        "devices": devices,
+                        "default_device": settings.AUDIO_DEVICE,
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+                    logger.info(f"Sent {len(devices)} audio devices to client")
+                except Exception as e:
+                    logger.error(f"Error getting audio devices: {e}", exc_info=True)
+                    subscriber.send({
+                        "type": "error",
+                        "message": f"Failed to get audio devices: {str(e)}",
                         "timestamp": datetime.utcnow().isoformat()
                     })
-                
-            except asyncio.TimeoutError:
-                # Send periodic pings to keep the connection alive
-                await websocket.send_json({"type": "ping"})
             
     except WebSocketDisconnect:
         logger.info("WebSocket client disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
     finally:
-        if websocket in active_connections:
-            active_connections.remove(websocket)
-            logger.info(f"WebSocket disconnected. Active connections: {len(active_connections)}")
+        level_stream.unsubscribe(subscriber)
+        if SPECTROGRAM_CHANNEL in subscriber.channels:
+            await _set_spectrogram_subscription(subscriber, False)
+        if CLASSIFICATION_CHANNEL in subscriber.channels:
+            await _set_classification_subscription(subscriber, False)
+        hub.remove(subscriber)
+        logger.info(f"WebSocket disconnected. Active connections: {len(hub)}")
         
-        # Stop audio capture if no more clients
-        if not active_connections and audio_capture and audio_capture.is_running():
-            await stop_audio_capture()
+        # Stop audio capture once no client has come back for a while
+        if not len(hub) and audio_capture and audio_capture.is_running():
+            _schedule_idle_stop()
 
 @router.get("/devices", response_model=Dict[str, Any])
 async def list_audio_devices_route():
@@ -330,10 +454,22 @@ async def get_audio_status():
         "is_running": bool(audio_capture and audio_capture.is_running()),
         "sample_rate": audio_capture.sample_rate if audio_capture else settings.AUDIO_SAMPLE_RATE,
         "channels": audio_capture.channels if audio_capture else settings.AUDIO_CHANNELS,
-        "active_connections": len(active_connections),
+        "active_connections": len(hub),
         "device": audio_capture.device if audio_capture else settings.AUDIO_DEVICE,
         "device_name": device_info.get('name', 'Not available'),
-        "block_size": settings.AUDIO_BLOCK_SIZE
+        "block_size": settings.AUDIO_BLOCK_SIZE,
+        "stats": audio_capture.get_stats() if audio_capture else None,
+        "websocket": hub.get_stats(),
+        "level_tiers": level_stream.get_stats(),
+        "spectrogram": {
+            "running": spectrogram_stream.is_running(),
+            "subscribers": hub.channel_size(SPECTROGRAM_CHANNEL),
+            "frames_sent": spectrogram_stream.frames_sent
+        },
+        "classification": {
+            **realtime_classifier.get_stats(),
+            "subscribers": hub.channel_size(CLASSIFICATION_CHANNEL)
+        }
     }
 
 @router.get("/level", response_model=Dict[str, Any])
@@ -371,6 +507,47 @@ async def get_audio_level():
         "sample_rate": level.sample_rate
     }
 
+@router.get("/history", response_model=Dict[str, Any])
+async def get_audio_history(
+    seconds: float = Query(600.0, gt=0, description="Length of the window in seconds"),
+    points: int = Query(500, ge=2, le=10000, description="Maximum number of points to return")
+):
+    """
+    Get the audio level history for the last ``seconds`` seconds.
+    
+    The in-memory per-block history is reduced to at most ``points`` min/max
+    buckets so charts can render it directly.
+    
+    Returns:
+        Dictionary with columnar level data (timestamps are UNIX seconds)
+    """
+    if not audio_capture:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "status": "error",
+                "message": "Audio capture is not running"
+            }
+        )
+    
+    timestamps, rms, peak = audio_capture.history.window(seconds)
+    buckets = downsample_levels(timestamps, rms, peak, points)
+    rms_min = buckets["rms_min"].astype(np.float64)
+    rms_max = buckets["rms_max"].astype(np.float64)
+    
+    return {
+        "status": "success",
+        "seconds": seconds,
+        "samples": int(len(timestamps)),
+        "points": int(len(buckets["timestamps"])),
+        "timestamps": buckets["timestamps"].tolist(),
+        "rms_min": rms_min.tolist(),
+        "rms_max": rms_max.tolist(),
+        "db_min": rms_to_db(rms_min).tolist(),
+        "db_max": rms_to_db(rms_max).tolist(),
+        "peak": buckets["peak"].astype(np.float64).tolist()
+    }
+
 @router.post("/start", response_model=Dict[str, Any])
 async def start_capture():
     """
@@ -421,10 +598,17 @@ async def stop_capture():
             }
         )
 
+@router.on_event("shutdown")
+async def stop_realtime_classifier():
+    """Stop live classification and save the segment that was still open."""
+    await realtime_classifier.stop()
+
 # Cleanup on application shutdown
 @ws_router.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on application shutdown."""
+    _cancel_idle_stop()
+    spectrogram_stream.stop()
     if audio_capture and audio_capture.is_running():
         audio_capture.stop()
         logger.info("Audio capture stopped on application shutdown")
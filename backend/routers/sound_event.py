@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 
@@ -5,8 +6,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select, or_
 
 from database import get_session
+from embedding_store import store as embedding_store
 from models import SoundEvent, SoundType
-from schemas import SoundEventCreate, SoundEventRead
+from schemas import SimilarSoundEvent, SoundEventCreate, SoundEventRead
 
 router = APIRouter(prefix="/sounds", tags=["Sound Events"])
 
@@ -112,6 +114,49 @@ async def get_sound_event(
     """
     return get_sound_event_or_404(event_id, session)
 
+@router.get(
+    "/{event_id}/similar",
+    response_model=List[SimilarSoundEvent],
+    summary="Find sound events that sound alike",
+    responses={
+        404: {"description": "Sound event not found or without a stored embedding"}
+    }
+)
+async def similar_sound_events(
+    event_id: int,
+    k: int = Query(10, ge=1, le=1000, description="Maximum number of similar events to return"),
+    session: Session = Depends(get_session)
+) -> List[Dict[str, Any]]:
+    """
+    Find the sound events whose YAMNet embeddings are closest to this event's.
+    
+    - **event_id**: The ID of the sound event to compare against
+    - **k**: Maximum number of similar events to return (max 1000)
+    
+    Events are ranked by cosine similarity of their stored embeddings; the
+    model is not run again.
+    """
+    get_sound_event_or_404(event_id, session)
+    matches = None
+    if embedding_store.enabled:
+        # The search scans memory-mapped vectors, so it runs off the event loop
+        matches = await asyncio.to_thread(embedding_store.similar, event_id, k)
+    if matches is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No embedding stored for sound event {event_id}"
+        )
+    if not matches:
+        return []
+    
+    # get_session hands out a plain SQLAlchemy session, which has execute() but not exec()
+    events = session.execute(select(SoundEvent).where(SoundEvent.id.in_([i for i, _ in matches]))).scalars().all()
+    by_id = {event.id: event for event in events}
+    return [
+        {"event": by_id[i], "similarity": similarity}
+        for i, similarity in matches if i in by_id
+    ]
+
 @router.delete(
     "/{event_id}",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -133,4 +178,5 @@ async def delete_sound_event(
     event = get_sound_event_or_404(event_id, session)
     session.delete(event)
     session.commit()
+    embedding_store.remove(event_id)
     return None
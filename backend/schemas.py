@@ -64,6 +64,14 @@ class SoundEventRead(SoundEventBase):
     class Config:
         orm_mode = True
 
+class SimilarSoundEvent(BaseModel):
+    """A sound event found by embedding similarity search."""
+    event: SoundEventRead
+    similarity: float = Field(
+        ...,
+        description="Cosine similarity of the YAMNet embeddings, 1 for identical sounds"
+    )
+
 class AISoundIdentifyResponse(BaseModel):
     """Response schema for AI sound identification."""
     label: str
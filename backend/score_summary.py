@@ -0,0 +1,191 @@
+"""
+Clip-level summaries of YAMNet's per-patch scores.
+
+YAMNet scores every 0.96 s patch of a clip (one row per ``PATCH_HOP``
+samples), so a (patches, classes) matrix holds far more than the top class of
+the first patch. ``top_k`` pools the matrix over the clip and picks the best
+classes with ``argpartition``; ``timeline`` turns the per-patch winners into
+segments of consecutive patches with the same label. Both work on the whole
+matrix at once, without a Python loop over patches.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from inference_backends import PATCH_HOP, PATCH_WINDOW, SAMPLE_RATE
+
+POOLING = ("mean", "max")
+
+# Seconds between patch starts and the length of one patch
+PATCH_HOP_SECONDS = PATCH_HOP / SAMPLE_RATE
+PATCH_SECONDS = PATCH_WINDOW / SAMPLE_RATE
+
+
+def pool_scores(scores: np.ndarray, pooling: str = "mean") -> np.ndarray:
+    """
+    Reduce (patches, classes) scores to one score per class.
+
+    Raises:
+        ValueError: For an unknown pooling mode
+    """
+    _check_pooling(pooling)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1, np.shape(scores)[-1])
+    return scores.max(axis=0) if pooling == "max" else scores.mean(axis=0)
+
+
+def _check_pooling(pooling: str) -> None:
+    if pooling not in POOLING:
+        raise ValueError(f"Unknown pooling '{pooling}', expected one of {', '.join(POOLING)}")
+
+
+def top_k(scores: np.ndarray, k: int, pooling: str = "mean") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best ``k`` classes over a whole clip.
+
+    Returns:
+        Tuple of (class ids, pooled scores), best first
+    """
+    pooled = pool_scores(scores, pooling)
+    k = max(0, min(k, len(pooled)))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    # argpartition finds the k best in linear time; only those k get sorted
+    best = np.argpartition(pooled, len(pooled) - k)[len(pooled) - k:]
+    best = best[np.argsort(pooled[best])[::-1]]
+    return best, pooled[best]
+
+
+def timeline(scores: np.ndarray, min_confidence: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge consecutive patches with the same top class into segments.
+
+    Patches whose top score is below ``min_confidence`` belong to no segment,
+    so they split segments and leave gaps in the timeline.
+
+    Returns:
+        Tuple of (class ids, start seconds, end seconds, mean top score) with
+        one entry per segment, in time order
+    """
+    labels, starts, ends, confidence_sums = _runs(scores, min_confidence)
+    keep = labels >= 0
+    starts, ends = starts[keep], ends[keep]
+    return (
+        labels[keep],
+        starts * PATCH_HOP_SECONDS,
+        (ends - 1) * PATCH_HOP_SECONDS + PATCH_SECONDS,
+        (confidence_sums[keep] / (ends - starts)).astype(np.float32)
+    )
+
+
+def _runs(scores: np.ndarray, min_confidence: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Runs of consecutive patches with the same top class.
+
+    Returns:
+        Tuple of (class ids with -1 for patches below ``min_confidence``,
+        first patch, end patch, sum of top scores) per run
+    """
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1, np.shape(scores)[-1])
+    if len(scores) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0, dtype=np.float32)
+
+    winners = scores.argmax(axis=1)
+    confidence = scores[np.arange(len(scores)), winners]
+    # -1 marks patches that don't reach the threshold
+    labels = np.where(confidence >= min_confidence, winners, -1)
+
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)]
+    return labels[starts], starts, ends, np.add.reduceat(confidence, starts)
+
+
+def describe_top_k(scores: np.ndarray, labels: List[str], k: int, pooling: str = "mean") -> List[dict]:
+    """``top_k`` as a list of {class_name, confidence, class_id}."""
+    ids, values = top_k(scores, k, pooling)
+    return [
+        {"class_name": labels[i], "confidence": float(v), "class_id": int(i)}
+        for i, v in zip(ids.tolist(), values.tolist())
+    ]
+
+
+def describe_timeline(scores: np.ndarray, labels: List[str], min_confidence: float = 0.0) -> List[dict]:
+    """``timeline`` as a list of {class_name, class_id, start, end, confidence}."""
+    ids, starts, ends, confidence = timeline(scores, min_confidence)
+    return [
+        _segment(labels, i, s, e, c)
+        for i, s, e, c in zip(ids.tolist(), starts.tolist(), ends.tolist(), confidence.tolist())
+    ]
+
+
+def _segment(labels: List[str], class_id: int, start: float, end: float, confidence: float) -> dict:
+    return {"class_name": labels[class_id], "class_id": class_id, "start": round(start, 3),
+            "end": round(end, 3), "confidence": confidence}
+
+
+class StreamSummary:
+    """
+    ``top_k`` and ``timeline`` for a clip whose scores arrive in pieces.
+
+    ``add`` takes the scores of the next patches in order. Only running class
+    sums and maxima and the still-open segment are kept, so memory does not
+    grow with the length of the clip.
+    """
+
+    def __init__(self, labels: List[str], min_confidence: float = 0.0):
+        self.labels = labels
+        self.min_confidence = min_confidence
+        self.patches = 0
+        self._sum = None
+        self._max = None
+        # Open segment: [class id, first patch, end patch, sum of top scores]
+        self._open = None
+
+    def add(self, scores: np.ndarray) -> List[dict]:
+        """
+        Add the scores of the next patches.
+
+        Returns:
+            Segments that ended within these patches, as in ``describe_timeline``
+        """
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1, np.shape(scores)[-1])
+        if len(scores) == 0:
+            return []
+        if self._sum is None:
+            self._sum = np.zeros(scores.shape[1], dtype=np.float64)
+            self._max = np.full(scores.shape[1], -np.inf, dtype=np.float32)
+        self._sum += scores.sum(axis=0)
+        np.maximum(self._max, scores.max(axis=0), out=self._max)
+
+        ids, starts, ends, sums = _runs(scores, self.min_confidence)
+        runs = [[i, s + self.patches, e + self.patches, c]
+                for i, s, e, c in zip(ids.tolist(), starts.tolist(), ends.tolist(), sums.tolist())]
+        self.patches += len(scores)
+        if self._open is not None and self._open[0] == runs[0][0]:
+            runs[0][1] = self._open[1]
+            runs[0][3] += self._open[3]
+        elif self._open is not None:
+            runs.insert(0, self._open)
+        self._open = runs.pop()
+        return self._describe(runs)
+
+    def finish(self) -> List[dict]:
+        """Close the open segment at the end of the clip."""
+        runs, self._open = ([self._open] if self._open else []), None
+        return self._describe(runs)
+
+    def top_k(self, k: int, pooling: str = "mean") -> List[dict]:
+        """Best classes over every patch added so far, as in ``describe_top_k``."""
+        if self._sum is None:
+            return []
+        _check_pooling(pooling)
+        pooled = self._max if pooling == "max" else (self._sum / self.patches).astype(np.float32)
+        # A single row of already pooled scores pools to itself
+        return describe_top_k(pooled[None, :], self.labels, k)
+
+    def _describe(self, runs: List[list]) -> List[dict]:
+        return [
+            _segment(self.labels, i, s * PATCH_HOP_SECONDS, (e - 1) * PATCH_HOP_SECONDS + PATCH_SECONDS, c / (e - s))
+            for i, s, e, c in runs if i >= 0
+        ]
@@ -0,0 +1,85 @@
+"""
+Roll YAMNet's 521 classes up into the coarse ``SoundType`` buckets.
+
+Every class of the class map belongs to exactly one bucket, so the mapping is
+an array of bucket indices built once per label list. A clip takes the bucket
+of its best class rather than of the bucket with the highest summed score:
+YAMNet scores every class with its own sigmoid, so each class carries a small
+background score, and the noise bucket (over 350 classes) would out-sum a
+clear speech clip (14 classes) on background alone.
+
+The buckets follow the AudioSet ontology that YAMNet's class map is ordered
+by: speech is the speech and raised-voice classes, music is the Music subtree
+plus singing, silence is "Silence", and every other class (animals, vehicles,
+tools, weather, the Noise subtree) counts as noise. ``UNKNOWN`` is left for
+events that were never classified.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from models import SoundType
+
+# Bucket order of the indices from class_buckets
+BUCKETS = (SoundType.SPEECH, SoundType.MUSIC, SoundType.NOISE, SoundType.SILENCE)
+
+SPEECH_CLASSES = frozenset({
+    "Speech", "Child speech, kid speaking", "Conversation", "Narration, monologue", "Babbling",
+    "Speech synthesizer", "Shout", "Bellow", "Whoop", "Yell", "Children shouting", "Screaming",
+    "Whispering", "Chatter"
+})
+# Singing sits under "Human voice" in the ontology, apart from the Music subtree
+SINGING_CLASSES = frozenset({
+    "Singing", "Choir", "Yodeling", "Chant", "Mantra", "Child singing", "Synthetic singing",
+    "Rapping", "Humming"
+})
+# First and last class of the contiguous Music subtree in the class map
+MUSIC_RANGE = ("Music", "Scary music")
+SILENCE_CLASSES = frozenset({"Silence"})
+
+
+def class_buckets(labels: Sequence[str]) -> np.ndarray:
+    """Index into ``BUCKETS`` of every class in ``labels``."""
+    buckets = np.full(len(labels), BUCKETS.index(SoundType.NOISE), dtype=np.int64)
+    positions: Dict[str, int] = {name: i for i, name in enumerate(labels)}
+    first, last = (positions.get(name) for name in MUSIC_RANGE)
+    if first is not None and last is not None:
+        buckets[first:last + 1] = BUCKETS.index(SoundType.MUSIC)
+    for names, sound_type in ((SINGING_CLASSES, SoundType.MUSIC), (SPEECH_CLASSES, SoundType.SPEECH),
+                              (SILENCE_CLASSES, SoundType.SILENCE)):
+        buckets[[positions[name] for name in names if name in positions]] = BUCKETS.index(sound_type)
+    return buckets
+
+
+class SoundTypeIndex:
+    """Bucket of every class of one label list, and classification of score matrices with it."""
+
+    def __init__(self, labels: List[str]):
+        self.labels = labels
+        self.buckets = class_buckets(labels)
+
+    def type_of(self, class_id: int) -> SoundType:
+        """Bucket of a single class."""
+        return BUCKETS[self.buckets[class_id]]
+
+    def classify(self, scores: np.ndarray) -> Tuple[SoundType, float]:
+        """
+        Sound type of a clip from its (patches, classes) scores.
+
+        The scores are averaged over patches and the clip gets the bucket of
+        the best class. The confidence is that class's mean score, which
+        lies in [0, 1] like every YAMNet score.
+
+        Returns:
+            Tuple of (sound type, confidence); ``UNKNOWN`` and 0 for a clip
+            without patches or without any score
+        """
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1, len(self.buckets))
+        if len(scores) == 0:
+            return SoundType.UNKNOWN, 0.0
+        mean = scores.mean(axis=0)
+        best = int(mean.argmax())
+        if mean[best] <= 0.0:
+            return SoundType.UNKNOWN, 0.0
+        return self.type_of(best), float(mean[best])
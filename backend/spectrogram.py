@@ -0,0 +1,339 @@
+"""
+Log-mel spectrogram computation and streaming for SoundTracker.
+
+``MelSpectrogram`` turns a stream of samples into log-mel frames with a
+vectorized STFT: frames are strided views over the input, the window, the
+magnitude and the mel projection write into buffers that are reused between
+calls, and the mel filterbank is a matrix built once. The filterbank follows
+the HTK mel scale used by ``tf.signal.linear_to_mel_weight_matrix``, so the
+same class can reproduce YAMNet's input features.
+
+``SpectrogramStream`` runs it on the live capture and broadcasts uint8
+quantized frames to WebSocket subscribers, computing each frame once for all
+viewers.
+"""
+
+import logging
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from broadcast import BroadcastHub
+
+logger = logging.getLogger(__name__)
+
+# Streaming defaults (at the 44.1 kHz capture rate: ~46 ms window, ~43 frames/s)
+DEFAULT_N_FFT = 2048
+DEFAULT_HOP_LENGTH = 1024
+DEFAULT_N_MELS = 64
+DEFAULT_LOG_OFFSET = 0.001
+
+# Quantization range in natural-log mel magnitude units
+DEFAULT_LOG_FLOOR = float(np.log(DEFAULT_LOG_OFFSET))
+DEFAULT_LOG_CEILING = 6.5
+
+SPECTROGRAM_CHANNEL = "spectrogram"
+
+# Binary frame layout:
+#   magic b"STSP", version u8, flags u8, header size u16, frame count u16,
+#   mel bins u16, sample rate u32, index of the first frame u64, capture time
+#   of the first frame f64, hop in seconds f32, log floor f32, log ceiling f32,
+#   4 bytes padding, then uint8[frames * mel bins] in row-major order.
+SPECTROGRAM_MAGIC = b"STSP"
+SPECTROGRAM_VERSION = 1
+_HEADER = struct.Struct("<4sBBHHHIQdfff4x")
+
+
+def hertz_to_mel(frequencies):
+    """Convert frequencies to the HTK mel scale."""
+    return 1127.0 * np.log1p(np.asarray(frequencies, dtype=np.float64) / 700.0)
+
+
+def mel_filterbank(sample_rate: int,
+                   n_fft: int,
+                   n_mels: int,
+                   fmin: float = 0.0,
+                   fmax: Optional[float] = None) -> np.ndarray:
+    """
+    Build a mel filterbank matrix.
+
+    Equivalent to ``tf.signal.linear_to_mel_weight_matrix``: triangular
+    filters evenly spaced on the HTK mel scale, with the DC bin zeroed.
+
+    Returns:
+        Array of shape (n_fft // 2 + 1, n_mels) mapping linear bins to mel bins
+    """
+    fmax = sample_rate / 2.0 if fmax is None else fmax
+    n_bins = n_fft // 2 + 1
+    linear = np.linspace(0.0, sample_rate / 2.0, n_bins)[1:]
+    bins_mel = hertz_to_mel(linear)[:, np.newaxis]
+    edges = np.linspace(hertz_to_mel(fmin), hertz_to_mel(fmax), n_mels + 2)
+    lower, center, upper = edges[:-2], edges[1:-1], edges[2:]
+    lower_slopes = (bins_mel - lower) / (center - lower)
+    upper_slopes = (upper - bins_mel) / (upper - center)
+    weights = np.maximum(0.0, np.minimum(lower_slopes, upper_slopes))
+    return np.vstack((np.zeros((1, n_mels)), weights)).astype(np.float32)
+
+
+class MelSpectrogram:
+    """
+    Streaming log-mel spectrogram.
+
+    Samples passed to ``process`` are appended to any leftover samples from
+    the previous call; every complete frame is transformed and the remainder
+    is kept for next time, so chunk boundaries don't matter.
+    """
+
+    def __init__(self,
+                 sample_rate: int,
+                 n_fft: int = DEFAULT_N_FFT,
+                 hop_length: int = DEFAULT_HOP_LENGTH,
+                 n_mels: int = DEFAULT_N_MELS,
+                 window_length: Optional[int] = None,
+                 fmin: float = 0.0,
+                 fmax: Optional[float] = None,
+                 power: float = 1.0,
+                 log_offset: float = DEFAULT_LOG_OFFSET):
+        """
+        Initialize the spectrogram.
+
+        Args:
+            sample_rate: Input sample rate in Hz
+            n_fft: FFT size; frames shorter than this are zero-padded
+            hop_length: Samples between frame starts
+            n_mels: Number of mel bins
+            window_length: Samples per frame (defaults to n_fft)
+            fmin: Lowest mel filter edge in Hz
+            fmax: Highest mel filter edge in Hz (defaults to Nyquist)
+            power: 1.0 for magnitude, 2.0 for power spectrogram
+            log_offset: Added before taking the natural log
+        """
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.window_length = window_length or n_fft
+        self.power = power
+        self.log_offset = log_offset
+
+        # Periodic Hann window, as used by tf.signal.stft
+        n = np.arange(self.window_length)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * n / self.window_length)).astype(np.float32)
+        self.filterbank = mel_filterbank(sample_rate, n_fft, n_mels, fmin, fmax)
+
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._frames = np.zeros((0, self.window_length), dtype=np.float32)
+        self._magnitude = np.zeros((0, n_fft // 2 + 1), dtype=np.float32)
+        self._mel = np.zeros((0, n_mels), dtype=np.float32)
+
+    def reset(self) -> None:
+        """Forget buffered samples."""
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def _reserve(self, frames: int) -> None:
+        """Grow the reusable buffers if needed."""
+        if frames > len(self._frames):
+            size = max(frames, 2 * len(self._frames))
+            self._frames = np.zeros((size, self.window_length), dtype=np.float32)
+            self._magnitude = np.zeros((size, self.n_fft // 2 + 1), dtype=np.float32)
+            self._mel = np.zeros((size, self.n_mels), dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Transform newly arrived mono samples.
+
+        Returns:
+            Array of shape (frames, n_mels) with natural-log mel values. It is
+            a view into a reused buffer and is overwritten by the next call.
+        """
+        signal = np.concatenate((self._tail, np.asarray(samples, dtype=np.float32)))
+        if len(signal) < self.window_length:
+            self._tail = signal
+            return self._mel[:0]
+
+        count = 1 + (len(signal) - self.window_length) // self.hop_length
+        self._tail = signal[count * self.hop_length:].copy()
+        self._reserve(count)
+
+        frames = sliding_window_view(signal, self.window_length)[::self.hop_length][:count]
+        windowed = self._frames[:count]
+        np.multiply(frames, self.window, out=windowed)
+        spectrum = np.fft.rfft(windowed, n=self.n_fft, axis=1)
+
+        magnitude = self._magnitude[:count]
+        np.abs(spectrum, out=magnitude, casting="same_kind")
+        if self.power != 1.0:
+            np.power(magnitude, self.power, out=magnitude)
+
+        mel = self._mel[:count]
+        np.dot(magnitude, self.filterbank, out=mel)
+        np.add(mel, self.log_offset, out=mel)
+        np.log(mel, out=mel)
+        return mel
+
+    def compute(self, waveform: np.ndarray) -> np.ndarray:
+        """Log-mel frames of a complete waveform (a new array, state untouched)."""
+        tail = self._tail
+        self.reset()
+        try:
+            return self.process(waveform).copy()
+        finally:
+            self._tail = tail
+
+
+def quantize_log_mel(log_mel: np.ndarray,
+                     floor: float = DEFAULT_LOG_FLOOR,
+                     ceiling: float = DEFAULT_LOG_CEILING) -> np.ndarray:
+    """Map log-mel values in [floor, ceiling] linearly onto 0..255."""
+    scaled = (log_mel - floor) * (255.0 / (ceiling - floor))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+
+def pack_spectrogram(first_frame: int,
+                     first_time: float,
+                     quantized: np.ndarray,
+                     sample_rate: int,
+                     hop_seconds: float,
+                     floor: float = DEFAULT_LOG_FLOOR,
+                     ceiling: float = DEFAULT_LOG_CEILING) -> bytes:
+    """Pack quantized frames into a binary spectrogram message."""
+    frames, n_mels = quantized.shape
+    header = _HEADER.pack(SPECTROGRAM_MAGIC, SPECTROGRAM_VERSION, 0, _HEADER.size,
+                          frames, n_mels, sample_rate, first_frame, first_time,
+                          hop_seconds, floor, ceiling)
+    return header + np.ascontiguousarray(quantized).tobytes()
+
+
+def unpack_spectrogram(data: bytes) -> Dict[str, Any]:
+    """Decode a message produced by ``pack_spectrogram``."""
+    (magic, version, _, header_size, frames, n_mels, sample_rate, first_frame,
+     first_time, hop_seconds, floor, ceiling) = _HEADER.unpack_from(data)
+    if magic != SPECTROGRAM_MAGIC:
+        raise ValueError("not a spectrogram frame")
+    values = np.frombuffer(data, dtype=np.uint8, count=frames * n_mels, offset=header_size)
+    return {
+        "version": version,
+        "first_frame": first_frame,
+        "first_time": first_time,
+        "sample_rate": sample_rate,
+        "hop_seconds": hop_seconds,
+        "floor": floor,
+        "ceiling": ceiling,
+        "frames": values.reshape(frames, n_mels)
+    }
+
+
+class SpectrogramStream:
+    """
+    Background thread that turns live capture audio into spectrogram messages.
+
+    It reads new audio from the capture ring buffer with ``read_since`` at a
+    fixed interval, so it never runs on the audio thread, and publishes one
+    binary message per interval on the hub's spectrogram channel.
+    """
+
+    def __init__(self,
+                 hub: BroadcastHub,
+                 capture_source: Callable[[], Any],
+                 n_fft: int = DEFAULT_N_FFT,
+                 hop_length: int = DEFAULT_HOP_LENGTH,
+                 n_mels: int = DEFAULT_N_MELS,
+                 interval: float = 0.05,
+                 channel: str = SPECTROGRAM_CHANNEL):
+        """
+        Initialize the stream.
+
+        Args:
+            hub: Hub used to publish messages
+            capture_source: Returns the current AudioCapture (or None)
+            n_fft: FFT and window size in samples at the capture rate
+            hop_length: Samples between frames
+            n_mels: Number of mel bins
+            interval: Seconds between reads of the capture buffer
+            channel: Hub channel to publish on
+        """
+        self.hub = hub
+        self.capture_source = capture_source
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.interval = interval
+        self.channel = channel
+        self.frames_sent = 0
+        self._capture = None
+        self._spectrogram: Optional[MelSpectrogram] = None
+        self._seq = 0
+        self._frame_pos = 0
+        self._frame_index = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        """Start the background thread if it isn't running."""
+        if self._running:
+            return
+        self._running = True
+        self._capture = None
+        self._thread = threading.Thread(target=self._run, name="spectrogram-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        while self._running:
+            time.sleep(self.interval)
+            try:
+                message = self.poll()
+                if message is not None:
+                    self.hub.publish_threadsafe(message, self.channel)
+            except Exception as e:
+                logger.error(f"Error computing spectrogram: {e}", exc_info=True)
+
+    def poll(self) -> Optional[bytes]:
+        """Process audio captured since the last call and return a message, if any."""
+        capture = self.capture_source()
+        if capture is None:
+            return None
+        if capture is not self._capture:
+            # New capture instance: start from its current position
+            self._capture = capture
+            self._spectrogram = MelSpectrogram(capture.sample_rate, self.n_fft,
+                                               self.hop_length, self.n_mels)
+            self._seq = capture.read_since(0)[1]
+            self._frame_pos = self._seq
+
+        data, seq = capture.read_since(self._seq)
+        if seq - len(data) > self._seq:
+            # Lost audio to the ring buffer; restart framing after the gap
+            self._spectrogram.reset()
+            self._frame_pos = seq - len(data)
+        self._seq = seq
+        if len(data) == 0:
+            return None
+
+        mono = data[:, 0] if data.shape[1] == 1 else data.mean(axis=1)
+        log_mel = self._spectrogram.process(mono)
+        count = len(log_mel)
+        if count == 0:
+            return None
+
+        sample_rate = capture.sample_rate
+        first_time = time.time() - (seq - self._frame_pos) / sample_rate
+        message = pack_spectrogram(self._frame_index, first_time, quantize_log_mel(log_mel),
+                                   sample_rate, self.hop_length / sample_rate)
+        self._frame_pos += count * self.hop_length
+        self._frame_index += count
+        self.frames_sent += count
+        return message
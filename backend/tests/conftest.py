@@ -0,0 +1,11 @@
+"""
+Shared pytest configuration for the backend tests.
+"""
+import sys
+from pathlib import Path
+
+# Backend modules import each other by top-level name, the same way main.py
+# sets things up at runtime
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
@@ -0,0 +1,188 @@
+"""
+Tests for the AI router.
+"""
+
+import functools
+import gc
+import os
+import struct
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from ..embedding_store import EmbeddingStore
+from ..inference_executor import InferenceExecutor
+from ..routers import ai as ai_router
+from ..sound_types import SoundType
+
+# The table model, through the router so that it is only registered once
+SoundEvent = ai_router.SoundEvent
+
+
+class TestSpooledStream(unittest.TestCase):
+    """Test that a streamed upload gives back its file and admission however it ends."""
+
+    def setUp(self):
+        self.executor = InferenceExecutor(workers=1, max_pending=4)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            self.path = f.name
+        self.addCleanup(lambda: os.path.exists(self.path) and os.unlink(self.path))
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def _stream(self, blocks):
+        return ai_router._SpooledStream(self.path, blocks, self.executor.admit(), window=4, step=2)
+
+    def test_read_to_end(self):
+        """Test windows, then cleanup on close."""
+        stream = self._stream(block for block in [np.arange(6, dtype=np.float32)])
+        starts = []
+        while (item := stream.next()) is not None:
+            starts.append(item[0])
+        self.assertEqual(starts, [0, 2])
+        self.assertTrue(os.path.exists(self.path))
+        stream.close()
+        stream.close()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.executor.pending, 0)
+
+    def test_never_iterated(self):
+        """Test that a stream nobody read is cleaned up when dropped."""
+        closed = []
+
+        def blocks():
+            try:
+                yield np.zeros(4, dtype=np.float32)
+            finally:
+                closed.append(True)
+
+        decoder = blocks()
+        next(decoder)
+        stream = self._stream(decoder)
+        del stream
+        gc.collect()
+        self.assertEqual(closed, [True])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.executor.pending, 0)
+
+    def test_close_during_decode(self):
+        """Test that the file outlives a decode still in progress and is deleted after it."""
+        decoding, resume = threading.Event(), threading.Event()
+
+        def blocks():
+            decoding.set()
+            resume.wait(5)
+            yield np.zeros(8, dtype=np.float32)
+
+        stream = self._stream(blocks())
+        results = []
+        reader = threading.Thread(target=lambda: results.append(stream.next()))
+        reader.start()
+        self.assertTrue(decoding.wait(5))
+        stream.close()
+        # The admission is free at once, the file only once the decode is done
+        self.assertEqual(self.executor.pending, 0)
+        self.assertTrue(os.path.exists(self.path))
+        resume.set()
+        reader.join(5)
+        self.assertEqual(results[0][0], 0)
+        self.assertTrue(stream.closed)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(stream.next())
+
+
+class TestPredictStream(unittest.TestCase):
+    """Test that refused streaming uploads leave nothing behind."""
+
+    def setUp(self):
+        self.executor = InferenceExecutor(workers=1, max_pending=4)
+        self.addCleanup(self.executor.shutdown)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for target, attribute, value in (
+            (ai_router, "executor", self.executor),
+            (ai_router, "_require_model", mock.AsyncMock()),
+            (tempfile, "tempdir", self.directory.name)
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        app = FastAPI()
+        app.include_router(ai_router.router)
+        self.client = TestClient(app, raise_server_exceptions=False)
+
+    def test_truncated_header(self):
+        """Test that a WAV file cut off in its fmt chunk is refused and cleaned up."""
+        data = b"RIFF" + struct.pack("<I", 16) + b"WAVEfmt " + struct.pack("<I", 16) + b"\x01\x00\x01\x00"
+        for _ in range(2):
+            response = self.client.post("/ai/predict/stream", files={"file": ("cut.wav", data, "audio/wav")})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Cannot decode", response.json()["detail"])
+        self.assertEqual(self.executor.pending, 0)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_unexpected_error(self):
+        """Test that other decoder errors release the admission and the file too."""
+        with mock.patch.object(ai_router, "stream_audio", side_effect=OSError("disk gone")):
+            response = self.client.post("/ai/predict/stream", files={"file": ("a.wav", b"RIFF", "audio/wav")})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.executor.pending, 0)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+class TestSaveEvent(unittest.TestCase):
+    """Test that a classified upload is saved with its embedding or not at all."""
+
+    PREDICTION = {"class_name": "Speech", "class_id": 0, "confidence": 0.9}
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = EmbeddingStore(self.directory.name, dim=4)
+        self.addCleanup(self.store.close)
+        classify = mock.Mock(return_value=(SoundType.SPEECH, 0.9))
+        for target, attribute, value in (
+            (ai_router, "embedding_store", self.store),
+            (ai_router, "ai_model", mock.Mock(sound_types=mock.Mock(classify=classify))),
+            # Timezone-aware, which newer sqlmodel versions insist on
+            (ai_router, "SoundEvent", functools.partial(SoundEvent, timestamp=datetime.now(timezone.utc)))
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _save(self):
+        with Session(self.engine) as session:
+            return ai_router._save_event(session, self.PREDICTION, np.zeros((2, 3)), np.ones((2, 4)), 16000, "a.wav")
+
+    def _events(self):
+        with Session(self.engine) as session:
+            return session.exec(select(SoundEvent)).all()
+
+    def test_saved(self):
+        """Test the event and its embedding."""
+        event_id = self._save()
+        self.assertEqual([event.id for event in self._events()], [event_id])
+        np.testing.assert_allclose(self.store.get(event_id), np.full(4, 0.5), atol=1e-3)
+
+    def test_rolled_back(self):
+        """Test that no event is left behind when its embedding can't be stored."""
+        with mock.patch.object(self.store, "add", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self._save()
+        self.assertEqual(self._events(), [])
+        self.assertEqual(len(self.store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
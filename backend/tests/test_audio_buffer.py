@@ -0,0 +1,99 @@
+"""
+Tests for the audio_buffer module.
+"""
+
+import unittest
+import numpy as np
+
+from ..audio_buffer import AudioRingBuffer, LevelHistory, downsample_levels
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+    """Test the AudioRingBuffer class."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.buffer = AudioRingBuffer(capacity=8, channels=1)
+    
+    def test_write_and_read_last(self):
+        """Test that the most recent frames are returned in order."""
+        self.buffer.write(np.arange(5, dtype=np.float32))
+        np.testing.assert_array_equal(self.buffer.read_last(3)[:, 0], [2, 3, 4])
+        self.assertEqual(self.buffer.write_pos, 5)
+    
+    def test_contiguous_read_is_view(self):
+        """Test that reads which do not wrap share memory with the buffer."""
+        self.buffer.write(np.ones(4, dtype=np.float32))
+        self.assertTrue(np.shares_memory(self.buffer.read_last(4), self.buffer._data))
+    
+    def test_wraparound(self):
+        """Test writes and reads across the end of the buffer."""
+        self.buffer.write(np.arange(6, dtype=np.float32))
+        self.buffer.write(np.arange(6, 10, dtype=np.float32))
+        np.testing.assert_array_equal(self.buffer.read_last(8)[:, 0], np.arange(2, 10))
+        self.assertEqual(self.buffer.oldest_pos, 2)
+    
+    def test_read_since(self):
+        """Test incremental reads by sequence number."""
+        self.buffer.write(np.arange(3, dtype=np.float32))
+        data, seq = self.buffer.read_since(0)
+        self.assertEqual(len(data), 3)
+        self.buffer.write(np.arange(3, 5, dtype=np.float32))
+        data, seq = self.buffer.read_since(seq)
+        np.testing.assert_array_equal(data[:, 0], [3, 4])
+        self.assertEqual(seq, 5)
+    
+    def test_read_since_overwritten(self):
+        """Test that lapped positions are clipped to the oldest held frame."""
+        self.buffer.write(np.arange(20, dtype=np.float32))
+        data, seq = self.buffer.read_since(0)
+        np.testing.assert_array_equal(data[:, 0], np.arange(12, 20))
+        self.assertEqual(seq, 20)
+
+
+
+class TestLevelHistory(unittest.TestCase):
+    """Test the LevelHistory class and downsampling."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.history = LevelHistory(capacity=10)
+        for i in range(15):
+            self.history.append(100.0 + i, i / 100, i / 50)
+    
+    def test_retention(self):
+        """Test that only the newest entries are retained."""
+        self.assertEqual(len(self.history), 10)
+        self.assertEqual(self.history.count, 15)
+        timestamps, rms, peak = self.history.slice(0, self.history.count)
+        np.testing.assert_array_equal(timestamps, np.arange(105.0, 115.0))
+    
+    def test_start_offset(self):
+        """Test that a history can continue the sequence of a previous one."""
+        history = LevelHistory(capacity=4, start=100)
+        self.assertEqual((history.count, history.oldest, len(history)), (100, 100, 0))
+        for i in range(6):
+            history.append(float(i), 0.1, 0.2)
+        self.assertEqual((history.count, history.oldest, len(history)), (106, 102, 4))
+        timestamps, _, _ = history.slice(0, 200)
+        np.testing.assert_array_equal(timestamps, [2.0, 3.0, 4.0, 5.0])
+    
+    def test_window(self):
+        """Test selecting entries by time."""
+        timestamps, rms, peak = self.history.window(3.0)
+        np.testing.assert_array_equal(timestamps, [111.0, 112.0, 113.0, 114.0])
+        self.assertAlmostEqual(float(rms[-1]), 0.14, places=6)
+    
+    def test_downsample_keeps_extremes(self):
+        """Test that min/max buckets preserve spikes."""
+        timestamps = np.arange(1000, dtype=np.float64)
+        rms = np.full(1000, 0.1, dtype=np.float32)
+        rms[537] = 0.9
+        buckets = downsample_levels(timestamps, rms, rms, points=50)
+        self.assertLessEqual(len(buckets["timestamps"]), 50)
+        self.assertAlmostEqual(float(buckets["rms_max"].max()), 0.9, places=6)
+        self.assertAlmostEqual(float(buckets["rms_min"].min()), 0.1, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -90,17 +90,64 @@ class TestAudioCapture(unittest.TestCase):
         # Initially should be None
         self.assertIsNone(self.audio_capture.get_current_level())
         
-        # Create a test sample
-        test_data = np.array([0.1, 0.2, 0.3, 0.4], dtype=np.float32)
-        self.audio_capture._last_sample = AudioSample(
-            timestamp=datetime.now(),
-            rms=0.5,
-            raw_data=test_data,
-            sample_rate=44100
+        # Feed a block through the audio callback
+        test_data = np.full((4, 1), 0.5, dtype=np.float32)
+        self.audio_capture._audio_callback(
+            indata=test_data,
+            frames=4,
+            time_info={},
+            status=0
         )
         
-        # Should now return the dB value
-        self.assertAlmostEqual(self.audio_capture.get_current_level(), -6.0206, places=4)
+        # Should now return the latest sample
+        level = self.audio_capture.get_current_level()
+        self.assertAlmostEqual(level.db, -6.0206, places=4)
+        np.testing.assert_array_equal(level.raw_data, test_data)
+    
+    @patch('sounddevice.InputStream')
+    def test_read_last(self, mock_stream):
+        """Test reading recent audio from the ring buffer."""
+        for value in (0.1, 0.2):
+            self.audio_capture._audio_callback(
+                indata=np.full((1024, 1), value, dtype=np.float32),
+                frames=1024,
+                time_info={},
+                status=0
+            )
+        
+        data = self.audio_capture.read_last(2048 / self.audio_capture.sample_rate)
+        self.assertEqual(data.shape, (2048, 1))
+        self.assertAlmostEqual(float(data[-1, 0]), 0.2, places=6)
+        
+        data, seq = self.audio_capture.read_since(1024)
+        self.assertEqual(len(data), 1024)
+        self.assertEqual(seq, 2048)
+    
+    @patch('sounddevice.InputStream')
+    def test_worker_mode(self, mock_stream):
+        """Test that worker mode defers level computation to the worker."""
+        capture = AudioCapture(sample_rate=44100, channels=1, block_size=4,
+                               buffer_seconds=8 / 44100, worker_thread=True)
+        mock_callback = MagicMock()
+        capture._callback = mock_callback
+        capture._worker = MagicMock()  # Pretend the worker thread is running
+        
+        for value in (0.1, 0.2):
+            capture._audio_callback(np.full((4, 1), value, dtype=np.float32), 4, {}, 0)
+        self.assertEqual(mock_callback.call_count, 0)
+        
+        capture._process_pending()
+        self.assertEqual(mock_callback.call_count, 2)
+        self.assertAlmostEqual(capture.get_current_level().rms, 0.2, places=6)
+        
+        # Lapping the ring buffer counts the overwritten blocks as dropped
+        for value in (0.3, 0.4, 0.5):
+            capture._audio_callback(np.full((4, 1), value, dtype=np.float32), 4, {}, 0)
+        capture._process_pending()
+        stats = capture.get_stats()
+        self.assertEqual(stats['dropped_blocks'], 1)
+        self.assertEqual(stats['blocks_processed'], 4)
+        self.assertEqual(stats['blocks_captured'], 5)
 
 
 if __name__ == '__main__':
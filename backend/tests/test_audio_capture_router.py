@@ -0,0 +1,73 @@
+"""
+Tests for the audio capture router.
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from ..broadcast import Subscriber
+from ..routers import audio_capture as capture_router
+
+
+class FakeWebSocket:
+    async def send_text(self, data):
+        pass
+
+    async def send_bytes(self, data):
+        pass
+
+
+class TestCaptureLifecycle(unittest.TestCase):
+    """Test that the spectrogram stream and live classifier follow the capture."""
+
+    def setUp(self):
+        settings = capture_router.settings
+        for target, attribute, value in (
+            (settings, "AUDIO_SOURCE", "synthetic"),
+            (settings, "AUDIO_SOURCE_SPEED", 1.0),
+            (settings, "AI_REALTIME", False),
+            # Never reaches a tick, which would load the model
+            (capture_router.realtime_classifier, "interval", 60.0),
+            (capture_router, "audio_capture", None)
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_stop_and_restart(self):
+        """Test that stopping the capture stops both, and starting it resumes them for subscribed clients."""
+        async def scenario():
+            hub = capture_router.hub
+            hub.attach(asyncio.get_running_loop())
+            subscriber = Subscriber(FakeWebSocket())
+            spectrogram, classifier = capture_router.spectrogram_stream, capture_router.realtime_classifier
+            states = []
+            try:
+                # Subscribing before the capture runs starts nothing
+                await capture_router._set_spectrogram_subscription(subscriber, True)
+                await capture_router._set_classification_subscription(subscriber, True)
+                states.append((spectrogram.is_running(), classifier.is_running()))
+                self.assertTrue(await capture_router.start_audio_capture())
+                states.append((spectrogram.is_running(), classifier.is_running()))
+                # Never the debug-only inline mode
+                self.assertEqual(capture_router.audio_capture.get_stats()['mode'], 'worker')
+                self.assertTrue(await capture_router.stop_audio_capture())
+                states.append((spectrogram.is_running(), classifier.is_running()))
+                self.assertTrue(await capture_router.start_audio_capture())
+                states.append((spectrogram.is_running(), classifier.is_running()))
+                await capture_router._set_spectrogram_subscription(subscriber, False)
+                await capture_router._set_classification_subscription(subscriber, False)
+                states.append((spectrogram.is_running(), classifier.is_running()))
+            finally:
+                await capture_router.stop_audio_capture()
+                hub.unsubscribe(subscriber, capture_router.SPECTROGRAM_CHANNEL)
+                hub.unsubscribe(subscriber, capture_router.CLASSIFICATION_CHANNEL)
+            return states
+
+        states = asyncio.run(scenario())
+        self.assertEqual(states, [(False, False), (True, True), (False, False), (True, True), (False, False)])
+
+
+if __name__ == '__main__':
+    unittest.main()
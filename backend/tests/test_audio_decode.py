@@ -0,0 +1,229 @@
+"""
+Tests for the audio_decode module.
+"""
+
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..audio_decode import (
+    WAVE_FORMAT_EXTENSIBLE,
+    WAVE_FORMAT_IEEE_FLOAT,
+    WAVE_FORMAT_PCM,
+    UnsupportedAudioError,
+    decode_wav,
+    load_audio,
+    overlapping_windows,
+    resample,
+    stream_audio
+)
+from ..inference_backends import PATCH_HOP, PATCH_WINDOW, frame_waveform, stream_window
+
+try:
+    import librosa
+    import soundfile
+except ImportError:
+    librosa = None
+
+
+def _encode(samples: np.ndarray, tag: int, bits: int) -> bytes:
+    """Encode float samples in [-1, 1] as WAV sample data."""
+    if tag == WAVE_FORMAT_IEEE_FLOAT:
+        return samples.astype("<f4" if bits == 32 else "<f8").tobytes()
+    if bits == 8:
+        return np.round(samples * 127 + 128).astype(np.uint8).tobytes()
+    if bits == 24:
+        values = np.round(samples * ((1 << 23) - 1)).astype("<i4")
+        return values.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return np.round(samples * ((1 << (bits - 1)) - 1)).astype(f"<i{bits // 8}").tobytes()
+
+
+def make_wav(samples: np.ndarray, rate: int = 16000, tag: int = WAVE_FORMAT_PCM, bits: int = 16,
+             extensible: bool = False, extra_chunk: bool = False, streamed: bool = False) -> bytes:
+    """Build a WAV file; multi-channel ``samples`` have shape (frames, channels)."""
+    samples = np.asarray(samples, dtype=np.float64)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    data = _encode(samples.reshape(-1), tag, bits)
+    block_align = channels * bits // 8
+    if extensible:
+        guid_tail = b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+        fmt = struct.pack("<HHIIHHHHI", WAVE_FORMAT_EXTENSIBLE, channels, rate, rate * block_align,
+                          block_align, bits, 22, bits, 0) + struct.pack("<H", tag) + guid_tail
+    else:
+        fmt = struct.pack("<HHIIHH", tag, channels, rate, rate * block_align, block_align, bits)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if extra_chunk:
+        # Odd-sized chunk, so the reader has to skip the pad byte
+        chunks += b"LIST" + struct.pack("<I", 5) + b"INFOx\x00"
+    chunks += b"data" + struct.pack("<I", 0xFFFFFFFF if streamed else len(data)) + data
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+def tone(seconds=1.0, rate=16000, freq=440.0, amp=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    return amp * np.sin(2 * np.pi * freq * t)
+
+
+class TestDecodeWav(unittest.TestCase):
+    """Test the direct WAV decoder."""
+
+    def test_int16_mono(self):
+        """Test 16-bit PCM against the stdlib-free reference conversion."""
+        data = make_wav(tone())
+        samples, rate = decode_wav(data)
+        self.assertEqual(rate, 16000)
+        self.assertEqual(samples.dtype, np.float32)
+        expected = np.frombuffer(data[44:], dtype="<i2") / 32768
+        np.testing.assert_allclose(samples, expected, atol=1e-7)
+
+    def test_float32_is_zero_copy(self):
+        """Test that float32 mono samples are a view of the upload."""
+        data = bytearray(make_wav(tone(), tag=WAVE_FORMAT_IEEE_FLOAT, bits=32))
+        samples, _ = decode_wav(data)
+        data[44:48] = struct.pack("<f", 0.25)
+        self.assertEqual(samples[0], 0.25)
+
+    def test_encodings(self):
+        """Test every supported sample format, also in extensible headers."""
+        reference = tone(0.25)
+        for tag, bits, atol in ((WAVE_FORMAT_PCM, 8, 1 / 64), (WAVE_FORMAT_PCM, 24, 1e-6),
+                                (WAVE_FORMAT_PCM, 32, 1e-6), (WAVE_FORMAT_IEEE_FLOAT, 64, 1e-7)):
+            for extensible in (False, True):
+                with self.subTest(tag=tag, bits=bits, extensible=extensible):
+                    samples, _ = decode_wav(make_wav(reference, tag=tag, bits=bits, extensible=extensible))
+                    np.testing.assert_allclose(samples, reference, atol=atol)
+
+    def test_stereo_mixdown_and_chunks(self):
+        """Test channel averaging, skipping unknown odd-sized chunks and streamed sizes."""
+        left, right = tone(0.25), tone(0.25, freq=880)
+        data = make_wav(np.stack([left, right], axis=1), rate=44100, extra_chunk=True, streamed=True)
+        samples, rate = decode_wav(data)
+        self.assertEqual(rate, 44100)
+        np.testing.assert_allclose(samples, (left + right) / 2, atol=1e-4)
+
+    def test_unsupported(self):
+        """Test that non-WAV data and compressed WAV are refused."""
+        with self.assertRaises(UnsupportedAudioError):
+            decode_wav(b"fLaC" + bytes(100))
+        with self.assertRaisesRegex(UnsupportedAudioError, "0x0002"):
+            decode_wav(make_wav(tone(0.1), tag=0x0002, bits=16))
+
+    def test_truncated_header(self):
+        """Test that files cut off inside the fmt chunk are refused, not misread."""
+        data = make_wav(tone(0.1))
+        fmt = data.index(b"fmt ")
+        for end in (fmt + 8, fmt + 12, fmt + 20):
+            with self.assertRaisesRegex(UnsupportedAudioError, "Truncated fmt chunk"):
+                decode_wav(data[:end])
+
+
+class TestResample(unittest.TestCase):
+    """Test polyphase resampling to 16 kHz."""
+
+    def test_common_rates(self):
+        """Test that a tone keeps its length and frequency."""
+        for rate in (44100, 48000, 22050, 8000):
+            with self.subTest(rate=rate):
+                out = resample(tone(2.0, rate=rate).astype(np.float32), rate)
+                self.assertEqual(out.dtype, np.float32)
+                self.assertEqual(len(out), 32000)
+                spectrum = np.abs(np.fft.rfft(out))
+                self.assertAlmostEqual(np.argmax(spectrum) * 16000 / len(out), 440, delta=1)
+
+    def test_same_rate_is_untouched(self):
+        samples = np.zeros(100, dtype=np.float32)
+        self.assertIs(resample(samples, 16000), samples)
+
+    def test_load_audio_timings(self):
+        """Test that load_audio reports decoding and resampling separately."""
+        timings = {}
+        samples = load_audio(make_wav(tone(1.0, rate=44100), rate=44100), timings=timings)
+        self.assertEqual(len(samples), 16000)
+        self.assertEqual(set(timings), {"decode", "resample"})
+        self.assertTrue(all(seconds >= 0 for seconds in timings.values()))
+
+
+class TestStreaming(unittest.TestCase):
+    """Test block-wise decoding and windowing of files on disk."""
+
+    def _file(self, data: bytes, suffix: str = ".wav") -> str:
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_blocks_match_whole_decode(self):
+        """Test that streamed blocks join up to the one-shot decode, with and without resampling."""
+        stereo = np.stack([tone(3.0, rate=44100), tone(3.0, rate=44100, freq=880)], axis=1)
+        for data in (make_wav(tone(3.0)), make_wav(stereo, rate=44100, bits=24)):
+            with self.subTest(bytes=len(data)):
+                streamed = np.concatenate(list(stream_audio(self._file(data), block_frames=5000)))
+                whole = load_audio(data)
+                self.assertEqual(len(streamed), len(whole))
+                np.testing.assert_allclose(streamed, whole, atol=1e-5)
+
+    def test_unreadable_file_fails_early(self):
+        with self.assertRaises(UnsupportedAudioError):
+            stream_audio(self._file(b"not audio at all"))
+        with self.assertRaises(UnsupportedAudioError):
+            stream_audio(self._file(b""))
+
+    def test_windows_give_whole_file_patches(self):
+        """Test that the patches of all windows are exactly the patches of the whole waveform."""
+        window, step = stream_window(2.0)
+        rng = np.random.default_rng(0)
+        for length in (1000, window, window + step, 5 * step + PATCH_WINDOW - PATCH_HOP, 5 * step + 7921, 123457):
+            with self.subTest(length=length):
+                waveform = rng.standard_normal(length).astype(np.float32)
+                blocks = np.array_split(waveform, 7)
+                patches = [frame_waveform(samples) for _, samples in overlapping_windows(blocks, window, step)]
+                np.testing.assert_array_equal(np.concatenate(patches), frame_waveform(waveform))
+
+    def test_windows_bounded(self):
+        """Test window starts and lengths, and that nothing comes out of an empty stream."""
+        windows = list(overlapping_windows([np.ones(25, dtype=np.float32)], 10, 8))
+        self.assertEqual([(start, len(samples)) for start, samples in windows], [(0, 10), (8, 10), (16, 9)])
+        self.assertEqual(list(overlapping_windows([], 10, 8)), [])
+        with self.assertRaises(ValueError):
+            list(overlapping_windows([], 10, 11))
+
+
+@unittest.skipIf(librosa is None, "librosa is not installed")
+class TestAgainstLibrosa(unittest.TestCase):
+    """Compare the fast path with librosa.load."""
+
+    def test_16k_matches_exactly(self):
+        data = make_wav(tone())
+        expected, _ = librosa.load(io.BytesIO(data), sr=16000, mono=True)
+        np.testing.assert_allclose(load_audio(data), expected, atol=1e-7)
+
+    def test_44k_close(self):
+        """Test that polyphase and librosa's resampler agree away from the edges."""
+        data = make_wav(tone(1.0, rate=44100), rate=44100)
+        expected, _ = librosa.load(io.BytesIO(data), sr=16000, mono=True)
+        samples = load_audio(data)
+        self.assertEqual(len(samples), len(expected))
+        np.testing.assert_allclose(samples[200:-200], expected[200:-200], atol=5e-3)
+
+    def test_falls_back_for_other_formats(self):
+        """Test that FLAC goes through librosa."""
+        buffer = io.BytesIO()
+        soundfile.write(buffer, tone(), 16000, format="FLAC")
+        samples = load_audio(buffer.getvalue())
+        np.testing.assert_allclose(samples, tone(), atol=1e-4)
+
+    def test_streams_other_formats(self):
+        """Test that FLAC files are streamed through soundfile."""
+        with tempfile.NamedTemporaryFile(suffix=".flac", delete=False) as f:
+            soundfile.write(f, np.stack([tone(), tone()], axis=1), 16000, format="FLAC")
+        self.addCleanup(os.unlink, f.name)
+        samples = np.concatenate(list(stream_audio(f.name, block_frames=4000)))
+        np.testing.assert_allclose(samples, tone(), atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Tests for the broadcast module.
+"""
+
+import asyncio
+import json
+import unittest
+
+from ..broadcast import CONTROL_QUEUE_SIZE, BroadcastHub
+
+
+class FakeWebSocket:
+    """Records sent frames; optionally blocks until released."""
+    
+    def __init__(self, blocked: bool = False):
+        self.frames = []
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+    
+    async def send_text(self, data):
+        await self.release.wait()
+        self.frames.append(data)
+    
+    async def send_bytes(self, data):
+        await self.release.wait()
+        self.frames.append(data)
+
+
+class TestBroadcastHub(unittest.TestCase):
+    """Test the BroadcastHub class."""
+    
+    def test_publish_to_all_clients(self):
+        """Test that every client receives the same serialized message."""
+        async def scenario():
+            hub = BroadcastHub(max_queue=4)
+            hub.attach(asyncio.get_running_loop())
+            sockets = [FakeWebSocket() for _ in range(3)]
+            for ws in sockets:
+                hub.add(ws)
+            hub.publish({"type": "audio_level", "rms": 0.5})
+            await asyncio.sleep(0.01)
+            return sockets
+        
+        sockets = asyncio.run(scenario())
+        for ws in sockets:
+            self.assertEqual([json.loads(f) for f in ws.frames], [{"type": "audio_level", "rms": 0.5}])
+        self.assertIs(sockets[0].frames[0], sockets[1].frames[0])
+    
+    def test_slow_client_drops_oldest(self):
+        """Test that a stalled client keeps only its newest messages."""
+        async def scenario():
+            hub = BroadcastHub(max_queue=2)
+            hub.attach(asyncio.get_running_loop())
+            fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+            hub.add(fast)
+            slow_sub = hub.add(slow)
+            for i in range(10):
+                hub.publish(str(i))
+                await asyncio.sleep(0)
+            slow.release.set()
+            await asyncio.sleep(0.01)
+            return fast, slow, slow_sub
+        
+        fast, slow, slow_sub = asyncio.run(scenario())
+        self.assertEqual(fast.frames, [str(i) for i in range(10)])
+        self.assertEqual(slow.frames[-2:], ["8", "9"])
+        self.assertLessEqual(len(slow.frames), 3)
+        self.assertGreater(slow_sub.dropped, 0)
+    
+    def test_control_queue_is_bounded(self):
+        """Test that a client flooding requests without reading keeps only the newest replies."""
+        async def scenario():
+            hub = BroadcastHub()
+            hub.attach(asyncio.get_running_loop())
+            ws = FakeWebSocket(blocked=True)
+            sub = hub.add(ws)
+            await asyncio.sleep(0)
+            for i in range(CONTROL_QUEUE_SIZE * 3):
+                sub.send({"type": "pong", "n": i})
+            queued = len(sub.control)
+            ws.release.set()
+            await asyncio.sleep(0.01)
+            return ws, sub, queued, hub.get_stats()
+        
+        ws, sub, queued, stats = asyncio.run(scenario())
+        self.assertEqual(queued, CONTROL_QUEUE_SIZE)
+        self.assertEqual(json.loads(ws.frames[-1])["n"], CONTROL_QUEUE_SIZE * 3 - 1)
+        self.assertLessEqual(len(ws.frames), CONTROL_QUEUE_SIZE + 1)
+        self.assertEqual(sub.control_dropped, stats["control_dropped"])
+        self.assertGreaterEqual(sub.control_dropped, CONTROL_QUEUE_SIZE * 2 - 1)
+    
+    def test_publish_threadsafe(self):
+        """Test publishing from another thread."""
+        async def scenario():
+            hub = BroadcastHub()
+            loop = asyncio.get_running_loop()
+            hub.attach(loop)
+            ws = FakeWebSocket()
+            hub.add(ws)
+            await loop.run_in_executor(None, hub.publish_threadsafe, "hello")
+            await asyncio.sleep(0.01)
+            return ws
+        
+        self.assertEqual(asyncio.run(scenario()).frames, ["hello"])
+
+
+if __name__ == '__main__':
+    unittest.main()
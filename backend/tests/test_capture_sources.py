@@ -0,0 +1,121 @@
+"""
+Tests for the capture_sources module.
+"""
+
+import os
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from ..audio_capture import AudioCapture
+from ..capture_sources import FileSource, SyntheticSource, parse_program, source_from_spec
+
+
+class TestSyntheticSource(unittest.TestCase):
+    """Test synthetic programs."""
+
+    def test_parse_program(self):
+        """Test parsing segments and their parameters."""
+        segments = parse_program("tone:2:freq=1000:amp=0.5, silence:1,noise:0.25")
+        self.assertEqual([s.kind for s in segments], ["tone", "silence", "noise"])
+        self.assertEqual(segments[0].frequency, 1000.0)
+        self.assertEqual(segments[0].amplitude, 0.5)
+        self.assertEqual(segments[2].seconds, 0.25)
+        with self.assertRaises(ValueError):
+            parse_program("chirp:1")
+
+    def test_blocks_are_complete_and_repeatable(self):
+        """Test that the program is cut into full blocks deterministically."""
+        source = SyntheticSource("tone:0.1,noise:0.05:amp=0.5", loop=False, seed=3)
+        first = list(source.blocks(8000, 2, 256))
+        second = list(source.blocks(8000, 2, 256))
+        # 1200 frames -> 4 full blocks plus a padded one
+        self.assertEqual(len(first), 5)
+        self.assertTrue(all(block.shape == (256, 2) for block in first))
+        np.testing.assert_array_equal(np.concatenate(first), np.concatenate(second))
+
+    def test_empty_programs(self):
+        """Test that programs without samples are refused instead of looping on nothing."""
+        for spec in ("tone:0,silence:0", "tone:-1"):
+            with self.assertRaises(ValueError):
+                parse_program(spec)
+        source = SyntheticSource("tone:0.00001", loop=True)
+        with self.assertRaises(ValueError):
+            list(source.blocks(8000, 1, 256))
+
+    def test_source_from_spec(self):
+        """Test creating sources from the AUDIO_SOURCE setting."""
+        self.assertIsNone(source_from_spec("device"))
+        source = source_from_spec("synthetic:silence:1", speed=0)
+        self.assertIsInstance(source, SyntheticSource)
+        self.assertEqual(source.speed, 0)
+        with self.assertRaises(ValueError):
+            source_from_spec("microphone")
+
+
+class TestSourceCapture(unittest.TestCase):
+    """Test driving AudioCapture from sources."""
+
+    def setUp(self):
+        """Write a short stereo test file."""
+        fd, self.path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        signal = np.zeros((4000, 2), dtype=np.int16)
+        signal[2000:] = 16384
+        with wave.open(self.path, "wb") as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(8000)
+            f.writeframes(signal.tobytes())
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_empty_file(self):
+        """Test that an empty file is refused, even when it would loop."""
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        self.addCleanup(os.unlink, path)
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(8000)
+        with self.assertRaises(ValueError):
+            source_from_spec(f"file:{path}", loop=True)
+
+    def test_file_replay_as_fast_as_possible(self):
+        """Test that a file is replayed through the worker without drops."""
+        capture = AudioCapture(block_size=500, worker_thread=True,
+                               source=FileSource(self.path, speed=0))
+        self.assertEqual(capture.sample_rate, 8000)
+        capture.start()
+        try:
+            self.assertTrue(capture.wait_finished(timeout=5))
+        finally:
+            capture.stop()
+
+        self.assertEqual(capture.history.count, 8)
+        self.assertEqual(capture.get_stats()["dropped_blocks"], 0)
+        _, rms, _ = capture.history.slice(0, 8)
+        np.testing.assert_allclose(rms, [0.0] * 4 + [0.5] * 4)
+
+    def test_synthetic_realtime_speedup(self):
+        """Test that speed scales the delivery rate."""
+        capture = AudioCapture(sample_rate=8000, block_size=400,
+                               source=SyntheticSource("tone:0.5", loop=False, speed=10))
+        capture.start()
+        try:
+            self.assertTrue(capture.wait_finished(timeout=5))
+        finally:
+            capture.stop()
+        timestamps, rms, _ = capture.history.slice(0, capture.history.count)
+        self.assertEqual(len(rms), 10)
+        # 0.5 s of audio at 10x real time
+        self.assertAlmostEqual(timestamps[-1] - timestamps[0], 0.045, delta=0.03)
+        np.testing.assert_allclose(rms, 0.1 / np.sqrt(2), rtol=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for the embedding_store module.
+"""
+
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from .. import embedding_store as embedding_store_module
+from ..embedding_store import EmbeddingStore, clip_embedding
+
+DIM = 16
+
+
+def normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    """Test storage, exhaustive search and the IVF index."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.rng = np.random.default_rng(0)
+
+    def _store(self, **kwargs):
+        store = EmbeddingStore(self.dir.name, dim=DIM, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_clip_embedding(self):
+        """Test that patch embeddings are averaged and normalized."""
+        embedding = clip_embedding(np.array([[3.0, 0.0], [3.0, 8.0]]))
+        np.testing.assert_allclose(embedding, [0.6, 0.8])
+        self.assertIsNone(clip_embedding(None))
+
+    def test_add_get_remove(self):
+        """Test float16 round trips, replacing and deleting."""
+        store = self._store()
+        vector = self.rng.standard_normal(DIM)
+        store.add(7, vector)
+        np.testing.assert_allclose(store.get(7), normalized(vector), atol=1e-3)
+        store.add(7, -vector)
+        np.testing.assert_allclose(store.get(7), -normalized(vector), atol=1e-3)
+        self.assertEqual(len(store), 1)
+        self.assertTrue(store.remove(7))
+        self.assertFalse(store.remove(7))
+        self.assertIsNone(store.get(7))
+        with self.assertRaises(ValueError):
+            store.add(8, np.ones(DIM + 1))
+
+    def test_search_matches_reference(self):
+        """Test chunked search across file growth against a float64 brute force."""
+        vectors = normalized(self.rng.standard_normal((300, DIM)))
+        with mock.patch.object(embedding_store_module, "GROWTH", 64), \
+                mock.patch.object(embedding_store_module, "SEARCH_CHUNK", 50):
+            store = self._store()
+            for i, vector in enumerate(vectors, start=1):
+                store.add(i, vector)
+            store.remove(5)
+            query = vectors[0]
+            results = store.search(query, k=10, exclude=1)
+        reference = vectors.astype(np.float64) @ query
+        reference[[0, 4]] = -np.inf
+        expected = np.argsort(reference)[::-1][:10] + 1
+        self.assertEqual([i for i, _ in results], expected.tolist())
+        np.testing.assert_allclose([s for _, s in results], reference[expected - 1], atol=2e-3)
+        # similar() queries with the stored float16 copy, so only the ranking is compared
+        self.assertEqual([i for i, _ in store.similar(1, k=3)], [i for i, _ in results[:3]])
+        self.assertIsNone(store.similar(999))
+
+    def test_reopen(self):
+        """Test that embeddings survive closing the store, and deletions too."""
+        vectors = normalized(self.rng.standard_normal((5, DIM)))
+        store = self._store()
+        for i, vector in enumerate(vectors, start=1):
+            store.add(i, vector)
+        store.remove(2)
+        store.close()
+        reopened = self._store()
+        self.assertEqual(len(reopened), 4)
+        self.assertIsNone(reopened.get(2))
+        self.assertEqual([i for i, _ in reopened.similar(1, k=10)],
+                         (np.argsort(vectors[2:] @ vectors[0])[::-1] + 3).tolist())
+        reopened.add(6, vectors[0])
+        self.assertEqual(reopened.similar(1, k=1)[0][0], 6)
+        with self.assertRaisesRegex(ValueError, "16-d"):
+            EmbeddingStore(self.dir.name, dim=32).get(1)
+
+    def test_ivf_index(self):
+        """Test that the index finds the neighbours of clustered data and keeps up with new vectors."""
+        centers = normalized(self.rng.standard_normal((8, DIM)))
+        vectors = normalized(np.repeat(centers, 100, axis=0) + 0.1 * self.rng.standard_normal((800, DIM)))
+        store = self._store(ivf_lists=8, ivf_probes=2, ivf_min_vectors=500)
+        for i, vector in enumerate(vectors, start=1):
+            store.add(i, vector)
+        query = vectors[0]
+        exact = np.argsort(vectors @ query)[::-1][1:11] + 1
+        found = [i for i, _ in store.search(query, k=10, exclude=1)]
+        self.assertGreaterEqual(len(set(found) & set(exact.tolist())), 9)
+        self.assertEqual(store.get_stats()["index"]["lists"], 8)
+        store.add(1000, query)
+        self.assertEqual(store.search(query, k=1, exclude=1)[0][0], 1000)
+        self.assertEqual(store.get_stats()["index"]["searches"], 2)
+
+    def test_disabled(self):
+        store = EmbeddingStore(None)
+        self.assertFalse(store.enabled)
+        self.assertIsNone(store.get(1))
+        self.assertFalse(store.remove(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,402 @@
+"""
+Tests for the inference_backends module.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from ..config import settings
+from ..inference_backends import (
+    NUM_CLASSES,
+    PATCH_HOP,
+    PATCH_WINDOW,
+    InferenceBackend,
+    ONNXBackend,
+    TFLiteBackend,
+    bucket_chunks,
+    bucket_span,
+    create_backend,
+    dequantize,
+    frame_waveform,
+    parse_buckets,
+    quantize
+)
+from ..model_bundle import LABELS_NAME, add_model, manifest_models, write_manifest
+from ..model_registry import READY, ModelRegistry
+
+LABELS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), LABELS_NAME)
+
+try:
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    import onnxruntime
+except ImportError:
+    onnx = None
+
+
+def _class_weights() -> np.ndarray:
+    return np.linspace(0.5, 2.0, NUM_CLASSES, dtype=np.float32).reshape(1, NUM_CLASSES)
+
+
+def _reference_scores(waveform: np.ndarray) -> np.ndarray:
+    """What the test models compute: mean |x| of each patch times fixed class weights."""
+    return np.abs(frame_waveform(waveform)).mean(axis=1, keepdims=True) * _class_weights()
+
+
+def _write_onnx_model(path: str, batch=None) -> None:
+    """Write a tiny stand-in model with YAMNet's patch input and score output."""
+    graph = helper.make_graph(
+        [
+            helper.make_node("Abs", ["waveform"], ["magnitude"]),
+            helper.make_node("ReduceMean", ["magnitude", "axes"], ["level"], keepdims=1),
+            helper.make_node("Mul", ["level", "weights"], ["scores"])
+        ],
+        "yamnet_stand_in",
+        [helper.make_tensor_value_info("waveform", TensorProto.FLOAT, [batch or "batch", PATCH_WINDOW])],
+        [helper.make_tensor_value_info("scores", TensorProto.FLOAT, [batch or "batch", NUM_CLASSES])],
+        initializer=[
+            numpy_helper.from_array(np.array([1], dtype=np.int64), "axes"),
+            numpy_helper.from_array(_class_weights(), "weights")
+        ]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 18)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+class FakeInterpreter:
+    """Interpreter stand-in with an int8-quantized input and output."""
+
+    INPUT_SCALE, INPUT_ZERO = 1 / 127, 0
+    OUTPUT_SCALE, OUTPUT_ZERO = 1 / 256, -128
+
+    def __init__(self, batched):
+        shape = [1, PATCH_WINDOW] if batched else [PATCH_WINDOW]
+        self.input = {"name": "waveform", "index": 0, "dtype": np.int8,
+                      "shape": np.array(shape), "shape_signature": np.array([-1, PATCH_WINDOW] if batched else shape),
+                      "quantization": (self.INPUT_SCALE, self.INPUT_ZERO)}
+        self.output = {"name": "Identity_scores", "index": 1, "dtype": np.int8,
+                       "quantization": (self.OUTPUT_SCALE, self.OUTPUT_ZERO)}
+        self.invocations = 0
+        self.tensors = {}
+
+    def allocate_tensors(self):
+        pass
+
+    def resize_tensor_input(self, index, shape):
+        self.input["shape"] = np.array(shape)
+
+    def get_input_details(self):
+        return [self.input]
+
+    def get_output_details(self):
+        return [self.output]
+
+    def set_tensor(self, index, value):
+        assert value.dtype == np.int8 and value.shape == tuple(self.input["shape"])
+        self.tensors[index] = value
+
+    def invoke(self):
+        self.invocations += 1
+        patches = self.tensors[0].reshape(-1, PATCH_WINDOW).astype(np.float32) * self.INPUT_SCALE
+        scores = np.abs(patches).mean(axis=1, keepdims=True) * _class_weights() / 2
+        self.tensors[1] = quantize(scores, np.int8, self.OUTPUT_SCALE, self.OUTPUT_ZERO)
+
+    def get_tensor(self, index):
+        return self.tensors[index]
+
+
+class FakeTFLiteBackend(TFLiteBackend):
+    """TFLite backend running on ``FakeInterpreter``."""
+
+    def __init__(self, batched, buckets=()):
+        super().__init__("fake.tflite", buckets=buckets)
+        self.batched = batched
+        self.made = []
+
+    def _make_interpreter(self):
+        self.made.append(FakeInterpreter(self.batched))
+        return self.made[-1]
+
+
+class FakeWaveformBackend(InferenceBackend):
+    """Whole-waveform model computing the reference scores; every new input length compiles."""
+
+    def __init__(self, buckets=()):
+        super().__init__("fake", buckets=buckets)
+        self.lengths = set()
+
+    def _run(self, waveform):
+        if len(waveform) not in self.lengths:
+            self.lengths.add(len(waveform))
+            self.compilations += 1
+        return _reference_scores(waveform), None
+
+    def predict(self, waveform):
+        return self._predict_waveform(waveform, self._run)
+
+
+class TestFraming(unittest.TestCase):
+    """Test cutting waveforms into YAMNet patches."""
+
+    def test_patch_counts(self):
+        """Test YAMNet's padding: at least one window, then whole hops."""
+        for samples, patches in ((1000, 1), (PATCH_WINDOW, 1), (PATCH_WINDOW + 1, 2), (48000, 6)):
+            self.assertEqual(frame_waveform(np.zeros(samples)).shape, (patches, PATCH_WINDOW), samples)
+
+    def test_patch_contents(self):
+        """Test that patches start every hop and the tail is zero-padded."""
+        waveform = np.arange(40000, dtype=np.float32)
+        patches = frame_waveform(waveform)
+        np.testing.assert_array_equal(patches[1], waveform[PATCH_HOP:PATCH_HOP + PATCH_WINDOW])
+        self.assertEqual(patches[-1][-1], 0)
+
+    def test_quantization_round_trip(self):
+        """Test int8 quantization within half a step, with clipping."""
+        x = np.array([-2.0, -0.5, 0.0, 0.25, 0.9], dtype=np.float32)
+        q = quantize(x, np.int8, 1 / 127, 0)
+        self.assertEqual(q.dtype, np.int8)
+        self.assertEqual(q[0], -128)
+        np.testing.assert_allclose(dequantize(q, 1 / 127, 0)[1:], x[1:], atol=0.5 / 127)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected."""
+        with self.assertRaises(ValueError):
+            create_backend("caffe", "model")
+
+
+class TestShapeBuckets(unittest.TestCase):
+    """Test padding inputs to a fixed set of shapes."""
+
+    BUCKETS = (1, 2, 4, 8)
+
+    def test_parse_buckets(self):
+        """Test that buckets are sorted, deduplicated and positive."""
+        self.assertEqual(parse_buckets("8, 1,4,4"), (1, 4, 8))
+        self.assertEqual(parse_buckets(""), ())
+        with self.assertRaises(ValueError):
+            parse_buckets("0,4")
+
+    def test_bucket_chunks(self):
+        """Test pieces of the largest bucket, then the smallest bucket holding the rest."""
+        self.assertEqual(bucket_chunks(3, self.BUCKETS), [(0, 3, 4)])
+        self.assertEqual(bucket_chunks(8, self.BUCKETS), [(0, 8, 8)])
+        self.assertEqual(bucket_chunks(19, self.BUCKETS), [(0, 8, 8), (8, 8, 8), (16, 3, 4)])
+
+    def test_waveform_buckets_keep_scores(self):
+        """Test that padded and split waveforms give the unpadded scores, with no shapes after warmup."""
+        backend = FakeWaveformBackend(self.BUCKETS)
+        backend.warmup()
+        self.assertEqual(backend.lengths, {bucket_span(bucket) for bucket in self.BUCKETS})
+        rng = np.random.default_rng(3)
+        for samples in (1000, PATCH_WINDOW + 1, 40000, 160000):
+            waveform = rng.uniform(-0.5, 0.5, samples).astype(np.float32)
+            with self.subTest(samples=samples):
+                np.testing.assert_allclose(backend.predict_scores(waveform), _reference_scores(waveform), rtol=1e-6)
+        stats = backend.shape_stats()
+        self.assertEqual((stats["compilations"], stats["retraces"]), (len(self.BUCKETS), 0))
+        self.assertGreater(stats["padded_patches"], 0)
+
+    def test_batch_split_across_buckets(self):
+        """Test that a batch of waveforms comes back whole when its patches span several buckets."""
+        backend = FakeWaveformBackend(self.BUCKETS)
+        waveforms = [np.full(samples, 0.1 * (i + 1), dtype=np.float32)
+                     for i, samples in enumerate((20000, 90000, 3000))]
+        for waveform, (scores, _) in zip(waveforms, backend.predict_batch(waveforms)):
+            np.testing.assert_allclose(scores, _reference_scores(waveform), rtol=1e-6)
+
+
+class TestTFLiteBackend(unittest.TestCase):
+    """Test int8 handling and batching of the TFLite backend."""
+
+    def _check(self, batched):
+        backend = FakeTFLiteBackend(batched)
+        backend.load()
+        waveform = np.random.default_rng(0).uniform(-0.5, 0.5, 40000).astype(np.float32)
+        scores = backend.predict_scores(waveform)
+        expected = _reference_scores(waveform) / 2
+        self.assertEqual(scores.dtype, np.float32)
+        self.assertEqual(scores.shape, (5, NUM_CLASSES))
+        np.testing.assert_allclose(scores, expected, atol=2 / 256)
+        return backend.interpreter.invocations
+
+    def test_one_patch_per_call(self):
+        """Test that fixed-shape models run once per patch."""
+        self.assertEqual(self._check(batched=False), 5)
+
+    def test_batched(self):
+        """Test that models with a dynamic batch dimension run once."""
+        self.assertEqual(self._check(batched=True), 1)
+
+    def test_interpreter_per_bucket(self):
+        """Test that each bucket keeps its interpreter, so alternating sizes don't reallocate."""
+        backend = FakeTFLiteBackend(batched=True, buckets=(1, 4, 8))
+        backend.load()
+        backend.warmup()
+        self.assertEqual(len(backend.made), 3)
+        for samples in (40000, 16000, 100000, 40000):
+            backend.predict_scores(np.zeros(samples, dtype=np.float32))
+        self.assertEqual(len(backend.made), 3)
+        self.assertEqual(backend.shape_stats()["retraces"], 0)
+        self.assertEqual(len(FakeTFLiteBackend(batched=False, buckets=(1, 4, 8)).shape_stats()["buckets"]), 0)
+
+    def test_concurrent_calls(self):
+        """Test that threads sharing the backend each get the scores of their own input."""
+        backend = FakeTFLiteBackend(batched=True)
+        backend.load()
+        invoke = backend.interpreter.invoke
+
+        def slow_invoke():
+            time.sleep(0.002)
+            invoke()
+
+        backend.interpreter.invoke = slow_invoke
+        rng = np.random.default_rng(1)
+        waveforms = [rng.uniform(-0.5, 0.5, n).astype(np.float32) for n in (16000, 40000, 64000, 100000) * 3]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(backend.predict_scores, waveforms))
+        for waveform, scores in zip(waveforms, results):
+            np.testing.assert_allclose(scores, _reference_scores(waveform) / 2, atol=2 / 256)
+
+
+@unittest.skipIf(onnx is None, "onnx and onnxruntime are not installed")
+class TestONNXBackend(unittest.TestCase):
+    """Test the ONNX Runtime backend on a tiny stand-in model."""
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.waveform = np.random.default_rng(1).normal(0, 0.1, 24000).astype(np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_batched_and_fixed_inputs(self):
+        """Test both a dynamic batch and a batch of one give YAMNet-shaped scores."""
+        for batch in (None, 1):
+            path = str(self.dir / f"model_{batch}.onnx")
+            _write_onnx_model(path, batch)
+            backend = ONNXBackend(path, num_threads=1)
+            backend.load()
+            scores, embeddings = backend.predict(self.waveform)
+            self.assertIsNone(embeddings)
+            self.assertEqual(scores.shape, (3, NUM_CLASSES))
+            np.testing.assert_allclose(scores, _reference_scores(self.waveform), rtol=1e-5)
+
+    def test_shape_buckets(self):
+        """Test that after warmup inputs of any length reuse the bucket shapes."""
+        path = str(self.dir / "model.onnx")
+        _write_onnx_model(path)
+        backend = ONNXBackend(path, num_threads=1, buckets=(1, 2, 4))
+        backend.load()
+        backend.warmup()
+        for samples in (1000, 24000, 50000, 90000):
+            waveform = self.waveform if samples == 24000 else np.resize(self.waveform, samples)
+            np.testing.assert_allclose(backend.predict_scores(waveform), _reference_scores(waveform), rtol=1e-5)
+        self.assertEqual(backend.shape_stats()["compilations"], 3)
+        self.assertEqual(backend.shape_stats()["retraces"], 0)
+
+    def test_registry_loads_bundled_model(self):
+        """Test that the registry picks the ONNX model out of a bundle."""
+        shutil.copyfile(LABELS_PATH, self.dir / LABELS_NAME)
+        (self.dir / "saved_model").mkdir()
+        (self.dir / "saved_model" / "saved_model.pb").write_bytes(b"graph")
+        write_manifest(str(self.dir), "saved_model")
+        export = self.dir.parent / f"{self.dir.name}_export.onnx"
+        _write_onnx_model(str(export))
+        try:
+            manifest = add_model(str(self.dir), str(export))
+        finally:
+            export.unlink()
+        self.assertEqual(manifest_models(manifest), {"saved_model": "saved_model", "onnx": "yamnet.onnx"})
+
+        registry = ModelRegistry(model_dir=str(self.dir), offline=True, backend="onnx", backend_model=None)
+        self.assertTrue(registry.load(), registry.error)
+        self.assertEqual(registry.state, READY)
+        self.assertEqual(registry.get_status()["backend_model"], str(self.dir / "yamnet.onnx"))
+        self.assertEqual(registry.get().predict_scores(self.waveform).shape, (3, NUM_CLASSES))
+
+
+def _bundled(model_format):
+    """Path of a model of the given format in the configured bundle, if any."""
+    try:
+        from ..model_bundle import read_manifest
+        path = manifest_models(read_manifest(settings.AI_MODEL_DIR)).get(model_format)
+    except Exception:
+        return None
+    return os.path.join(settings.AI_MODEL_DIR, path) if path else None
+
+
+class TestParity(unittest.TestCase):
+    """
+    Compare the TFLite and ONNX exports against the TF Hub model.
+
+    Runs when the configured bundle (``AI_MODEL_DIR``) has the SavedModel and
+    the export, and TensorFlow is installed.
+    """
+
+    def _compare(self, backend_name, model_format, atol):
+        reference_path, export_path = _bundled("saved_model"), _bundled(model_format)
+        if not reference_path or not export_path:
+            self.skipTest(f"no bundle with saved_model and {model_format} models in {settings.AI_MODEL_DIR}")
+        try:
+            reference = create_backend("tfhub", reference_path, saved_model=True)
+            reference.load()
+        except ImportError:
+            self.skipTest("TensorFlow is not installed")
+        backend = create_backend(backend_name, export_path)
+        backend.load()
+
+        rng = np.random.default_rng(2)
+        t = np.arange(3 * 16000) / 16000
+        signals = {
+            "silence": np.zeros(16000),
+            "tone": 0.3 * np.sin(2 * np.pi * 440 * t),
+            "noise": rng.normal(0, 0.2, 2 * 16000),
+            "chirp": 0.3 * np.sin(2 * np.pi * (200 + 1000 * t) * t)
+        }
+        for name, signal in signals.items():
+            with self.subTest(signal=name):
+                signal = signal.astype(np.float32)
+                expected = reference.predict_scores(signal)
+                scores = backend.predict_scores(signal)
+                self.assertEqual(scores.shape, expected.shape)
+                np.testing.assert_allclose(scores, expected, atol=atol)
+                self.assertEqual(np.argmax(scores.mean(axis=0)), np.argmax(expected.mean(axis=0)))
+
+    def test_tflite_parity(self):
+        """Test TFLite scores against the TF Hub model (loose for int8 exports)."""
+        self._compare("tflite", "tflite", atol=0.05)
+
+    def test_onnx_parity(self):
+        """Test ONNX Runtime scores against the TF Hub model."""
+        self._compare("onnx", "onnx", atol=1e-3)
+
+    def test_tfhub_shape_buckets(self):
+        """Test that the bucketed TF Hub model matches the unpadded one and stops tracing after warmup."""
+        reference_path = _bundled("saved_model")
+        if not reference_path:
+            self.skipTest(f"no bundle with a saved_model model in {settings.AI_MODEL_DIR}")
+        try:
+            reference = create_backend("tfhub", reference_path, saved_model=True)
+            reference.load()
+        except ImportError:
+            self.skipTest("TensorFlow is not installed")
+        backend = create_backend("tfhub", reference_path, saved_model=True, buckets=(1, 4, 16))
+        backend.load()
+        backend.warmup()
+        signal = np.random.default_rng(4).normal(0, 0.2, 5 * 16000).astype(np.float32)
+        for samples in (8000, 30000, len(signal)):
+            np.testing.assert_allclose(backend.predict_scores(signal[:samples]),
+                                       reference.predict_scores(signal[:samples]), atol=1e-4)
+        self.assertEqual(backend.shape_stats()["retraces"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
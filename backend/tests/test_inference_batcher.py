@@ -0,0 +1,146 @@
+"""
+Tests for the inference_batcher module and batched backend calls.
+"""
+
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from ..inference_backends import InferenceBackend, PatchBackend, frame_waveform, pack_waveforms
+from ..inference_batcher import InferenceBatcher
+
+LENGTHS = (1000, 15600, 15601, 20000, 48000)
+
+
+def _patch_features(patches: np.ndarray) -> np.ndarray:
+    """Stand-in scores that tell patches apart: mean, first and last sample."""
+    return np.stack([patches.mean(axis=1), patches[:, 0], patches[:, -1]], axis=1)
+
+
+class WaveformBackend(InferenceBackend):
+    """Whole-waveform model, like the TF Hub one."""
+
+    def __init__(self):
+        super().__init__("test")
+        self.calls = 0
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def predict(self, waveform):
+        with self.lock:
+            self.calls += 1
+        if self.fail:
+            raise RuntimeError("model exploded")
+        return _patch_features(frame_waveform(waveform)), None
+
+
+class PatchesBackend(PatchBackend):
+    """Patch-input model, like the TFLite and ONNX exports."""
+
+    def __init__(self):
+        super().__init__("test")
+        self.calls = 0
+
+    def predict_patches(self, patches):
+        self.calls += 1
+        return _patch_features(patches), patches[:, :2]
+
+
+def _waveforms():
+    rng = np.random.default_rng(0)
+    return [rng.normal(0, 1, n).astype(np.float32) for n in LENGTHS]
+
+
+class TestBatchedBackends(unittest.TestCase):
+    """Test that a batched call gives each waveform its own scores."""
+
+    def test_packing_layout(self):
+        """Test that packed waveforms start on patch boundaries without overlapping."""
+        packed, starts, counts = pack_waveforms([np.ones(1000), np.ones(20000)])
+        self.assertEqual(counts, [1, 2])
+        self.assertEqual(starts, [0, 3])
+        self.assertEqual(len(packed), 3 * 7680 + 7680 + 15600)
+
+    def test_waveform_backend(self):
+        """Test packing for whole-waveform models."""
+        backend, waveforms = WaveformBackend(), _waveforms()
+        results = backend.predict_batch(waveforms)
+        self.assertEqual(backend.calls, 1)
+        for waveform, (scores, _) in zip(waveforms, results):
+            np.testing.assert_allclose(scores, backend.predict(waveform)[0], rtol=1e-6)
+
+    def test_patch_backend(self):
+        """Test stacking for patch-input models, embeddings included."""
+        backend, waveforms = PatchesBackend(), _waveforms()
+        results = backend.predict_batch(waveforms)
+        self.assertEqual(backend.calls, 1)
+        for waveform, (scores, embeddings) in zip(waveforms, results):
+            expected_scores, expected_embeddings = backend.predict(waveform)
+            np.testing.assert_array_equal(scores, expected_scores)
+            np.testing.assert_array_equal(embeddings, expected_embeddings)
+
+
+class TestInferenceBatcher(unittest.TestCase):
+    """Test collecting concurrent requests into batches."""
+
+    def setUp(self):
+        self.backend = WaveformBackend()
+        self.registry = SimpleNamespace(model=self.backend)
+
+    def test_concurrent_requests_share_calls(self):
+        """Test that concurrent requests are batched up to the size limit."""
+        batcher = InferenceBatcher(self.registry, max_batch_size=4, max_wait_ms=50)
+        waveforms = _waveforms() + _waveforms()[:1]
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(w) for w in waveforms))
+
+        results = asyncio.run(run())
+        self.assertEqual(self.backend.calls, 2)
+        for waveform, result in zip(waveforms, results):
+            np.testing.assert_allclose(result.scores, _patch_features(frame_waveform(waveform)), rtol=1e-6)
+            self.assertGreaterEqual(result.queue_wait, 0)
+        stats = batcher.get_stats()
+        self.assertEqual((stats["requests"], stats["batches"], stats["largest_batch"]), (6, 2, 4))
+        self.assertEqual(stats["patches"], sum(len(frame_waveform(w)) for w in waveforms))
+        self.assertIsNotNone(stats["latency_ms"]["p95"])
+
+    def test_lone_request_waits_at_most_max_wait(self):
+        """Test that a single request isn't held back longer than the wait limit."""
+        batcher = InferenceBatcher(self.registry, max_batch_size=8, max_wait_ms=20)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await batcher.submit(np.zeros(16000))
+            return loop.time() - started
+
+        self.assertLess(asyncio.run(run()), 1.0)
+        self.assertGreaterEqual(batcher.get_stats()["queue_wait_ms"]["p50"], 15)
+
+    def test_errors_reach_every_request(self):
+        """Test that a failed batch fails each of its requests."""
+        self.backend.fail = True
+        batcher = InferenceBatcher(self.registry, max_batch_size=4, max_wait_ms=20)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(np.zeros(1000)) for _ in range(3)),
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(batcher.get_stats()["errors"], 3)
+
+    def test_survives_new_event_loop(self):
+        """Test that the batcher restarts its worker on a new loop."""
+        batcher = InferenceBatcher(self.registry, max_batch_size=2, max_wait_ms=0)
+        for _ in range(2):
+            asyncio.run(batcher.submit(np.zeros(1000)))
+        self.assertEqual(batcher.get_stats()["requests"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
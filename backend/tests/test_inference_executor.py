@@ -0,0 +1,69 @@
+"""
+Tests for the inference_executor module.
+"""
+
+import asyncio
+import threading
+import unittest
+
+from ..inference_executor import InferenceExecutor, OverloadedError, default_workers
+
+
+class TestInferenceExecutor(unittest.TestCase):
+    """Test admission control and the dedicated pool."""
+
+    def setUp(self):
+        self.executor = InferenceExecutor(workers=1, max_pending=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_admission_limit(self):
+        """Test that requests beyond the limit are refused until one is released."""
+        first = self.executor.admit()
+        with self.executor.admit():
+            with self.assertRaises(OverloadedError) as refused:
+                self.executor.admit()
+            self.assertGreaterEqual(refused.exception.retry_after, 1)
+        first.release()
+        first.release()
+        self.assertEqual(self.executor.pending, 0)
+        self.executor.admit().release()
+        stats = self.executor.get_stats()
+        self.assertEqual((stats["admitted"], stats["rejected"], stats["pending"]), (3, 1, 0))
+
+    def test_unlimited(self):
+        """Test that max_pending 0 admits everything."""
+        executor = InferenceExecutor(workers=1, max_pending=0)
+        admissions = [executor.admit() for _ in range(100)]
+        self.assertEqual(executor.pending, 100)
+        for admission in admissions:
+            admission.release()
+        executor.shutdown()
+
+    def test_runs_on_pool_thread(self):
+        """Test that jobs run on the executor's own threads, in turn when it has one."""
+        release = threading.Event()
+
+        async def run():
+            first = asyncio.ensure_future(self.executor.run_timed(lambda: release.wait(5) and threading.current_thread().name))
+            second = asyncio.ensure_future(self.executor.run_timed(threading.current_thread))
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.executor.get_stats()["busy_workers"], 1)
+            release.set()
+            return await first, await second
+
+        (name, first_wait), (_, second_wait) = asyncio.run(run())
+        self.assertTrue(name.startswith("inference"))
+        self.assertGreater(second_wait, first_wait)
+        self.assertGreaterEqual(second_wait, 0.04)
+
+    def test_default_workers(self):
+        """Test worker counts derived from the per-inference thread count."""
+        self.assertEqual(default_workers(0), 2)
+        self.assertGreaterEqual(default_workers(1), 1)
+        self.assertEqual(default_workers(10 ** 6), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
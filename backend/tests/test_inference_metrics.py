@@ -0,0 +1,77 @@
+"""
+Tests for the inference_metrics module.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+from .. import inference_metrics as metrics_module
+from ..inference_metrics import InferenceMetrics, StageHistogram, memory_rss, percentiles, prometheus_text
+
+
+class TestInferenceMetrics(unittest.TestCase):
+    """Test stage histograms, throughput and the Prometheus rendering."""
+
+    def test_histogram_buckets(self):
+        """Test that observations land in the first bucket whose bound holds them."""
+        histogram = StageHistogram((0.01, 0.1, 1.0))
+        for seconds in (0.005, 0.01, 0.05, 0.5, 3.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.cumulative(), [("0.01", 2), ("0.1", 3), ("1.0", 4), ("+Inf", 5)])
+        stats = histogram.get_stats()
+        self.assertEqual(stats["count"], 5)
+        self.assertAlmostEqual(stats["mean_ms"], 713.0)
+        self.assertEqual(stats["p50"], 50.0)
+
+    def test_record_and_rates(self):
+        """Test request counters, skipped stages and audio seconds per wall-clock second."""
+        metrics = InferenceMetrics()
+        clock = iter([100.0, 101.0, 102.0])
+        with mock.patch.object(metrics_module.time, "monotonic", lambda: next(clock)):
+            metrics.record({"read": 0.001, "decode": 0.02, "total": 0.1}, audio_seconds=4.0)
+            metrics.record({"read": 0.002, "total": 0.01})
+            metrics.record({"read": 0.001, "inference": 0.05, "total": 0.2, "unknown": 1.0}, audio_seconds=10.0)
+        stats = metrics.get_stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["audio_seconds"], 14.0)
+        self.assertEqual(stats["requests_per_second"], 1.0)
+        self.assertEqual(stats["audio_seconds_per_second"], 5.0)
+        self.assertEqual(stats["stages_ms"]["read"]["count"], 3)
+        self.assertEqual(stats["stages_ms"]["decode"]["count"], 1)
+        self.assertIsNone(stats["stages_ms"]["resample"]["p50"])
+
+    def test_prometheus_text(self):
+        """Test histogram, counter and gauge lines; unknown gauges are left out."""
+        metrics = InferenceMetrics(stages=("decode",))
+        metrics.record({"decode": 0.003}, audio_seconds=2.0)
+        text = prometheus_text(metrics, {"model_memory_bytes": ("Model memory", 1024), "missing": ("Unknown", None)})
+        lines = text.splitlines()
+        self.assertIn('soundtracker_ai_stage_seconds_bucket{stage="decode",le="0.0025"} 0', lines)
+        self.assertIn('soundtracker_ai_stage_seconds_bucket{stage="decode",le="0.005"} 1', lines)
+        self.assertIn('soundtracker_ai_stage_seconds_bucket{stage="decode",le="+Inf"} 1', lines)
+        self.assertIn('soundtracker_ai_stage_seconds_count{stage="decode"} 1', lines)
+        self.assertIn("# TYPE soundtracker_ai_requests_total counter", lines)
+        self.assertIn("soundtracker_ai_audio_seconds_total 2.0", lines)
+        self.assertIn("soundtracker_ai_model_memory_bytes 1024.0", lines)
+        self.assertNotIn("missing", text)
+        self.assertNotIn("requests_per_second", text)
+
+    def test_percentiles(self):
+        """Test percentiles of seconds in milliseconds, and None without values."""
+        self.assertEqual(percentiles([]), {"p50": None, "p95": None, "p99": None})
+        stats = percentiles([i / 1000 for i in range(1, 101)])
+        self.assertAlmostEqual(stats["p50"], 50.5)
+        self.assertAlmostEqual(stats["p99"], 99.01)
+
+    def test_memory_rss(self):
+        """Test that this process' resident memory is known."""
+        rss = memory_rss()
+        self.assertIsInstance(rss, int)
+        self.assertGreater(rss, 1 << 20)
+        self.assertIsNotNone(memory_rss(os.getpid()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests for the inference_pool module.
+"""
+
+import os
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from ..inference_backends import NUM_CLASSES, PatchBackend
+from ..inference_pool import EMBEDDING_SIZE, WorkerError, WorkerPoolBackend
+from .test_inference_backends import FakeTFLiteBackend, _reference_scores
+
+# First sample value that makes the stand-in model kill its process
+CRASH = 1234.5
+
+
+class EchoBackend(PatchBackend):
+    """Stand-in model: scores are the patch mean and the worker's pid."""
+
+    def __init__(self, delay=0.0, fail_load=False):
+        super().__init__("echo")
+        self.delay = delay
+        self.fail_load = fail_load
+
+    def load(self):
+        if self.fail_load:
+            raise OSError("no model file")
+
+    def predict_patches(self, patches):
+        if np.any(patches[:, 0] == CRASH):
+            os._exit(3)
+        time.sleep(self.delay)
+        scores = np.repeat(patches.mean(axis=1, keepdims=True), NUM_CLASSES, axis=1)
+        scores[:, 1] = os.getpid()
+        return scores, np.ascontiguousarray(patches[:, :EMBEDDING_SIZE])
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Test shared-memory transfer, parallelism and restarts."""
+
+    def _pool(self, processes=1, **kwargs):
+        pool = WorkerPoolBackend(EchoBackend(**kwargs), processes, health_interval=0, start_timeout=60)
+        pool.load()
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_results_match_in_process(self):
+        """Test that scores and embeddings come back intact, also past the initial segment size."""
+        pool = self._pool()
+        rng = np.random.default_rng(0)
+        for lengths in ((1000, 20000), (400000, 300000, 16000)):
+            waveforms = [rng.normal(0, 1, n).astype(np.float32) for n in lengths]
+            expected = EchoBackend().predict_batch(waveforms)
+            for (scores, embeddings), (expected_scores, expected_embeddings) in zip(pool.predict_batch(waveforms), expected):
+                np.testing.assert_allclose(scores[:, 0], expected_scores[:, 0], rtol=1e-6)
+                np.testing.assert_array_equal(embeddings, expected_embeddings)
+        self.assertNotEqual(pool.predict_scores(np.zeros(100))[0, 1], os.getpid())
+        self.assertEqual(pool.shape_stats()["retraces"], 0)
+
+    def test_workers_run_in_parallel(self):
+        """Test that concurrent batches go to different processes at the same time."""
+        pool = self._pool(processes=2, delay=0.5)
+        pids = []
+
+        def classify():
+            pids.append(pool.predict_scores(np.zeros(1000))[0, 1])
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=classify) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(len(set(pids)), 2)
+
+    def test_crash_restarts_worker(self):
+        """Test that a worker dying on a batch is replaced and the error reported."""
+        pool = self._pool()
+        poison = np.zeros(1000, dtype=np.float32)
+        poison[0] = CRASH
+        with self.assertRaises(WorkerError):
+            pool.predict_scores(poison)
+        self.assertEqual(pool.get_stats()["restarts"], 2)
+        self.assertEqual(pool.predict_scores(np.ones(1000)).shape, (1, NUM_CLASSES))
+
+    def test_health_check_replaces_dead_worker(self):
+        """Test that the health check restarts a worker killed from outside."""
+        pool = self._pool()
+        first_pid = pool.get_stats()["workers"][0]["pid"]
+        os.kill(first_pid, 9)
+        time.sleep(0.2)
+        pool.check_health()
+        worker = pool.get_stats()["workers"][0]
+        self.assertTrue(worker["alive"])
+        self.assertNotEqual(worker["pid"], first_pid)
+        self.assertEqual(worker["restarts"], 1)
+        self.assertIn("exited", worker["last_error"])
+
+    def test_tflite_backend(self):
+        """Test that a TFLite backend, lock and all, can be sent to a worker."""
+        pool = WorkerPoolBackend(FakeTFLiteBackend(batched=True, buckets=(1, 4)), 1, health_interval=0, start_timeout=60)
+        pool.load()
+        self.addCleanup(pool.close)
+        waveform = np.random.default_rng(0).uniform(-0.5, 0.5, 40000).astype(np.float32)
+        np.testing.assert_allclose(pool.predict_scores(waveform), _reference_scores(waveform) / 2, atol=2 / 256)
+
+    def test_load_failure(self):
+        """Test that a model that can't load fails the pool and leaves no processes."""
+        pool = WorkerPoolBackend(EchoBackend(fail_load=True), 2, health_interval=0, start_timeout=60)
+        with self.assertRaisesRegex(WorkerError, "no model file"):
+            pool.load()
+        self.assertFalse(any(worker["alive"] for worker in pool.get_stats()["workers"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for the level_stream module.
+"""
+
+import asyncio
+import json
+import unittest
+
+import numpy as np
+
+from ..audio_buffer import LevelHistory
+from ..broadcast import BroadcastHub
+from ..level_stream import FLAG_BACKFILL, LevelStream, aggregate_levels, pack_levels, unpack_levels
+from .test_broadcast import FakeWebSocket
+
+
+class TestAggregateLevels(unittest.TestCase):
+    """Test frame aggregation."""
+    
+    def test_aggregate(self):
+        """Test the statistics of an aggregated frame."""
+        frame = aggregate_levels(
+            np.array([1.0, 2.0, 3.0]),
+            np.array([0.1, 0.2, 0.2], dtype=np.float32),
+            np.array([0.3, 0.5, 0.4], dtype=np.float32)
+        )
+        self.assertEqual(frame["blocks"], 3)
+        self.assertAlmostEqual(frame["rms"], np.sqrt((0.01 + 0.04 + 0.04) / 3), places=6)
+        self.assertAlmostEqual(frame["rms_min"], 0.1, places=6)
+        self.assertAlmostEqual(frame["db_max"], 20 * np.log10(0.2), places=4)
+        self.assertAlmostEqual(frame["peak"], 0.5, places=6)
+        self.assertEqual(frame["t"], 3.0)
+    
+    def test_binary_round_trip(self):
+        """Test packing and unpacking a binary frame."""
+        timestamps = np.array([10.0, 10.5, 11.0])
+        rms = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        peak = np.array([0.4, 0.5, 0.6], dtype=np.float32)
+        data = pack_levels(42, timestamps, rms, peak, rate=5.0, sample_rate=44100)
+        self.assertEqual(len(data), 32 + 3 * 16)
+        frame = unpack_levels(data)
+        self.assertEqual(frame["first_index"], 42)
+        self.assertEqual(frame["sample_rate"], 44100)
+        np.testing.assert_array_equal(frame["timestamps"], timestamps)
+        np.testing.assert_array_equal(frame["peak"], peak)
+
+
+class TestLevelStream(unittest.TestCase):
+    """Test rate tiers."""
+    
+    def test_tier_shared_between_subscribers(self):
+        """Test that subscribers of a rate share one frame per tick."""
+        history = LevelHistory(capacity=100)
+        
+        async def scenario():
+            hub = BroadcastHub()
+            hub.attach(asyncio.get_running_loop())
+            stream = LevelStream(hub, lambda: history, rates=[5, 50])
+            sockets = [FakeWebSocket() for _ in range(3)]
+            subscribers = [hub.add(ws) for ws in sockets]
+            tiers = {stream.subscribe(sub, 40).rate for sub in subscribers}
+            for i in range(4):
+                history.append(float(i), 0.1, 0.2)
+            await asyncio.sleep(0.05)
+            stream.unsubscribe(subscribers[0])
+            for sub in subscribers[1:]:
+                stream.unsubscribe(sub)
+            return tiers, sockets, stream
+        
+        tiers, sockets, stream = asyncio.run(scenario())
+        self.assertEqual(tiers, {50.0})
+        frames = [json.loads(f) for f in sockets[0].frames]
+        self.assertEqual(sum(f["blocks"] for f in frames), 4)
+        self.assertEqual(sockets[0].frames, sockets[1].frames)
+        self.assertEqual(stream.get_stats(), {})
+    
+    def test_binary_and_json_subscribers(self):
+        """Test that one tier serves both formats from the same blocks."""
+        history = LevelHistory(capacity=100)
+        
+        async def scenario():
+            hub = BroadcastHub()
+            hub.attach(asyncio.get_running_loop())
+            stream = LevelStream(hub, lambda: history, rates=[50])
+            text_ws, binary_ws = FakeWebSocket(), FakeWebSocket()
+            stream.subscribe(hub.add(text_ws), 50)
+            stream.subscribe(hub.add(binary_ws), 50, binary=True)
+            for i in range(3):
+                history.append(float(i), 0.1, 0.2)
+            await asyncio.sleep(0.05)
+            return text_ws, binary_ws
+        
+        text_ws, binary_ws = asyncio.run(scenario())
+        self.assertIsInstance(text_ws.frames[0], str)
+        frames = [unpack_levels(f) for f in binary_ws.frames]
+        self.assertEqual(sum(len(f["rms"]) for f in frames), 3)
+        self.assertEqual(frames[0]["first_index"], 0)
+    
+    def test_backfill_continues_sequence(self):
+        """Test that a backfill plus the following frames cover each block once."""
+        history = LevelHistory(capacity=8)
+        
+        async def scenario():
+            hub = BroadcastHub()
+            hub.attach(asyncio.get_running_loop())
+            stream = LevelStream(hub, lambda: history, rates=[50])
+            ws = FakeWebSocket()
+            for i in range(12):
+                history.append(float(i), 0.1, 0.2)
+            sub = hub.add(ws)
+            tier = stream.subscribe(sub, 50)
+            backfill = stream.backfill(tier, resume_from=1)
+            binary = unpack_levels(stream.backfill(tier, resume_from=1, binary=True))
+            ahead = stream.backfill(tier, resume_from=50)
+            for i in range(12, 15):
+                history.append(float(i), 0.1, 0.2)
+            await asyncio.sleep(0.05)
+            return backfill, binary, ahead, ws
+        
+        backfill, binary, ahead, ws = asyncio.run(scenario())
+        # Blocks 2 and 3 were already overwritten
+        self.assertEqual(backfill["first_seq"], 4)
+        self.assertEqual(backfill["missed"], 2)
+        self.assertEqual(backfill["seq"], 11)
+        self.assertEqual(backfill["timestamps"], [float(i) for i in range(4, 12)])
+        self.assertEqual(binary["flags"], FLAG_BACKFILL)
+        self.assertEqual(binary["first_index"], 4)
+        self.assertEqual(len(binary["rms"]), 8)
+        self.assertTrue(ahead["reset"])
+        self.assertEqual(ahead["timestamps"], [])
+        frames = [json.loads(f) for f in ws.frames]
+        self.assertEqual(frames[0]["start"], 12.0)
+        self.assertEqual(frames[-1]["seq"], 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
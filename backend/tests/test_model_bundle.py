@@ -0,0 +1,61 @@
+"""
+Tests for the model_bundle module.
+"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from ..model_bundle import LABELS_NAME, BundleError, verify_bundle, write_manifest
+from ..model_registry import FAILED, ModelRegistry
+
+
+class TestModelBundle(unittest.TestCase):
+    """Test bundle manifests and verification."""
+
+    def setUp(self):
+        """Create a bundle with a stand-in model."""
+        self.dir = Path(tempfile.mkdtemp())
+        (self.dir / "saved_model" / "variables").mkdir(parents=True)
+        (self.dir / "saved_model" / "saved_model.pb").write_bytes(b"graph")
+        (self.dir / "saved_model" / "variables" / "variables.index").write_bytes(b"index")
+        (self.dir / LABELS_NAME).write_text("index,mid,display_name\n0,/m/09x0r,Speech\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_manifest_round_trip(self):
+        """Test that a freshly written manifest verifies."""
+        written = write_manifest(str(self.dir), "saved_model", source="test")
+        self.assertEqual(
+            sorted(written["files"]),
+            ["saved_model/saved_model.pb", "saved_model/variables/variables.index", LABELS_NAME]
+        )
+        self.assertEqual(verify_bundle(str(self.dir))["source"], "test")
+
+    def test_tampered_file(self):
+        """Test that a modified file fails verification."""
+        write_manifest(str(self.dir), "saved_model")
+        (self.dir / "saved_model" / "saved_model.pb").write_bytes(b"other graph")
+        with self.assertRaisesRegex(BundleError, "Checksum mismatch"):
+            verify_bundle(str(self.dir))
+
+    def test_missing_file(self):
+        """Test that a missing file fails verification."""
+        write_manifest(str(self.dir), "saved_model")
+        (self.dir / "saved_model" / "variables" / "variables.index").unlink()
+        with self.assertRaisesRegex(BundleError, "missing"):
+            verify_bundle(str(self.dir))
+
+    def test_offline_without_bundle(self):
+        """Test that offline mode fails fast instead of going to the network."""
+        registry = ModelRegistry(model_url="https://example.invalid/model",
+                                 model_dir=str(self.dir / "absent"), offline=True)
+        self.assertFalse(registry.load())
+        self.assertEqual(registry.state, FAILED)
+        self.assertIn("model_bundle.py fetch", registry.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
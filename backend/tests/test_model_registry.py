@@ -0,0 +1,152 @@
+"""
+Tests for the model_registry module.
+"""
+
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from .. import model_registry
+from ..model_registry import FAILED, IDLE, READY, ModelNotReadyError, ModelRegistry, model_version
+
+
+class CountingRegistry(ModelRegistry):
+    """Registry whose load only counts calls instead of loading TensorFlow."""
+
+    def __init__(self, fail=False, retry_seconds=30.0):
+        super().__init__(model_url="test-model", labels_path="unused.csv", retry_seconds=retry_seconds)
+        self.loads = 0
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def _load(self):
+        self.loads += 1
+        self.release.wait(5)
+        if self.fail:
+            raise OSError("no model here")
+        self.model = object()
+        self.labels = ["Speech", "Music"]
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Test lazy, single loading."""
+
+    def test_nothing_loaded_until_used(self):
+        """Test that creating a registry loads nothing."""
+        registry = CountingRegistry()
+        self.assertEqual(registry.state, IDLE)
+        self.assertEqual(registry.loads, 0)
+        model = registry.get()
+        self.assertIs(registry.get(), model)
+        self.assertEqual(registry.loads, 1)
+        self.assertEqual(registry.get_status()["classes"], 2)
+
+    def test_concurrent_callers_share_one_load(self):
+        """Test that warmup and requests in flight don't load twice."""
+        registry = CountingRegistry()
+        registry.release.clear()
+        registry.start_warmup()
+        with self.assertRaises(ModelNotReadyError):
+            registry.get(wait=False)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        registry.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertTrue(registry.wait_ready(5))
+        self.assertEqual(registry.state, READY)
+        self.assertEqual(registry.loads, 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    def test_failed_load(self):
+        """Test that a failed load is reported and not retried on every request."""
+        registry = CountingRegistry(fail=True)
+        self.assertFalse(registry.load())
+        with self.assertRaises(ModelNotReadyError):
+            registry.get()
+        self.assertEqual(registry.state, FAILED)
+        self.assertEqual(registry.error, "no model here")
+        self.assertEqual(registry.loads, 1)
+
+    def test_retry_after_backoff(self):
+        """Test that a failed load is retried once due, with a doubling backoff."""
+        clock = [100.0]
+        registry = CountingRegistry(fail=True, retry_seconds=10.0)
+        with mock.patch.object(model_registry.time, "monotonic", lambda: clock[0]):
+            self.assertFalse(registry.load())
+            self.assertEqual(registry.retry_in(), 10.0)
+            clock[0] += 9.0
+            registry.start_warmup()
+            self.assertFalse(registry.load())
+            self.assertEqual(registry.loads, 1)
+            clock[0] += 1.0
+            with self.assertRaises(ModelNotReadyError):
+                registry.get()
+            self.assertEqual(registry.loads, 2)
+            self.assertEqual(registry.get_status()["retry_in"], 20.0)
+            self.assertEqual(registry.get_status()["failures"], 2)
+
+            # Warmup retries in the background once the backoff has passed
+            clock[0] += 20.0
+            registry.fail = False
+            registry.start_warmup()
+            self.assertTrue(registry.wait_ready(5))
+        self.assertEqual(registry.loads, 3)
+        self.assertEqual((registry.failures, registry.retry_in()), (0, None))
+
+    def test_no_retry(self):
+        """Test that retry_seconds 0 keeps a failed load failed."""
+        registry = CountingRegistry(fail=True, retry_seconds=0)
+        self.assertFalse(registry.load())
+        registry.start_warmup()
+        self.assertFalse(registry.load())
+        self.assertIsNone(registry.retry_in())
+        self.assertEqual(registry.loads, 1)
+
+
+    def test_failed_warmup_closes_workers(self):
+        """Test that worker processes are stopped when the loaded model turns out unusable."""
+        backend = mock.Mock(model_path="model.onnx")
+        registry = ModelRegistry(model_url="test-model", labels_path="unused.csv", worker_processes=2)
+        registry._resolve = lambda: (backend, ["Speech", "Music"])
+        with mock.patch.object(model_registry, "WorkerPoolBackend") as pool_class:
+            pool = pool_class.return_value
+            pool.warmup.return_value = np.zeros((1, 3), dtype=np.float32)
+            self.assertFalse(registry.load())
+        self.assertIn("3 classes", registry.error)
+        pool.load.assert_called_once()
+        pool.close.assert_called_once()
+        self.assertIsNone(registry.model)
+
+
+class TestModelVersion(unittest.TestCase):
+    """Test model fingerprints used to key cached predictions."""
+
+    def test_changes_with_contents(self):
+        """Test that files and directories are fingerprinted by content, handles by name."""
+        with tempfile.TemporaryDirectory() as tmp:
+            model = Path(tmp) / "yamnet.onnx"
+            model.write_bytes(b"weights v1")
+            saved_model = Path(tmp) / "saved_model"
+            (saved_model / "variables").mkdir(parents=True)
+            (saved_model / "variables" / "data").write_bytes(b"weights v1")
+            before = model_version("onnx", str(model)), model_version("tfhub", str(saved_model))
+            self.assertEqual(model_version("onnx", str(model)), before[0])
+            self.assertNotEqual(model_version("tflite", str(model)), before[0])
+            model.write_bytes(b"weights v2")
+            (saved_model / "variables" / "data").write_bytes(b"weights v2")
+            self.assertNotEqual(model_version("onnx", str(model)), before[0])
+            self.assertNotEqual(model_version("tfhub", str(saved_model)), before[1])
+        self.assertNotEqual(model_version("tfhub", "https://tfhub.dev/google/yamnet/1"),
+                            model_version("tfhub", "https://tfhub.dev/google/yamnet/2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for the prediction_cache module.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..prediction_cache import PredictionCache, content_key
+
+
+def scores(patches=2, value=0.5):
+    return np.full((patches, 521), value, dtype=np.float32)
+
+
+class TestPredictionCache(unittest.TestCase):
+    """Test the memory LRU and the SQLite tier."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.db_path = os.path.join(self.dir.name, "cache.db")
+
+    def _cache(self, **kwargs):
+        cache = PredictionCache(**kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_keys(self):
+        """Test that keys depend on the bytes and the model version only."""
+        self.assertEqual(content_key(b"clip", "v1"), content_key(bytearray(b"clip"), "v1"))
+        self.assertNotEqual(content_key(b"clip", "v1"), content_key(b"clip", "v2"))
+        self.assertNotEqual(content_key(b"clip", "v1"), content_key(b"clip2", "v1"))
+
+    def test_lru_by_count(self):
+        """Test that the least recently used entry goes first."""
+        cache = self._cache(max_entries=2)
+        cache.put("a", scores(value=1))
+        cache.put("b", scores(value=2))
+        self.assertEqual(cache.get("a")[0, 0], 1)
+        cache.put("c", scores(value=3))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["entries"]), (2, 1, 1, 2))
+
+    def test_lru_by_bytes(self):
+        """Test the byte bound, and that oversized matrices are not kept at all."""
+        one = scores().nbytes
+        cache = self._cache(max_entries=100, max_bytes=2 * one)
+        for key in "abc":
+            cache.put(key, scores())
+        self.assertEqual(cache.get_stats()["bytes"], 2 * one)
+        self.assertIsNone(cache.get("a"))
+        cache.put("big", scores(patches=10))
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get_stats()["entries"], 2)
+
+    def test_cached_scores_are_read_only(self):
+        cache = self._cache()
+        original = scores()
+        cache.put("a", original)
+        original[0, 0] = 9
+        self.assertEqual(cache.get("a")[0, 0], 0.5)
+        with self.assertRaises(ValueError):
+            cache.get("a")[0, 0] = 1
+
+    def test_database_survives_restart(self):
+        """Test that a new cache finds earlier entries in SQLite and promotes them to memory."""
+        cache = self._cache(db_path=self.db_path)
+        cache.put("a", scores(patches=3, value=0.25))
+        cache.close()
+        restarted = self._cache(db_path=self.db_path)
+        np.testing.assert_array_equal(restarted.get("a"), scores(patches=3, value=0.25))
+        restarted.get("a")
+        stats = restarted.get_stats()
+        self.assertEqual((stats["db_hits"], stats["hits"], stats["entries"]), (1, 1, 1))
+
+    def test_database_only(self):
+        """Test the persistent tier without a memory tier, bounded by rows."""
+        cache = self._cache(max_entries=0, db_path=self.db_path, db_max_entries=2)
+        self.assertTrue(cache.enabled)
+        for key in "abc":
+            cache.put(key, scores())
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.get_stats()["db_evictions"], 1)
+        self.assertEqual(cache.get_stats()["entries"], 0)
+
+    def test_database_errors_are_not_fatal(self):
+        """Test that an unusable database file degrades to memory-only caching."""
+        cache = self._cache(db_path=os.path.join(self.dir.name, "missing", "cache.db"))
+        cache.put("a", scores())
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertGreaterEqual(cache.get_stats()["db_errors"], 2)
+
+    def test_disabled(self):
+        self.assertFalse(PredictionCache(max_entries=0).enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+"""
+Tests for the realtime_classifier module.
+"""
+
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine
+
+from ..audio_buffer import AudioRingBuffer
+from ..audio_decode import StreamResampler
+from ..inference_backends import PATCH_HOP, PATCH_WINDOW
+from ..inference_batcher import BatchResult
+from ..model_registry import load_labels
+from .. import realtime_classifier as realtime_module
+from ..realtime_classifier import PATCH_FRAMES, RealtimeClassifier, SlidingWindows, yamnet_log_mel
+from ..sound_types import SoundType, SoundTypeIndex
+
+CLASS_MAP = os.path.join(os.path.dirname(os.path.dirname(__file__)), "yamnet_class_map.csv")
+
+
+class FakeCapture:
+    """Capture stand-in: a ring buffer written by the test, blocks captured at a fixed time."""
+
+    def __init__(self, sample_rate=16000, seconds=10.0, captured_at=1000.0):
+        self.sample_rate = sample_rate
+        self.block_size = 1024
+        self.buffer = AudioRingBuffer(int(seconds * sample_rate))
+        self.captured_at = captured_at
+
+    def write(self, samples):
+        self.buffer.write(np.asarray(samples, dtype=np.float32).reshape(-1, 1))
+
+    def read_since(self, seq):
+        return self.buffer.read_since(seq)
+
+    def capture_time(self, seq):
+        return self.captured_at + seq / self.sample_rate
+
+
+class FakeBatcher:
+    """Scores every window as speech."""
+
+    def __init__(self, labels):
+        self.scores = np.zeros((1, len(labels)), dtype=np.float32)
+        self.scores[0, labels.index("Speech")] = 0.9
+        self.submitted = []
+
+    async def submit(self, waveform):
+        self.submitted.append(waveform)
+        return BatchResult(self.scores, None, 0.0)
+
+
+class FakeHub:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message, channel=None):
+        self.messages.append((message, channel))
+
+
+class TestSlidingWindows(unittest.TestCase):
+    """Test windowing and log-mel frames of chunked live audio."""
+
+    def test_windows_match_whole_signal(self):
+        """Test that chunked windows equal the windows of the whole resampled signal."""
+        rng = np.random.default_rng(0)
+        audio = (0.1 * rng.standard_normal(int(3.3 * 44100))).astype(np.float32)
+        windows = SlidingWindows(44100)
+        chunks = np.split(audio, np.sort(rng.choice(len(audio), 40, replace=False)))
+        found = [w for chunk in chunks for w in windows.push(chunk)]
+
+        resampler = StreamResampler(44100)
+        whole = np.concatenate([resampler.process(chunk) for chunk in chunks])
+        frames = yamnet_log_mel().compute(whole)
+        self.assertEqual([w.start for w in found], [i * PATCH_HOP for i in range(len(found))])
+        self.assertEqual(len(found), 1 + (len(whole) - PATCH_WINDOW) // PATCH_HOP)
+        for window in found:
+            np.testing.assert_allclose(window.waveform, whole[window.start:window.start + PATCH_WINDOW], atol=1e-6)
+            first = window.start // 160
+            self.assertEqual(window.log_mel.shape, (PATCH_FRAMES, 64))
+            np.testing.assert_allclose(window.log_mel, frames[first:first + PATCH_FRAMES], atol=1e-4)
+
+    def test_keeps_only_what_next_window_needs(self):
+        """Test that memory stays bounded while audio keeps coming."""
+        windows = SlidingWindows(16000)
+        for _ in range(50):
+            windows.push(np.zeros(4000, dtype=np.float32))
+        self.assertLess(len(windows._samples), PATCH_WINDOW)
+        self.assertLess(len(windows._frames), PATCH_FRAMES)
+
+
+class TestRealtimeClassifier(unittest.TestCase):
+    """Test classification, silence gating and sound events from a fake capture."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.labels = load_labels(CLASS_MAP)
+
+    def setUp(self):
+        self.capture = FakeCapture()
+        self.hub = FakeHub()
+        self.batcher = FakeBatcher(self.labels)
+        self.model = SimpleNamespace(initialized=True, class_labels=self.labels,
+                                     sound_types=SoundTypeIndex(self.labels))
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        realtime_module.SoundEvent.metadata.create_all(self.engine)
+
+    def _classifier(self, **kwargs):
+        kwargs.setdefault("session_factory", lambda: Session(self.engine))
+        return RealtimeClassifier(self.hub, lambda: self.capture, self.batcher, self.model, **kwargs)
+
+    def _messages(self, kind):
+        return [m for m, _ in self.hub.messages if m["type"] == kind]
+
+    def test_silence_then_sound(self):
+        """Test that silent windows skip the model and segments become events."""
+        classifier = self._classifier()
+        noise = 0.1 * np.random.default_rng(1).standard_normal(32000)
+
+        async def run():
+            await classifier.poll()
+            self.capture.write(np.zeros(16000))
+            self.capture.write(noise)
+            count = await classifier.poll()
+            await classifier._close_segment()
+            return count
+
+        self.assertEqual(asyncio.run(run()), 5)
+        windows = self._messages("classification")
+        self.assertEqual([w["silent"] for w in windows], [True, False, False, False, False])
+        self.assertEqual(windows[0]["predictions"][0]["class_name"], "Silence")
+        self.assertEqual(windows[1]["sound_type"], "speech")
+        self.assertEqual(len(self.batcher.submitted), 4)
+        self.assertEqual(classifier.windows_silent, 1)
+        self.assertAlmostEqual(windows[0]["end"], 1000.0 + (PATCH_WINDOW - 1) / 16000, places=3)
+
+        events = self._messages("sound_event")
+        self.assertEqual([e["sound_type"] for e in events], ["silence", "speech"])
+        self.assertEqual(events[1]["start"], round(1000.0 + PATCH_HOP / 16000, 3))
+        with Session(self.engine) as session:
+            stored = session.get(realtime_module.SoundEvent, events[1]["event_id"])
+            self.assertEqual(stored.sound_type, SoundType.SPEECH)
+            self.assertEqual(stored.event_metadata["source"], "realtime")
+        self.assertEqual(classifier.get_stats()["events"], 2)
+
+    def test_gap_restarts_windows(self):
+        """Test that audio lost to the ring buffer splits segments instead of bridging them."""
+        classifier = self._classifier(session_factory=None)
+        noise = 0.1 * np.random.default_rng(2).standard_normal(16000 * 13)
+
+        async def run():
+            await classifier.poll()
+            self.capture.write(noise[:16000 * 2])
+            await classifier.poll()
+            self.capture.write(noise[16000 * 2:])
+            await classifier.poll()
+
+        asyncio.run(run())
+        self.assertEqual(classifier.gaps, 1)
+        events = self._messages("sound_event")
+        self.assertEqual(len(events), 1)
+        self.assertIsNone(events[0]["event_id"])
+
+    def test_waits_for_model(self):
+        """Test that nothing is read before the model is ready."""
+        self.model.initialized = False
+        self.model.registry = SimpleNamespace(start_warmup=lambda: setattr(self, "warmup", True))
+        self.capture.write(np.ones(PATCH_WINDOW))
+        self.assertEqual(asyncio.run(self._classifier().poll()), 0)
+        self.assertTrue(self.warmup)
+
+
+if __name__ == '__main__':
+    unittest.main()
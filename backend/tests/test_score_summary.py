@@ -0,0 +1,136 @@
+"""
+Tests for the score_summary module.
+"""
+
+import unittest
+
+import numpy as np
+
+from ..score_summary import (
+    PATCH_HOP_SECONDS,
+    PATCH_SECONDS,
+    StreamSummary,
+    describe_timeline,
+    describe_top_k,
+    pool_scores,
+    timeline,
+    top_k
+)
+
+
+def reference_timeline(scores, min_confidence=0.0):
+    """Patch-by-patch version of ``timeline`` to compare against."""
+    segments = []
+    for i, row in enumerate(scores):
+        label, confidence = int(np.argmax(row)), float(np.max(row))
+        if confidence < min_confidence:
+            label = -1
+        if segments and segments[-1][0] == label and segments[-1][2] == i:
+            segments[-1][2] = i + 1
+            segments[-1][3].append(confidence)
+        else:
+            segments.append([label, i, i + 1, [confidence]])
+    return [(label, start, end, np.mean(c)) for label, start, end, c in segments if label >= 0]
+
+
+class TestTopK(unittest.TestCase):
+    """Test pooled top-k classes."""
+
+    def test_matches_full_sort(self):
+        """Test that argpartition gives the same classes and order as sorting everything."""
+        scores = np.random.default_rng(0).random((12, 521), dtype=np.float32)
+        for pooling in ("mean", "max"):
+            with self.subTest(pooling=pooling):
+                pooled = pool_scores(scores, pooling)
+                ids, values = top_k(scores, 5, pooling)
+                np.testing.assert_array_equal(ids, np.argsort(pooled)[::-1][:5])
+                np.testing.assert_allclose(values, pooled[ids])
+
+    def test_pooling_differs(self):
+        """Test that max pooling favours a short loud event and mean pooling a steady one."""
+        scores = np.zeros((10, 4), dtype=np.float32)
+        scores[:, 0] = 0.4
+        scores[3, 1] = 0.9
+        self.assertEqual(top_k(scores, 1, "mean")[0][0], 0)
+        self.assertEqual(top_k(scores, 1, "max")[0][0], 1)
+
+    def test_k_is_clamped(self):
+        scores = np.ones((2, 3))
+        self.assertEqual(len(top_k(scores, 10)[0]), 3)
+        self.assertEqual(len(top_k(scores, 0)[0]), 0)
+        with self.assertRaises(ValueError):
+            pool_scores(scores, "median")
+
+
+class TestTimeline(unittest.TestCase):
+    """Test merging patches into segments."""
+
+    def test_segments(self):
+        """Test merging, segment times and the confidence threshold."""
+        scores = np.zeros((6, 3), dtype=np.float32)
+        scores[[0, 1], 0] = [0.8, 0.6]
+        scores[2, 2] = 0.1
+        scores[[3, 4, 5], 1] = 0.7
+        ids, starts, ends, confidence = timeline(scores, min_confidence=0.2)
+        np.testing.assert_array_equal(ids, [0, 1])
+        np.testing.assert_allclose(starts, [0, 3 * PATCH_HOP_SECONDS])
+        np.testing.assert_allclose(ends, [PATCH_HOP_SECONDS + PATCH_SECONDS, 5 * PATCH_HOP_SECONDS + PATCH_SECONDS])
+        np.testing.assert_allclose(confidence, [0.7, 0.7])
+
+    def test_matches_loop(self):
+        """Test against the patch-by-patch reference on noisy scores."""
+        rng = np.random.default_rng(1)
+        # Few classes so that neighbouring patches often share a winner
+        scores = rng.random((500, 4), dtype=np.float32)
+        for threshold in (0.0, 0.8):
+            with self.subTest(min_confidence=threshold):
+                ids, starts, ends, confidence = timeline(scores, threshold)
+                expected = reference_timeline(scores, threshold)
+                self.assertEqual(len(ids), len(expected))
+                np.testing.assert_array_equal(ids, [e[0] for e in expected])
+                np.testing.assert_allclose(starts, [e[1] * PATCH_HOP_SECONDS for e in expected])
+                np.testing.assert_allclose(confidence, [e[3] for e in expected], rtol=1e-5)
+
+    def test_described(self):
+        """Test the labelled form used in API responses, also for an empty clip."""
+        scores = np.array([[0.1, 0.9], [0.2, 0.8]], dtype=np.float32)
+        segments = describe_timeline(scores, ["Speech", "Dog"])
+        self.assertEqual(segments, [{"class_name": "Dog", "class_id": 1, "start": 0.0, "end": 1.455,
+                                     "confidence": segments[0]["confidence"]}])
+        self.assertAlmostEqual(segments[0]["confidence"], 0.85, places=5)
+        self.assertEqual(describe_timeline(np.zeros((0, 2)), ["Speech", "Dog"]), [])
+
+
+class TestStreamSummary(unittest.TestCase):
+    """Test summaries built from scores that arrive in pieces."""
+
+    def test_matches_whole_clip(self):
+        """Test that any split of the scores gives the timeline and top-k of the whole clip."""
+        rng = np.random.default_rng(2)
+        scores = rng.random((300, 4), dtype=np.float32)
+        labels = ["a", "b", "c", "d"]
+        for splits in ([150], [1, 2, 3, 100, 101], list(range(10, 300, 10))):
+            for threshold in (0.0, 0.8):
+                with self.subTest(splits=len(splits), min_confidence=threshold):
+                    summary = StreamSummary(labels, threshold)
+                    segments = []
+                    for piece in np.split(scores, splits):
+                        segments += summary.add(piece)
+                    segments += summary.finish()
+                    expected = describe_timeline(scores, labels, threshold)
+                    self.assertEqual([(s["class_id"], s["start"], s["end"]) for s in segments],
+                                     [(s["class_id"], s["start"], s["end"]) for s in expected])
+                    np.testing.assert_allclose([s["confidence"] for s in segments],
+                                               [s["confidence"] for s in expected], rtol=1e-5)
+                    for pooling in ("mean", "max"):
+                        self.assertEqual([p["class_id"] for p in summary.top_k(3, pooling)],
+                                         [p["class_id"] for p in describe_top_k(scores, labels, 3, pooling)])
+
+    def test_empty(self):
+        summary = StreamSummary(["a"])
+        self.assertEqual(summary.finish(), [])
+        self.assertEqual(summary.top_k(3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
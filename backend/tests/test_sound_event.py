@@ -1,14 +1,18 @@
 import pytest
+from datetime import datetime, timezone
+from unittest import mock
+import numpy as np
 from fastapi.testclient import TestClient
 from backend.main import app
 from sqlmodel import SQLModel, create_engine, Session
-from backend.database import get_session
 import os
 
-import backend.database
-
-import os
-import backend.database
+# main.py imports the backend modules by top-level name, so the routers use
+# these rather than backend.database and friends
+import database
+import embedding_store
+from models import SoundEvent
+from routers import sound_event as sound_event_router
 
 @pytest.fixture(name="client")
 def client_fixture():
@@ -17,14 +21,14 @@ def client_fixture():
     db_url = f"sqlite:///{test_db_path}"
     engine = create_engine(db_url)
 
-    # Patch the backend.database.engine to use the test engine
-    backend.database.engine = engine
+    # Patch the database.engine to use the test engine
+    database.engine = engine
 
     def get_session_override():
         with Session(engine) as session:
             yield session
 
-    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[database.get_session] = get_session_override
 
     # Create tables on the test engine
     SQLModel.metadata.create_all(engine)
@@ -39,27 +43,71 @@ def client_fixture():
 def test_create_and_read_sound_event(client):
     payload = {
         "timestamp": "2025-05-15T12:00:00",
-        "noise_level": 42.5,
+        "noise_level_db": 42.5,
         "sound_type": "speech",
-        "description": "Talking"
+        "event_metadata": {"description": "Talking"}
     }
-    response = client.post("/sound-events/", json=payload)
-    assert response.status_code == 200
+    response = client.post("/api/v1/sounds/", json=payload)
+    assert response.status_code == 201
     data = response.json()
     assert data["id"] == 1
-    assert data["noise_level"] == 42.5
+    assert data["noise_level_db"] == 42.5
     assert data["sound_type"] == "speech"
-    assert data["description"] == "Talking"
+    assert data["event_metadata"] == {"description": "Talking"}
 
     # Test read all
-    response = client.get("/sound-events/")
+    response = client.get("/api/v1/sounds/")
     assert response.status_code == 200
     events = response.json()
     assert len(events) == 1
     assert events[0]["id"] == 1
 
     # Test read by id
-    response = client.get(f"/sound-events/1")
+    response = client.get(f"/api/v1/sounds/1")
     assert response.status_code == 200
     event = response.json()
     assert event["id"] == 1
+
+@pytest.fixture(name="store")
+def store_fixture(tmp_path):
+    store = embedding_store.EmbeddingStore(str(tmp_path / "embeddings"), dim=4)
+    with mock.patch.object(sound_event_router, "embedding_store", store):
+        yield store
+    store.close()
+
+def add_event(sound_type="speech"):
+    # Timezone-aware, which newer sqlmodel versions insist on
+    with Session(database.engine) as session:
+        event = SoundEvent(timestamp=datetime.now(timezone.utc), sound_type=sound_type)
+        session.add(event)
+        session.commit()
+        return event.id
+
+def test_similar_sound_events(client, store):
+    first, second, third = add_event(), add_event("music"), add_event("noise")
+    store.add(first, np.array([1.0, 0.0, 0.0, 0.0]))
+    store.add(second, np.array([0.9, 0.1, 0.0, 0.0]))
+    store.add(third, np.array([0.0, 0.0, 1.0, 0.0]))
+
+    response = client.get(f"/api/v1/sounds/{first}/similar", params={"k": 1})
+    assert response.status_code == 200
+    matches = response.json()
+    assert [match["event"]["id"] for match in matches] == [second]
+    assert matches[0]["event"]["sound_type"] == "music"
+    assert matches[0]["similarity"] > 0.99
+
+def test_similar_without_embedding(client, store):
+    event_id = add_event()
+    response = client.get(f"/api/v1/sounds/{event_id}/similar")
+    assert response.status_code == 404
+    assert "No embedding" in response.json()["detail"]
+    assert client.get("/api/v1/sounds/999/similar").status_code == 404
+
+def test_deleted_event_leaves_the_store(client, store):
+    first, second = add_event(), add_event()
+    store.add(first, np.array([1.0, 0.0, 0.0, 0.0]))
+    store.add(second, np.array([1.0, 0.1, 0.0, 0.0]))
+
+    assert client.delete(f"/api/v1/sounds/{second}").status_code == 204
+    assert store.get(second) is None
+    assert client.get(f"/api/v1/sounds/{first}/similar").json() == []
@@ -0,0 +1,82 @@
+"""
+Tests for the sound_types module.
+"""
+
+import os
+import unittest
+
+import numpy as np
+
+from ..model_registry import load_labels
+# SoundType comes through sound_types, which imports models the way the app does
+from ..sound_types import BUCKETS, SoundType, SoundTypeIndex, class_buckets
+
+CLASS_MAP = os.path.join(os.path.dirname(os.path.dirname(__file__)), "yamnet_class_map.csv")
+
+
+class TestSoundTypes(unittest.TestCase):
+    """Test the class-to-bucket mapping and clip classification."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.labels = load_labels(CLASS_MAP)
+        cls.index = SoundTypeIndex(cls.labels)
+
+    def _bucket(self, name):
+        return BUCKETS[class_buckets(self.labels)[self.labels.index(name)]]
+
+    def test_class_buckets(self):
+        """Test that classes land in the expected buckets."""
+        expected = {
+            "Speech": SoundType.SPEECH, "Whispering": SoundType.SPEECH,
+            "Music": SoundType.MUSIC, "Guitar": SoundType.MUSIC, "Scary music": SoundType.MUSIC,
+            "Choir": SoundType.MUSIC, "Silence": SoundType.SILENCE,
+            "Dog": SoundType.NOISE, "Wind": SoundType.NOISE, "White noise": SoundType.NOISE,
+            "Whale vocalization": SoundType.NOISE, "Laughter": SoundType.NOISE
+        }
+        for name, sound_type in expected.items():
+            with self.subTest(name=name):
+                self.assertEqual(self._bucket(name), sound_type)
+
+    def test_every_class_has_a_bucket(self):
+        """Test that every class maps to one of the buckets."""
+        buckets = class_buckets(self.labels)
+        self.assertEqual(buckets.shape, (521,))
+        self.assertTrue(np.all((buckets >= 0) & (buckets < len(BUCKETS))))
+
+    def test_unknown_labels_are_noise(self):
+        """Test that labels outside the class map fall back to noise."""
+        np.testing.assert_array_equal(class_buckets(["Speech", "Beep"]), [0, BUCKETS.index(SoundType.NOISE)])
+
+    def test_classify(self):
+        """Test the bucket of the best class and that class's mean score."""
+        scores = np.zeros((2, 521), dtype=np.float32)
+        scores[:, self.labels.index("Speech")] = 0.6
+        scores[:, self.labels.index("Conversation")] = 0.2
+        scores[0, self.labels.index("Dog")] = 0.4
+        sound_type, confidence = self.index.classify(scores)
+        self.assertEqual(sound_type, SoundType.SPEECH)
+        self.assertAlmostEqual(confidence, 0.6, places=5)
+
+    def test_classify_diffuse_scores(self):
+        """Test that the background score of every class doesn't let the big noise bucket win."""
+        rng = np.random.default_rng(1)
+        scores = rng.uniform(0.005, 0.02, (4, 521)).astype(np.float32)
+        scores[:, self.labels.index("Speech")] = 0.9
+        scores[:, self.labels.index("Conversation")] = 0.3
+        # Summed per bucket, the background alone would make noise win
+        mean, buckets = scores.mean(axis=0), class_buckets(self.labels)
+        self.assertGreater(mean[buckets == BUCKETS.index(SoundType.NOISE)].sum(),
+                           mean[buckets == BUCKETS.index(SoundType.SPEECH)].sum())
+        sound_type, confidence = self.index.classify(scores)
+        self.assertEqual(sound_type, SoundType.SPEECH)
+        self.assertAlmostEqual(confidence, 0.9, places=5)
+
+    def test_classify_empty(self):
+        """Test that clips without patches or scores stay unknown."""
+        self.assertEqual(self.index.classify(np.empty((0, 521))), (SoundType.UNKNOWN, 0.0))
+        self.assertEqual(self.index.classify(np.zeros((3, 521))), (SoundType.UNKNOWN, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Tests for the spectrogram module.
+"""
+
+import unittest
+
+import numpy as np
+
+from ..spectrogram import (MelSpectrogram, hertz_to_mel, mel_filterbank,
+                           pack_spectrogram, quantize_log_mel, unpack_spectrogram)
+
+
+class TestMelSpectrogram(unittest.TestCase):
+    """Test the log-mel computation."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.sample_rate = 16000
+        t = np.arange(self.sample_rate) / self.sample_rate
+        self.tone = (0.5 * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+    
+    def test_filterbank(self):
+        """Test filterbank shape and that the DC bin is ignored."""
+        fb = mel_filterbank(16000, 512, 64, 125.0, 7500.0)
+        self.assertEqual(fb.shape, (257, 64))
+        self.assertTrue(np.all(fb[0] == 0))
+        self.assertTrue(np.all(fb.max(axis=0) > 0))
+    
+    def test_tone_peak(self):
+        """Test that a pure tone peaks in the mel bin around its frequency."""
+        spec = MelSpectrogram(self.sample_rate, n_fft=512, hop_length=160, n_mels=64,
+                              window_length=400, fmin=125.0, fmax=7500.0)
+        log_mel = spec.compute(self.tone)
+        self.assertEqual(log_mel.shape, (1 + (16000 - 400) // 160, 64))
+        edges = np.linspace(hertz_to_mel(125.0), hertz_to_mel(7500.0), 66)
+        expected = int(np.argmin(np.abs(edges[1:-1] - hertz_to_mel(1000.0))))
+        self.assertLessEqual(abs(int(np.argmax(log_mel.mean(axis=0))) - expected), 1)
+    
+    def test_streaming_matches_batch(self):
+        """Test that chunked processing gives the same frames as one call."""
+        spec = MelSpectrogram(self.sample_rate, n_fft=512, hop_length=160, n_mels=32)
+        expected = spec.compute(self.tone)
+        chunks = [spec.process(chunk).copy() for chunk in np.array_split(self.tone, 37)]
+        np.testing.assert_allclose(np.concatenate(chunks), expected, rtol=1e-4, atol=1e-4)
+    
+    def test_pack_round_trip(self):
+        """Test quantizing and packing frames for transport."""
+        log_mel = np.linspace(-8, 8, 2 * 64, dtype=np.float32).reshape(2, 64)
+        quantized = quantize_log_mel(log_mel)
+        self.assertEqual((quantized.min(), quantized.max()), (0, 255))
+        message = unpack_spectrogram(pack_spectrogram(7, 123.5, quantized, 44100, 0.02))
+        self.assertEqual(message["first_frame"], 7)
+        self.assertEqual(message["first_time"], 123.5)
+        np.testing.assert_array_equal(message["frames"], quantized)
+
+
+if __name__ == '__main__':
+    unittest.main()